@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Cache incremental de análise por hash de commit
+Autor: Ana Carolina Poltronieri
+Propósito: Guardar em SQLite o último HEAD analisado, os registros de commit,
+os resultados por commit e os diffs de structure.mps de cada repositório,
+para que novas execuções processem apenas `last_head..HEAD`
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+from git_history import CommitRecord, FileChange
+
+DEFAULT_CACHE_PATH = 'data/analysis_cache.sqlite'
+
+# incrementar quando a classificação por commit mudar, invalidando resultados antigos
+RESULTS_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS repositories (
+    repo TEXT PRIMARY KEY,
+    name TEXT,
+    last_head TEXT,
+    results_version INTEGER,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS commits (
+    repo TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    parents TEXT,
+    author TEXT,
+    email TEXT,
+    date TEXT,
+    message TEXT,
+    files TEXT,
+    PRIMARY KEY (repo, hash)
+);
+CREATE INDEX IF NOT EXISTS commits_by_seq ON commits (repo, seq);
+CREATE TABLE IF NOT EXISTS commit_results (
+    repo TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    result TEXT,
+    PRIMARY KEY (repo, hash)
+);
+CREATE TABLE IF NOT EXISTS structure_diffs (
+    repo TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    path TEXT NOT NULL,
+    changes TEXT,
+    PRIMARY KEY (repo, hash, path)
+);
+"""
+
+
+def _encode_files(files):
+    return json.dumps([[c.status, c.path, c.old_path] for c in files], ensure_ascii=False)
+
+
+def _decode_files(raw):
+    return tuple(FileChange(*item) for item in json.loads(raw))
+
+
+class AnalysisCache:
+    """Armazena histórico e resultados por commit de vários repositórios"""
+
+    def __init__(self, db_path=DEFAULT_CACHE_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # timeout longo: vários processos (um por repositório) podem gravar ao mesmo tempo
+        self.conn = sqlite3.connect(str(self.db_path), timeout=60)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def repo_key(repo_path):
+        """Chave estável para o repositório (caminho absoluto)"""
+        return str(Path(repo_path).resolve())
+
+    def last_head(self, repo):
+        """Último HEAD analisado, ou None se o repositório nunca foi analisado"""
+        row = self.conn.execute(
+            "SELECT last_head FROM repositories WHERE repo = ?", (repo,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def invalidate(self, repo):
+        """Descarta tudo o que foi guardado para o repositório"""
+        with self.conn:
+            self.conn.execute("DELETE FROM commits WHERE repo = ?", (repo,))
+            self.conn.execute("DELETE FROM commit_results WHERE repo = ?", (repo,))
+            self.conn.execute("DELETE FROM structure_diffs WHERE repo = ?", (repo,))
+            self.conn.execute("DELETE FROM repositories WHERE repo = ?", (repo,))
+
+    def load_commits(self, repo):
+        """Carrega os commits guardados, do mais recente ao mais antigo"""
+        rows = self.conn.execute(
+            "SELECT hash, parents, author, email, date, message, files "
+            "FROM commits WHERE repo = ? ORDER BY seq DESC", (repo,)
+        )
+        return [
+            CommitRecord(
+                hash=row[0],
+                parents=tuple(row[1].split()) if row[1] else (),
+                author=row[2],
+                email=row[3],
+                date=row[4],
+                message=row[5],
+                files=_decode_files(row[6])
+            )
+            for row in rows
+        ]
+
+    def append_commits(self, repo, name, new_commits, head):
+        """Acrescenta commits novos (mais recente primeiro) e registra o novo HEAD"""
+        row = self.conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM commits WHERE repo = ?", (repo,)
+        ).fetchone()
+        base = row[0]
+        total = len(new_commits)
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO commits VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (repo, base + total - i, c.hash, ' '.join(c.parents), c.author,
+                     c.email, c.date, c.message, _encode_files(c.files))
+                    for i, c in enumerate(new_commits)
+                )
+            )
+            self.conn.execute(
+                "INSERT INTO repositories (repo, name, last_head, results_version, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(repo) DO UPDATE SET name = excluded.name, "
+                "last_head = excluded.last_head, updated_at = excluded.updated_at",
+                (repo, name, head, RESULTS_VERSION, datetime.now().isoformat())
+            )
+
+    def _results_current(self, repo):
+        """Descarta os resultados calculados por uma versão antiga da análise"""
+        version = self.conn.execute(
+            "SELECT results_version FROM repositories WHERE repo = ?", (repo,)
+        ).fetchone()
+        if version and version[0] == RESULTS_VERSION:
+            return True
+        with self.conn:
+            self.conn.execute("DELETE FROM commit_results WHERE repo = ?", (repo,))
+            self.conn.execute("DELETE FROM structure_diffs WHERE repo = ?", (repo,))
+            self.conn.execute(
+                "UPDATE repositories SET results_version = ? WHERE repo = ?",
+                (RESULTS_VERSION, repo)
+            )
+        return False
+
+    def load_results(self, repo, hashes):
+        """Resultados por commit já calculados, indexados por hash"""
+        if not self._results_current(repo):
+            return {}
+
+        wanted = set(hashes)
+        rows = self.conn.execute(
+            "SELECT hash, result FROM commit_results WHERE repo = ?", (repo,)
+        )
+        return {h: json.loads(result) for h, result in rows if h in wanted}
+
+    def store_results(self, repo, results):
+        """Guarda resultados por commit (dicionários serializáveis em JSON)"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO commit_results VALUES (?, ?, ?)",
+                ((repo, r['hash'], json.dumps(r, ensure_ascii=False)) for r in results)
+            )
+
+    def load_structure_diffs(self, repo, hashes):
+        """Diffs de structure.mps já calculados: hash -> [(caminho, mudanças)]
+
+        Mudanças None marcam uma versão ilegível (sem diff possível).
+        """
+        if not self._results_current(repo):
+            return {}
+
+        wanted = set(hashes)
+        diffs = {}
+        rows = self.conn.execute(
+            "SELECT hash, path, changes FROM structure_diffs WHERE repo = ? ORDER BY rowid", (repo,)
+        )
+        for h, path, changes in rows:
+            if h in wanted:
+                diffs.setdefault(h, []).append((path, json.loads(changes) if changes is not None else None))
+        return diffs
+
+    def store_structure_diffs(self, repo, diffs):
+        """Guarda os diffs por commit (hash -> [(caminho, mudanças ou None)])"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO structure_diffs VALUES (?, ?, ?, ?)",
+                (
+                    (repo, h, path, json.dumps(changes, ensure_ascii=False) if changes is not None else None)
+                    for h, entries in diffs.items()
+                    for path, changes in entries
+                )
+            )
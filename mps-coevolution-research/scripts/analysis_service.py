@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Serviço de análise com estado em memória
+Autor: Ana Carolina Poltronieri
+Propósito: Manter a análise dos repositórios (score, mudanças em metamodelos,
+modelos encontrados e índice de conceitos) carregada em um processo só,
+acompanhar novos commits e arquivos alterados e responder consultas em
+JSON por HTTP local sem reprocessar nada a cada requisição
+"""
+
+import argparse
+import json
+import re
+import subprocess
+import threading
+import time
+import traceback
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from analysis_cache import AnalysisCache, DEFAULT_CACHE_PATH
+from blob_cache import DEFAULT_BLOB_CACHE_PATH, BlobSummaryCache
+from concept_index import ConceptIndex, DEFAULT_INDEX_PATH
+from instrumentation import LatencyHistogram
+from mps_analyzer import DEFAULT_MAX_COMMITS, MPSRepositoryAnalyzer
+from not_using_this import MbeddrModelDiscovery
+
+DEFAULT_PORT = 8765
+DEFAULT_INTERVAL = 10.0
+# respostas serializadas guardadas por versão do estado
+MAX_CACHED_RESPONSES = 4096
+
+
+def _head(repo_path):
+    """HEAD atual do repositório (None fora de um repositório git)"""
+    result = subprocess.run(['git', 'rev-parse', '--verify', '-q', 'HEAD'], cwd=repo_path,
+                            capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+class RepositoryState:
+    """Análise de um repositório, refeita só quando o HEAD ou os arquivos mudam
+
+    Vive na thread de atualização: os bancos SQLite e os processos git do
+    analisador não são compartilhados com as threads que atendem consultas.
+    """
+
+    def __init__(self, repo_path, options):
+        self.repo_path = Path(repo_path)
+        self.name = self.repo_path.name
+        self.options = options
+        self.discovery = MbeddrModelDiscovery(self.repo_path)
+        self.head = None
+        self.files_signature = None
+        self.snapshot = None
+
+    def _signature(self):
+        """Assinatura (caminho, tamanho, mtime) dos arquivos MPS: só stat, sem leitura"""
+        return hash(frozenset(
+            (path, st.st_size, st.st_mtime_ns) for path, _, _, st in self.discovery._iter_candidates()
+        ))
+
+    def refresh(self, cache, index, blob_cache=None):
+        """Atualiza o que mudou desde a última chamada; retorna True se houve mudança"""
+        head = _head(self.repo_path)
+        signature = self._signature()
+        history_changed = head != self.head or self.snapshot is None
+        files_changed = signature != self.files_signature
+        if not history_changed and not files_changed:
+            return False
+
+        snapshot = dict(self.snapshot or {})
+        if history_changed:
+            snapshot.update(self._analyze(cache, blob_cache))
+            self.head = head
+        if files_changed:
+            self.discovery.scan_repository(fast=True, workers=self.options.workers)
+            index.update(self.repo_path, self.options.workers)
+            snapshot['models'] = [self._model_entry(f, 'model') for f in self.discovery.models_found]
+            snapshot['metamodels'] = [self._model_entry(f, 'metamodel') for f in self.discovery.metamodels_found]
+            snapshot['statistics'] = dict(self.discovery.statistics)
+            self.files_signature = signature
+
+        snapshot['repository'] = self.name
+        snapshot['path'] = str(self.repo_path)
+        snapshot['head'] = head
+        snapshot['updated_at'] = datetime.now().isoformat(timespec='seconds')
+        self.snapshot = snapshot
+        return True
+
+    def _analyze(self, cache, blob_cache=None):
+        """Fases do mps_analyzer sobre o histórico (incrementais pelo cache)"""
+        analyzer = MPSRepositoryAnalyzer(self.repo_path, cache=cache, backend=self.options.backend,
+                                         blob_cache=blob_cache)
+        try:
+            analyzer.analyze_basic_metrics()
+            max_commits = None if self.options.all_commits else DEFAULT_MAX_COMMITS
+            analyzer.analyze_metamodel_changes(max_commits=max_commits, workers=self.options.workers)
+            if not self.options.no_structure_diff:
+                analyzer.analyze_structure_diffs(max_commits=max_commits, workers=self.options.workers)
+            analyzer.analyze_contributors()
+            score = analyzer.calculate_suitability_score()
+        finally:
+            analyzer.close()
+        results = analyzer.results
+        return {
+            'score': score,
+            'basic_metrics': results['basic_metrics'],
+            'metamodel_stats': results.get('metamodel_stats', {}),
+            'structure_diff_stats': results.get('structure_diff_stats'),
+            'breaking_commits': analyzer._breaking_commit_count(),
+            'metamodel_changes': results['metamodel_changes'],
+            'breaking_changes': results['breaking_changes'],
+            'contributors': results['contributors']
+        }
+
+    def _model_entry(self, info, kind):
+        return {
+            'path': str(Path(info['path']).relative_to(self.repo_path)),
+            'name': info['name'],
+            'type': info['type'],
+            'kind': kind,
+            'size': info['size'],
+            'modified': info['modified'].isoformat(timespec='seconds')
+        }
+
+
+def concept_snapshot(index):
+    """Conceito → modelos que o usam, para todas as consultas sem ir ao SQLite"""
+    by_name = {}
+    by_id = {}
+    rows = index.conn.execute(
+        "SELECT c.name, c.concept_id, r.path, m.path, m.ref, u.node_count FROM concepts c "
+        "JOIN concept_usage u ON u.concept = c.id "
+        "JOIN models m ON m.id = u.model "
+        "JOIN repositories r ON r.id = m.repo"
+    )
+    for name, concept_id, repo, path, ref, count in rows:
+        entry = {'repository': Path(repo).name, 'path': path, 'ref': ref, 'node_count': count}
+        by_name.setdefault(name, []).append(entry)
+        by_id.setdefault(concept_id, name)
+    for entries in by_name.values():
+        entries.sort(key=lambda e: -e['node_count'])
+    # nome curto (sem o pacote) → nomes completos
+    short = {}
+    for name in by_name:
+        if name:
+            short.setdefault(name.rsplit('.', 1)[-1], []).append(name)
+    return {'by_name': by_name, 'by_id': by_id, 'short': short}
+
+
+class AnalysisService:
+    """Estado de todos os repositórios, trocado por inteiro a cada atualização
+
+    As consultas leem `self.state` (um dicionário imutável depois de
+    publicado), então nunca esperam uma atualização em andamento. Respostas
+    já serializadas ficam guardadas até a próxima troca de estado.
+    """
+
+    def __init__(self, repositories, options):
+        self.options = options
+        self.repositories = [RepositoryState(path, options) for path in repositories]
+        self.state = {'version': 0, 'repositories': {}, 'concepts': None, 'refreshed_at': None}
+        self.responses = {}
+        self.latency = {}
+        # handlers registram latências enquanto /status as lê
+        self._latency_lock = threading.Lock()
+        self.started = time.time()
+        self.ready = threading.Event()
+        self.stopping = threading.Event()
+        self.errors = {}
+
+    def watch(self):
+        """Laço da thread de atualização: relê só os repositórios que mudaram"""
+        cache = None if self.options.no_cache else AnalysisCache(self.options.cache)
+        blob_cache = None if self.options.no_cache else BlobSummaryCache(DEFAULT_BLOB_CACHE_PATH)
+        index = ConceptIndex(self.options.index)
+        try:
+            while not self.stopping.is_set():
+                started = time.perf_counter()
+                changed = False
+                for repo in self.repositories:
+                    try:
+                        changed |= repo.refresh(cache, index, blob_cache)
+                        self.errors.pop(repo.name, None)
+                    except Exception as e:
+                        print(f"Erro ao atualizar {repo.name}: {e}")
+                        self.errors[repo.name] = str(e)
+                if changed or self.state['concepts'] is None:
+                    self._publish(concept_snapshot(index), time.perf_counter() - started)
+                self.ready.set()
+                self.stopping.wait(self.options.interval)
+        finally:
+            self.ready.set()
+            index.close()
+            if cache:
+                cache.close()
+            if blob_cache is not None:
+                blob_cache.close()
+
+    def _publish(self, concepts, seconds):
+        self.state = {
+            'version': self.state['version'] + 1,
+            'repositories': {repo.name: repo.snapshot for repo in self.repositories if repo.snapshot},
+            'concepts': concepts,
+            'refreshed_at': datetime.now().isoformat(timespec='seconds'),
+            'refresh_seconds': round(seconds, 3)
+        }
+        self.responses = {}
+        print(f"Estado {self.state['version']} publicado ({seconds:.2f}s)")
+
+    # consultas: recebem (estado, parâmetros da rota, query string) e devolvem (status, objeto)
+
+    def _repository(self, state, name):
+        snapshot = state['repositories'].get(name)
+        if snapshot is None:
+            raise LookupError(f"Repositório desconhecido: {name}")
+        return snapshot
+
+    def query_status(self, state, query):
+        return 200, {
+            'version': state['version'],
+            'refreshed_at': state['refreshed_at'],
+            'refresh_seconds': state.get('refresh_seconds'),
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'repositories': {repo.name: repo.head for repo in self.repositories},
+            'errors': dict(self.errors),
+            'latency': self.latency_snapshot()
+        }
+
+    def query_repositories(self, state, query):
+        return 200, [
+            {'repository': name, 'score': s['score'], 'head': s['head'], 'updated_at': s['updated_at']}
+            for name, s in sorted(state['repositories'].items())
+        ]
+
+    def query_score(self, state, query, name):
+        snapshot = self._repository(state, name)
+        return 200, {
+            'repository': name,
+            'score': snapshot['score'],
+            'status': 'ADEQUADO' if snapshot['score'] >= 70 else 'LIMITADO' if snapshot['score'] >= 50 else 'INADEQUADO',
+            'basic_metrics': snapshot['basic_metrics'],
+            'metamodel_stats': snapshot['metamodel_stats'],
+            'breaking_commits': snapshot['breaking_commits'],
+            'head': snapshot['head']
+        }
+
+    def query_changes(self, state, query, name):
+        changes = self._repository(state, name)['metamodel_changes']
+        if query.get('breaking') in ('1', 'true'):
+            changes = [c for c in changes if c['is_breaking']]
+        if 'type' in query:
+            changes = [c for c in changes if c['change_type'] == query['type']]
+        if 'since' in query:
+            changes = [c for c in changes if c['date'] >= query['since']]
+        return 200, changes[:int(query.get('limit', len(changes)))]
+
+    def query_models(self, state, query, name):
+        snapshot = self._repository(state, name)
+        kind = query.get('kind')
+        models = (snapshot['metamodels'] if kind != 'model' else []) + \
+                 (snapshot['models'] if kind != 'metamodel' else [])
+        if 'type' in query:
+            models = [m for m in models if m['type'] == query['type']]
+        if 'path' in query:
+            models = [m for m in models if query['path'] in m['path']]
+        return 200, models[:int(query.get('limit', len(models)))]
+
+    def query_concept(self, state, query, concept):
+        concepts = state['concepts']
+        name = concepts['by_id'].get(concept, concept)
+        names = [name] if name in concepts['by_name'] else concepts['short'].get(name, [])
+        if not names:
+            raise LookupError(f"Conceito não encontrado: {concept}")
+        result = []
+        for full_name in names:
+            models = concepts['by_name'][full_name]
+            if 'repo' in query:
+                models = [m for m in models if m['repository'] == query['repo']]
+            result.append({'concept': full_name, 'model_count': len(models), 'models': models})
+        return 200, result
+
+    ROUTES = [
+        (re.compile(r'^/status$'), 'status', 'query_status'),
+        (re.compile(r'^/repositories$'), 'repositories', 'query_repositories'),
+        (re.compile(r'^/repositories/([^/]+)/score$'), 'score', 'query_score'),
+        (re.compile(r'^/repositories/([^/]+)/metamodel-changes$'), 'metamodel-changes', 'query_changes'),
+        (re.compile(r'^/repositories/([^/]+)/models$'), 'models', 'query_models'),
+        (re.compile(r'^/concepts/([^/]+)$'), 'concepts', 'query_concept'),
+    ]
+
+    def handle(self, target):
+        """Resposta (status, corpo JSON em bytes) para um caminho com query string"""
+        state = self.state
+        parts = urlsplit(target)
+        for pattern, route, method in self.ROUTES:
+            match = pattern.match(parts.path)
+            if match:
+                break
+        else:
+            return route_error(404, f"Rota desconhecida: {parts.path}"), None
+
+        if route == 'status':
+            return self._encode(*self.query_status(state, {})), route
+        key = (state['version'], target)
+        cached = self.responses.get(key)
+        if cached is None:
+            query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+            try:
+                status, body = getattr(self, method)(state, query, *map(unquote, match.groups()))
+            except LookupError as e:
+                return route_error(404, str(e)), route
+            except ValueError as e:
+                return route_error(400, str(e)), route
+            cached = self._encode(status, body)
+            if len(self.responses) >= MAX_CACHED_RESPONSES:
+                self.responses.clear()
+            self.responses[key] = cached
+        return cached, route
+
+    @staticmethod
+    def _encode(status, body):
+        return status, json.dumps(body, ensure_ascii=False, default=str).encode('utf-8')
+
+    def record(self, route, seconds):
+        with self._latency_lock:
+            histogram = self.latency.get(route)
+            if histogram is None:
+                histogram = self.latency[route] = LatencyHistogram()
+            histogram.add(seconds)
+
+    def latency_snapshot(self):
+        with self._latency_lock:
+            return {route: histogram.to_dict() for route, histogram in self.latency.items()}
+
+
+def route_error(status, message):
+    return status, json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # cabeçalhos e corpo saem em escritas separadas: sem Nagle, nada espera o ACK
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            started = time.perf_counter()
+            try:
+                (status, body), route = service.handle(self.path)
+            except Exception as e:
+                # erro inesperado numa consulta: responde 500 em vez de derrubar a conexão
+                traceback.print_exc()
+                (status, body), route = route_error(500, f"{type(e).__name__}: {e}"), None
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            if route:
+                service.record(route, time.perf_counter() - started)
+
+        def log_message(self, format, *args):
+            if service.options.verbose:
+                super().log_message(format, *args)
+
+    return Handler
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description='Serviço HTTP/JSON com a análise dos repositórios sempre carregada',
+        epilog='Exemplo: python analysis_service.py repositories/mbeddr.core --port 8765; '
+               'curl localhost:8765/repositories/mbeddr.core/score'
+    )
+    parser.add_argument('repositories', nargs='+', help='Repositórios acompanhados')
+    parser.add_argument('--host', default='127.0.0.1', help='Endereço de escuta (padrão: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Porta (padrão: {DEFAULT_PORT})')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help=f'Segundos entre verificações de novos commits/arquivos (padrão: {DEFAULT_INTERVAL})')
+    parser.add_argument('--all-commits', action='store_true', help='Analisa todos os commits estruturais')
+    parser.add_argument('--no-structure-diff', action='store_true', help='Não calcula os diffs de structure.mps')
+    parser.add_argument('--workers', type=int, default=None, help='Processos usados nas atualizações')
+    parser.add_argument('--backend', default='catfile', help='Backend git do analisador')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='Cache SQLite do histórico')
+    parser.add_argument('--no-cache', action='store_true', help='Não usa os caches do histórico e dos blobs')
+    parser.add_argument('--index', default=DEFAULT_INDEX_PATH, help='Índice SQLite de conceitos')
+    parser.add_argument('--verbose', action='store_true', help='Registra cada requisição')
+    args = parser.parse_args()
+
+    service = AnalysisService(args.repositories, args)
+    watcher = threading.Thread(target=service.watch, name='watcher', daemon=True)
+    watcher.start()
+    print("Carregando estado inicial...")
+    service.ready.wait()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    server.daemon_threads = True
+    print(f"Servindo em http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stopping.set()
+        watcher.join(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Benchmark das análises em repositórios sintéticos
+Autor: Ana Carolina Poltronieri
+Propósito: Medir tempo, CPU, vazão (commits/s, MB/s) e pico de memória das
+fases do MPSRepositoryAnalyzer e do MbeddrModelDiscovery em várias escalas,
+para que regressões de desempenho apareçam em números
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic_repo import SyntheticRepoGenerator
+
+SCALES = {
+    'small': dict(commits=200, languages=3, concepts=15, solutions=2, models_per_solution=5, model_nodes=100),
+    'medium': dict(commits=2000, languages=8, concepts=25, solutions=4, models_per_solution=10, model_nodes=150),
+    'large': dict(commits=10000, languages=20, concepts=40, solutions=8, models_per_solution=15, model_nodes=200)
+}
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return peak / 1024 / (1024 if sys.platform == 'darwin' else 1)
+
+
+def _cpu_seconds():
+    """CPU do processo e dos filhos já encerrados (ex.: git)"""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+class PhaseTimer:
+    """Cronometra fases e acumula as medições"""
+
+    def __init__(self):
+        self.rows = []
+
+    @contextlib.contextmanager
+    def phase(self, name, units=None, unit_name=None):
+        wall, cpu = time.perf_counter(), _cpu_seconds()
+        row = {'phase': name}
+        yield row
+        row['wall_s'] = time.perf_counter() - wall
+        row['cpu_s'] = _cpu_seconds() - cpu
+        row['peak_rss_mb'] = _peak_rss_mb()
+        amount = row.pop('units', units)
+        if amount is not None and unit_name:
+            row['throughput'] = amount / max(row['wall_s'], 1e-9)
+            row['throughput_unit'] = unit_name
+        self.rows.append(row)
+
+
+def run_phases(repo_path, workers):
+    """Executa as fases medidas sobre um repositório (chamado em subprocesso)"""
+    from mps_analyzer import MPSRepositoryAnalyzer
+    from not_using_this import MbeddrModelDiscovery
+
+    timer = PhaseTimer()
+    quiet = io.StringIO()
+
+    with contextlib.redirect_stdout(quiet):
+        analyzer = MPSRepositoryAnalyzer(repo_path)
+
+        with timer.phase('ingest_history', unit_name='commits/s') as row:
+            commits = analyzer.load_history()
+            row['units'] = len(commits)
+        with timer.phase('basic_metrics', len(commits), 'commits/s'):
+            analyzer.analyze_basic_metrics()
+        with timer.phase('metamodel_changes', unit_name='commits/s') as row:
+            changes = analyzer.analyze_metamodel_changes(max_commits=None, workers=workers)
+            row['units'] = len(changes)
+        with timer.phase('structure_diffs', unit_name='commits/s') as row:
+            analyzer.analyze_structure_diffs(max_commits=None, workers=workers)
+            row['units'] = analyzer.results['structure_diff_stats']['commits_compared']
+        with timer.phase('contributors', len(commits), 'commits/s'):
+            analyzer.analyze_contributors()
+        analyzer.close()
+
+        tree_bytes = sum(
+            entry.stat().st_size for entry in Path(repo_path).rglob('*.mps') if entry.is_file()
+        ) / 1e6
+        discovery = MbeddrModelDiscovery(repo_path)
+        with timer.phase('scan_repository', tree_bytes, 'MB/s'):
+            discovery.scan_repository()
+        with timer.phase('scan_repository_fast_cold', tree_bytes, 'MB/s'):
+            discovery.scan_repository(fast=True, workers=workers)
+        with timer.phase('scan_repository_fast_warm', tree_bytes, 'MB/s'):
+            discovery.scan_repository(fast=True, workers=workers)
+
+    return timer.rows
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Lista as fases mais lentas que a linha de base além da tolerância"""
+    reference = {(r['scale'], r['phase']): r for r in baseline}
+    regressions = []
+    for row in results:
+        old = reference.get((row['scale'], row['phase']))
+        if old and row['wall_s'] > old['wall_s'] * (1 + tolerance) and row['wall_s'] - old['wall_s'] > 0.01:
+            regressions.append((row, old))
+    return regressions
+
+
+def print_table(results):
+    print(f"{'escala':8} {'fase':28} {'tempo (s)':>10} {'CPU (s)':>9} {'vazão':>16} {'RSS (MB)':>9}")
+    print("-" * 86)
+    for row in results:
+        throughput = ''
+        if 'throughput' in row:
+            throughput = f"{row['throughput']:.1f} {row['throughput_unit']}"
+        print(f"{row['scale']:8} {row['phase']:28} {row['wall_s']:10.3f} {row['cpu_s']:9.3f} "
+              f"{throughput:>16} {row['peak_rss_mb']:9.1f}")
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description='Benchmark das análises MPS em repositórios sintéticos',
+        epilog='Exemplo: python benchmark.py --scales small,medium --baseline bench_results.json'
+    )
+    parser.add_argument('--scales', default='small,medium',
+                        help=f"Escalas separadas por vírgula ({', '.join(SCALES)}; padrão: small,medium)")
+    parser.add_argument('--workdir', help='Diretório para os repositórios gerados (padrão: temporário)')
+    parser.add_argument('--keep', action='store_true', help='Mantém os repositórios gerados')
+    parser.add_argument('--workers', type=int, default=None, help='Workers usados pelas fases paralelas')
+    parser.add_argument('--output', default='bench_results.json', help='Arquivo JSON com as medições')
+    parser.add_argument('--baseline', help='Medições anteriores para detectar regressões')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Aumento relativo de tempo tolerado antes de acusar regressão (padrão: 0.2)')
+    parser.add_argument('--run', metavar='REPO', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        json.dump(run_phases(args.run, args.workers), sys.stdout)
+        return
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix='mps-bench-'))
+    results = []
+
+    for scale in args.scales.split(','):
+        if scale not in SCALES:
+            parser.error(f"escala desconhecida: {scale}")
+        repo_path = workdir / f"synthetic-{scale}"
+        if not repo_path.exists():
+            print(f"Gerando repositório sintético ({scale})...")
+            SyntheticRepoGenerator(repo_path, **SCALES[scale]).generate()
+
+        print(f"Medindo fases ({scale})...")
+        # subprocesso novo por escala: o pico de RSS não mistura escalas
+        command = [sys.executable, __file__, '--run', str(repo_path)]
+        if args.workers:
+            command += ['--workers', str(args.workers)]
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        for row in json.loads(output):
+            row['scale'] = scale
+            row['commits'] = SCALES[scale]['commits']
+            results.append(row)
+
+    print()
+    print_table(results)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nMedições exportadas para: {args.output}")
+
+    if not args.keep and not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+        for row, old in regressions:
+            print(f"REGRESSÃO: {row['scale']}/{row['phase']}: "
+                  f"{old['wall_s']:.3f}s -> {row['wall_s']:.3f}s")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Cache de modelos interpretados por sha do blob
+Autor: Ana Carolina Poltronieri
+Propósito: Interpretar cada conteúdo de arquivo .mps uma única vez, em todas
+as revisões, ramos e repositórios: o resumo (registry, contagem de
+conceitos, imports), as declarações de um structure.mps e o tipo pelo
+cabeçalho ficam em SQLite indexados pelo sha do blob git, com limite de
+tamanho por LRU
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+import zlib
+from pathlib import Path
+
+from git_backend import open_backend
+from git_history import GitError, check_returncode
+from instrumentation import metrics
+from mps_parser import summarize_model
+from parallel import map_in_chunks
+
+DEFAULT_BLOB_CACHE_PATH = 'data/blob_cache.sqlite'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# incrementar quando o formato do resumo mudar, invalidando as entradas antigas
+SUMMARY_VERSION = 1
+
+# uma entrada por (sha, tipo de resultado): 'summary' (summarize_model),
+# 'structure' (metamodel_diff.parse_structure), 'content_type' (file_population);
+# entradas de outra versão são ignoradas e substituídas
+SCHEMA = """
+DROP TABLE IF EXISTS summaries;
+CREATE TABLE IF NOT EXISTS entries (
+    sha TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    used_at REAL NOT NULL,
+    PRIMARY KEY (sha, kind)
+);
+CREATE INDEX IF NOT EXISTS entries_by_use ON entries (used_at);
+"""
+
+# o SQLite limita o número de parâmetros por consulta
+QUERY_BATCH = 500
+
+# um backend por (processo, repositório), como em metamodel_diff
+_worker_backends = {}
+
+
+def _summarize_blob(job):
+    """Lê e resume um blob (executado nos workers, com backend próprio)"""
+    repo_path, sha = job
+    key = (os.getpid(), repo_path)
+    backend = _worker_backends.get(key)
+    if backend is None:
+        backend = _worker_backends[key] = open_backend(repo_path)
+    obj = backend.read_object(sha)
+    if obj is None or obj[1] != 'blob':
+        return sha, None
+    try:
+        summary = summarize_model(obj[2])
+    except ET.ParseError:
+        # guardado também: o blob inválido não é interpretado de novo
+        return sha, {'error': 'parse'}
+    # chaves do registry como listas: o resumo volta igual do JSON
+    summary['concepts'] = {index: list(concept) for index, concept in summary['concepts'].items()}
+    return sha, summary
+
+
+def history_blobs(repo_path, revs=('--all',), suffix='.mps'):
+    """Shas distintos dos arquivos com a extensão em todo o histórico das revisões
+
+    `git rev-list --objects` lista cada objeto uma única vez, com o primeiro
+    caminho em que aparece; o filtro descarta árvores (diretórios `.mps`) e
+    `-- .` restringe a busca a `repo_path` quando ele é um subdiretório de um
+    repositório maior.
+    """
+    metrics.spawn('git rev-list')
+    command = ['git', 'rev-list', '--objects', '--filter=object:type=blob', *revs, '--', '.']
+    result = subprocess.run(command, cwd=repo_path, capture_output=True, text=True, errors='surrogateescape')
+    check_returncode(command, result.returncode, result.stderr)
+    blobs = {}
+    for line in result.stdout.splitlines():
+        sha, _, path = line.partition(' ')
+        if path.endswith(suffix):
+            blobs.setdefault(sha, path)
+    return blobs
+
+
+class BlobSummaryCache:
+    """Resultados por sha do blob, compartilhados entre repositórios e execuções"""
+
+    def __init__(self, db_path=DEFAULT_BLOB_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # timeout longo: vários processos (um por repositório) podem gravar ao mesmo tempo
+        self.conn = sqlite3.connect(str(self.db_path), timeout=60)
+        self.conn.executescript(SCHEMA)
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'parsed': 0}
+        # (sha, tipo) lidos desde a última gravação: o used_at é atualizado em lote
+        self._touched = set()
+        self._size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        self.evict()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def flush(self):
+        """Grava o momento de uso das entradas lidas (ordem do LRU)"""
+        if not self._touched:
+            return
+        now = time.time()
+        with self.conn:
+            self.conn.executemany("UPDATE entries SET used_at = ? WHERE sha = ? AND kind = ?",
+                                  ((now, sha, kind) for sha, kind in self._touched))
+        self._touched.clear()
+
+    def get_many(self, shas, kind='summary', version=SUMMARY_VERSION):
+        """Resultados guardados dos shas pedidos (os ausentes ficam de fora)"""
+        shas = list(dict.fromkeys(shas))
+        found = {}
+        for start in range(0, len(shas), QUERY_BATCH):
+            batch = shas[start:start + QUERY_BATCH]
+            marks = ','.join('?' * len(batch))
+            rows = self.conn.execute(
+                f"SELECT sha, body FROM entries WHERE kind = ? AND version = ? AND sha IN ({marks})",
+                [kind, version, *batch]
+            )
+            for sha, body in rows:
+                found[sha] = json.loads(zlib.decompress(body))
+        self._touched.update((sha, kind) for sha in found)
+        self.stats['hits'] += len(found)
+        metrics.count('blob_cache_hits', len(found))
+        return found
+
+    def get(self, sha, kind='summary', version=SUMMARY_VERSION):
+        return self.get_many([sha], kind, version).get(sha)
+
+    def store_many(self, items, kind='summary', version=SUMMARY_VERSION):
+        """Guarda pares (sha, resultado serializável em JSON) e aplica o limite de tamanho"""
+        now = time.time()
+        rows = []
+        for sha, value in items:
+            body = zlib.compress(json.dumps(value, ensure_ascii=False).encode('utf-8'), 6)
+            rows.append((sha, kind, version, body, len(body), now))
+        if not rows:
+            return
+        with self.conn:
+            # entradas substituídas saem do tamanho total antes de entrar de novo
+            for start in range(0, len(rows), QUERY_BATCH):
+                batch = [row[0] for row in rows[start:start + QUERY_BATCH]]
+                marks = ','.join('?' * len(batch))
+                self._size -= self.conn.execute(
+                    f"SELECT COALESCE(SUM(size), 0) FROM entries WHERE kind = ? AND sha IN ({marks})",
+                    [kind, *batch]
+                ).fetchone()[0]
+            self.conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self._size += sum(row[4] for row in rows)
+        self.flush()
+        self.evict()
+
+    def summarize(self, repo_path, shas, workers=1, chunk_size=32):
+        """Resumo de cada sha; só os blobs nunca vistos são lidos e interpretados
+
+        Blobs que não existem no repositório ficam com resumo None (e não
+        são guardados).
+        """
+        shas = [sha for sha in dict.fromkeys(shas) if sha]
+        summaries = self.get_many(shas)
+        missing = [(str(repo_path), sha) for sha in shas if sha not in summaries]
+        if missing:
+            parsed = map_in_chunks(_summarize_blob, missing, workers, chunk_size)
+            stored = [(sha, summary) for sha, summary in parsed if summary is not None]
+            self.store_many(stored)
+            self.stats['parsed'] += len(stored)
+            metrics.count('blob_cache_parsed', len(stored))
+            summaries.update(parsed)
+        return summaries
+
+    def size(self):
+        """Bytes ocupados pelos resultados comprimidos"""
+        return self._size
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def evict(self):
+        """Remove os resultados usados há mais tempo até caber em `max_bytes`"""
+        excess = self._size - self.max_bytes
+        if excess <= 0:
+            return 0
+        removed = []
+        for sha, kind, size in self.conn.execute("SELECT sha, kind, size FROM entries ORDER BY used_at"):
+            removed.append((sha, kind))
+            self._size -= size
+            excess -= size
+            if excess <= 0:
+                break
+        with self.conn:
+            self.conn.executemany("DELETE FROM entries WHERE sha = ? AND kind = ?", removed)
+        return len(removed)
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description='Interpreta (uma vez) todos os blobs .mps do histórico e guarda os resumos',
+        epilog='Exemplo: python blob_cache.py repositories/mbeddr.core repositories/mps-extensions'
+    )
+    parser.add_argument('repositories', nargs='+', help='Repositórios git')
+    parser.add_argument('--cache', default=DEFAULT_BLOB_CACHE_PATH,
+                        help=f'Banco SQLite dos resumos (padrão: {DEFAULT_BLOB_CACHE_PATH})')
+    parser.add_argument('--max-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help='Tamanho máximo do cache em MB (padrão: %(default)s)')
+    parser.add_argument('--rev', action='append', default=None,
+                        help='Revisões a percorrer (padrão: --all; pode repetir)')
+    parser.add_argument('--workers', type=int, default=None, help='Processos usados na interpretação')
+    args = parser.parse_args()
+
+    cache = BlobSummaryCache(args.cache, args.max_mb * 1024 * 1024)
+    try:
+        for repo_path in args.repositories:
+            started = time.perf_counter()
+            parsed_before = cache.stats['parsed']
+            blobs = history_blobs(repo_path, tuple(args.rev or ('--all',)))
+            summaries = cache.summarize(repo_path, blobs, args.workers)
+            nodes = sum(s.get('node_count', 0) for s in summaries.values() if s)
+            print(f"{Path(repo_path).name}: {len(blobs)} blobs .mps distintos, "
+                  f"{cache.stats['parsed'] - parsed_before} interpretados agora, {nodes} nós "
+                  f"({time.perf_counter() - started:.2f}s)")
+    except GitError as e:
+        print(f"Erro: {e}")
+        sys.exit(1)
+    finally:
+        print(f"Cache: {len(cache)} entradas, {cache.size() / 1024 / 1024:.1f} MB")
+        cache.close()
+
+
+if __name__ == '__main__':
+    main()
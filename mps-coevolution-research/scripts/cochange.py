@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Matriz esparsa de co-mudança commit × arquivo
+Autor: Ana Carolina Poltronieri
+Propósito: Responder quais arquivos mudam junto com um structure.mps (e com
+que frequência), regras metamodelo → modelo com suporte/confiança e grupos
+de arquivos que costumam mudar juntos, sobre o histórico completo em memória
+"""
+
+import argparse
+from collections import Counter
+
+import numpy as np
+
+from coevolution import ASPECTS, MODEL, OTHER_METAMODEL, PathClassifier
+from git_history import iter_commits
+
+
+def gather_rows(indptr, indices, rows):
+    """Concatena as linhas `rows` de uma matriz CSR (sem laço em Python)"""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    total = int(lengths.sum())
+    if not total:
+        return indices[:0]
+    # posição de cada elemento: início da linha + deslocamento dentro dela
+    offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return indices[np.repeat(starts, lengths) + offsets]
+
+
+class CoChangeMatrix:
+    """Incidência commit × arquivo em CSR (e a transposta), com arquivos codificados por inteiros
+
+    Renomeações mantêm o código do arquivo: `paths[code]` é o nome mais recente.
+    """
+
+    def __init__(self, hashes, paths, indptr, indices):
+        self.hashes = hashes
+        self.paths = paths
+        self.codes = {path: code for code, path in enumerate(paths)}
+        self.indptr = indptr
+        self.indices = indices
+        # transposta (arquivo → commits) por ordenação estável das colunas
+        order = np.argsort(indices, kind='stable')
+        self.file_commits = np.repeat(np.arange(len(hashes), dtype=np.int32), np.diff(indptr))[order]
+        self.file_indptr = np.zeros(len(paths) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(indices, minlength=len(paths)), out=self.file_indptr[1:])
+        self.support = np.diff(self.file_indptr)
+        self._pairs = None
+
+    @classmethod
+    def from_commits(cls, commits, suffix='.mps', max_files=None):
+        """Constrói a matriz a partir de CommitRecords (o `git log` vem do mais novo ao mais antigo)
+
+        Commits com mais de `max_files` arquivos (reformatações em massa,
+        migrações de versão do MPS) podem ser ignorados para não dominar os pares.
+        """
+        codes = {}
+        paths = []
+        hashes = []
+        indptr = [0]
+        indices = []
+
+        for commit in reversed(commits):
+            row = set()
+            for change in commit.files:
+                if not change.path.endswith(suffix):
+                    continue
+                code = codes.pop(change.old_path, None) if change.old_path else None
+                if code is not None:
+                    paths[code] = change.path
+                else:
+                    code = codes.get(change.path)
+                    if code is None:
+                        code = len(paths)
+                        paths.append(change.path)
+                codes[change.path] = code
+                row.add(code)
+            if not row or (max_files and len(row) > max_files):
+                continue
+            hashes.append(commit.hash)
+            indices.extend(sorted(row))
+            indptr.append(len(indices))
+
+        return cls(hashes, paths,
+                   np.asarray(indptr, dtype=np.int64),
+                   np.asarray(indices, dtype=np.int32))
+
+    @property
+    def shape(self):
+        return len(self.hashes), len(self.paths)
+
+    def code(self, path):
+        """Código inteiro de um caminho (também aceita sufixo único do caminho)"""
+        code = self.codes.get(path)
+        if code is not None:
+            return code
+        matches = [c for c, p in enumerate(self.paths) if p.endswith(path)]
+        if len(matches) != 1:
+            raise KeyError(f"Arquivo não encontrado ou ambíguo: {path} ({len(matches)} candidatos)")
+        return matches[0]
+
+    def cochange_counts(self, code):
+        """Vetor com quantos commits cada arquivo compartilha com `code`"""
+        rows = self.file_commits[self.file_indptr[code]:self.file_indptr[code + 1]]
+        counts = np.bincount(gather_rows(self.indptr, self.indices, rows), minlength=len(self.paths))
+        counts[code] = 0
+        return counts
+
+    def top_cochanges(self, path, limit=10, min_count=1, mask=None):
+        """Arquivos que mais mudam junto com `path`: (caminho, commits juntos, confiança)
+
+        Confiança = commits juntos / commits de `path`; `mask` booleana
+        opcional restringe os arquivos candidatos.
+        """
+        code = self.code(path)
+        counts = self.cochange_counts(code)
+        if mask is not None:
+            counts = np.where(mask, counts, 0)
+        candidates = np.flatnonzero(counts >= max(min_count, 1))
+        top = candidates[np.argsort(-counts[candidates], kind='stable')][:limit]
+        support = max(int(self.support[code]), 1)
+        return [(self.paths[i], int(counts[i]), float(counts[i] / support)) for i in top]
+
+    def categories(self, classifier=None):
+        """Categoria (aspecto, outro metamodelo ou modelo) de cada arquivo"""
+        classifier = classifier or PathClassifier()
+        return np.fromiter((classifier(path) for path in self.paths), dtype=np.int8, count=len(self.paths))
+
+    def association_rules(self, antecedents=('structure',), min_count=2, min_confidence=0.1,
+                          classifier=None):
+        """Regras metamodelo → modelo: (antecedente, consequente, contagem, suporte, confiança)
+
+        Suporte = commits com os dois / total de commits; confiança =
+        commits com os dois / commits do antecedente.
+        """
+        categories = self.categories(classifier)
+        antecedent_codes = [ASPECTS.index(a) if a in ASPECTS else OTHER_METAMODEL for a in antecedents]
+        sources = np.flatnonzero(np.isin(categories, antecedent_codes))
+        models = categories == MODEL
+        n_commits = max(len(self.hashes), 1)
+
+        rules = []
+        for source in sources:
+            if self.support[source] < min_count:
+                continue
+            counts = np.where(models, self.cochange_counts(source), 0)
+            confidence = counts / self.support[source]
+            for target in np.flatnonzero((counts >= min_count) & (confidence >= min_confidence)):
+                rules.append((self.paths[source], self.paths[target], int(counts[target]),
+                              float(counts[target] / n_commits), float(confidence[target])))
+        rules.sort(key=lambda rule: (-rule[4], -rule[2]))
+        return rules
+
+    def pair_counts(self, max_files=50):
+        """Contagem de commits por par de arquivos (a < b), ignorando commits muito grandes
+
+        Retorna (a, b, contagem) como arrays; calculado uma vez e memoizado.
+        """
+        if self._pairs is not None and self._pairs[0] == max_files:
+            return self._pairs[1]
+        n = len(self.paths)
+        lengths = np.diff(self.indptr)
+        keys = []
+        triangles = {}
+        for row in np.flatnonzero((lengths >= 2) & (lengths <= max_files)):
+            files = self.indices[self.indptr[row]:self.indptr[row + 1]].astype(np.int64)
+            k = len(files)
+            if k not in triangles:
+                triangles[k] = np.triu_indices(k, 1)
+            a, b = triangles[k]
+            keys.append(files[a] * n + files[b])
+        if keys:
+            unique, counts = np.unique(np.concatenate(keys), return_counts=True)
+        else:
+            unique, counts = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        pairs = (unique // n, unique % n, counts)
+        self._pairs = (max_files, pairs)
+        return pairs
+
+    def clusters(self, min_count=3, min_jaccard=0.5, max_files=50):
+        """Grupos de arquivos ligados por pares com co-mudança forte (componentes conexas)
+
+        Um par entra no grafo se mudou junto em pelo menos `min_count`
+        commits e Jaccard (juntos / commits de qualquer um) >= `min_jaccard`.
+        """
+        a, b, counts = self.pair_counts(max_files)
+        jaccard = counts / (self.support[a] + self.support[b] - counts)
+        keep = (counts >= min_count) & (jaccard >= min_jaccard)
+
+        parent = np.arange(len(self.paths))
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for x, y in zip(a[keep], b[keep]):
+            rx, ry = find(x), find(y)
+            if rx != ry:
+                parent[max(rx, ry)] = min(rx, ry)
+
+        members = {}
+        for node in np.unique(np.concatenate([a[keep], b[keep]])):
+            members.setdefault(find(node), []).append(self.paths[node])
+        return sorted((sorted(group) for group in members.values()), key=len, reverse=True)
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description='Co-mudança de arquivos .mps ao longo do histórico',
+        epilog='Exemplo: python cochange.py repositories/mbeddr.core --file '
+               'code/languages/com.mbeddr.core/languages/com.mbeddr.core.base/models/structure.mps'
+    )
+    parser.add_argument('repo_path', help='Repositório git a analisar')
+    parser.add_argument('--file', help='Lista os arquivos que mais mudam junto com este')
+    parser.add_argument('--rules', action='store_true', help='Regras structure.mps → modelo')
+    parser.add_argument('--clusters', action='store_true', help='Grupos de arquivos que mudam juntos')
+    parser.add_argument('--top', type=int, default=10, help='Número de resultados (padrão: 10)')
+    parser.add_argument('--min-count', type=int, default=3,
+                        help='Mínimo de commits em comum (padrão: 3)')
+    parser.add_argument('--max-files', type=int, default=None,
+                        help='Ignora commits com mais arquivos .mps que isto')
+    args = parser.parse_args()
+
+    matrix = CoChangeMatrix.from_commits(list(iter_commits(args.repo_path)), max_files=args.max_files)
+    n_commits, n_files = matrix.shape
+    print(f"Matriz: {n_commits} commits × {n_files} arquivos, {len(matrix.indices)} entradas")
+
+    if args.file:
+        print(f"\nMudam junto com {args.file}:")
+        for path, count, confidence in matrix.top_cochanges(args.file, args.top, args.min_count):
+            print(f"  {count:6d}  {confidence:6.1%}  {path}")
+
+    if args.rules:
+        print("\nRegras structure.mps → modelo:")
+        for source, target, count, support, confidence in matrix.association_rules(
+                min_count=args.min_count)[:args.top]:
+            print(f"  conf {confidence:6.1%}  sup {support:7.3%}  ({count})  {source} → {target}")
+
+    if args.clusters:
+        groups = matrix.clusters(args.min_count)
+        print(f"\n{len(groups)} grupos de co-mudança:")
+        for group in groups[:args.top]:
+            sizes = Counter(path.rsplit('/', 1)[-1] for path in group)
+            print(f"  {len(group):4d} arquivos: {', '.join(f'{n}×{name}' for name, n in sizes.most_common(4))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Séries temporais de co-evolução metamodelo × modelo
+Autor: Ana Carolina Poltronieri
+Propósito: Agrupar as mudanças de aspectos do metamodelo e de instâncias de
+modelo por dia ou semana e medir o acoplamento entre elas (correlação com
+defasagem e tempo de resposta dos modelos às mudanças do metamodelo)
+"""
+
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+from git_history import iter_commits
+from not_using_this import MbeddrModelDiscovery
+
+ASPECTS = ('structure', 'behavior', 'editor', 'typesystem', 'constraints', 'migration')
+# colunas da matriz de contagens: um aspecto por coluna, depois os demais arquivos
+CATEGORIES = ASPECTS + ('other_metamodel', 'model')
+OTHER_METAMODEL = CATEGORIES.index('other_metamodel')
+MODEL = CATEGORIES.index('model')
+PERIOD_DAYS = {'D': 1, 'W': 7}
+SECONDS_PER_DAY = 86400.0
+
+
+class PathClassifier:
+    """Categoria de cada caminho .mps pelas regras do MbeddrModelDiscovery (memoizada)"""
+
+    def __init__(self, discovery=None):
+        self.discovery = discovery or MbeddrModelDiscovery('.')
+        self.codes = {}
+
+    def __call__(self, path):
+        code = self.codes.get(path)
+        if code is None:
+            code = self.codes[path] = self._classify(path)
+        return code
+
+    def _classify(self, path):
+        if not path.endswith('.mps'):
+            return -1
+        name = path.rsplit('/', 1)[-1].lower()
+        for code, aspect in enumerate(ASPECTS):
+            # aspectos com o nome da linguagem no arquivo: com.mbeddr.doc.markdown.structure.mps
+            if name == f"{aspect}.mps" or name.endswith(f".{aspect}.mps"):
+                return code
+        file_type = self.discovery._classify_by_name(name)
+        if self.discovery.is_metamodel('/' + path, file_type):
+            return OTHER_METAMODEL
+        return MODEL
+
+
+def _timestamp(date):
+    return datetime.strptime(date, '%Y-%m-%d %H:%M:%S %z').timestamp()
+
+
+class CoevolutionSeries:
+    """Contagens de mudanças por período (linhas) e categoria (colunas)
+
+    `file_counts` conta arquivos alterados; `commit_counts` conta commits que
+    tocam cada categoria. `times` e `touched` guardam, por commit em ordem
+    cronológica, o instante (segundos) e as categorias tocadas, base do
+    cálculo dos tempos de resposta.
+    """
+
+    def __init__(self, periods, file_counts, commit_counts, times, touched, freq):
+        self.periods = periods
+        self.file_counts = file_counts
+        self.commit_counts = commit_counts
+        self.times = times
+        self.touched = touched
+        self.freq = freq
+
+    @classmethod
+    def from_commits(cls, commits, freq='W', classifier=None):
+        """Constrói as séries a partir de CommitRecords (qualquer ordem)"""
+        if freq not in PERIOD_DAYS:
+            raise ValueError(f"Período desconhecido: {freq} (opções: {', '.join(PERIOD_DAYS)})")
+        classifier = classifier or PathClassifier()
+
+        times = np.fromiter((_timestamp(c.date) for c in commits), dtype=np.float64, count=len(commits))
+        change_commit, change_category = [], []
+        for i, commit in enumerate(commits):
+            for change in commit.files:
+                code = classifier(change.path)
+                if code >= 0:
+                    change_commit.append(i)
+                    change_category.append(code)
+        change_commit = np.asarray(change_commit, dtype=np.int64)
+        change_category = np.asarray(change_category, dtype=np.int64)
+
+        n_categories = len(CATEGORIES)
+        touched = np.zeros((len(commits), n_categories), dtype=bool)
+        touched[change_commit, change_category] = True
+
+        # dias desde 1970-01-01 (UTC); semanas começam na segunda-feira
+        days = np.floor(times / SECONDS_PER_DAY).astype(np.int64)
+        step = PERIOD_DAYS[freq]
+        buckets = (days + (3 if step == 7 else 0)) // step
+        first = buckets.min() if len(buckets) else 0
+        n_periods = int(buckets.max() - first + 1) if len(buckets) else 0
+        bucket = buckets - first
+
+        file_counts = np.bincount(
+            bucket[change_commit] * n_categories + change_category,
+            minlength=n_periods * n_categories
+        ).reshape(n_periods, n_categories)
+        commit_rows, commit_cols = np.nonzero(touched)
+        commit_counts = np.bincount(
+            bucket[commit_rows] * n_categories + commit_cols,
+            minlength=n_periods * n_categories
+        ).reshape(n_periods, n_categories)
+
+        start_day = first * step - (3 if step == 7 else 0)
+        periods = np.datetime64('1970-01-01', 'D') + start_day + np.arange(n_periods) * step
+
+        order = np.argsort(times, kind='stable')
+        return cls(periods, file_counts, commit_counts, times[order], touched[order], freq)
+
+    def category_series(self, categories, by='commits'):
+        """Soma das colunas das categorias dadas (nomes) por período"""
+        counts = self.commit_counts if by == 'commits' else self.file_counts
+        columns = [CATEGORIES.index(name) for name in categories]
+        return counts[:, columns].sum(axis=1)
+
+    def metamodel_series(self, by='commits'):
+        return self.category_series(ASPECTS + ('other_metamodel',), by)
+
+    def model_series(self, by='commits'):
+        return self.category_series(('model',), by)
+
+    def cross_correlation(self, max_lag=8, aspects=None, by='commits'):
+        """Correlação entre metamodelo(t) e modelo(t + lag) para lag em [-max_lag, max_lag]
+
+        Lag positivo significa modelos mudando depois do metamodelo.
+        """
+        x = self.category_series(aspects, by) if aspects else self.metamodel_series(by)
+        y = self.model_series(by)
+        lags = np.arange(-max_lag, max_lag + 1)
+        n = len(x)
+        if n < 2 or x.std() == 0 or y.std() == 0:
+            return lags, np.zeros(len(lags))
+        x = (x - x.mean()) / x.std()
+        y = (y - y.mean()) / y.std()
+        full = np.correlate(y, x, mode='full') / n
+        # full[i] soma y[t + lag] * x[t] com lag = i - (n - 1)
+        index = lags + n - 1
+        valid = (index >= 0) & (index < len(full))
+        corr = np.zeros(len(lags))
+        corr[valid] = full[index[valid]]
+        return lags, corr
+
+    def response_times(self, aspects=None):
+        """Dias entre cada commit de metamodelo e o próximo commit que altera modelos
+
+        Commits que alteram metamodelo e modelos juntos respondem em 0 dias;
+        mudanças sem resposta até o fim do histórico são descartadas.
+        """
+        columns = [CATEGORIES.index(name) for name in (aspects or ASPECTS + ('other_metamodel',))]
+        meta_times = self.times[self.touched[:, columns].any(axis=1)]
+        model_times = self.times[self.touched[:, MODEL]]
+        if not len(meta_times) or not len(model_times):
+            return np.zeros(0)
+        next_model = np.searchsorted(model_times, meta_times, side='left')
+        answered = next_model < len(model_times)
+        return (model_times[next_model[answered]] - meta_times[answered]) / SECONDS_PER_DAY
+
+    def summary(self, max_lag=8):
+        """Resumo serializável: totais, correlação com defasagem e tempos de resposta"""
+        lags, corr = self.cross_correlation(max_lag)
+        structure_lags, structure_corr = self.cross_correlation(max_lag, aspects=('structure',))
+        response = self.response_times()
+        structure_response = self.response_times(('structure',))
+
+        def distribution(values):
+            if not len(values):
+                return {}
+            p50, p75, p90 = np.percentile(values, [50, 75, 90])
+            return {
+                'count': int(len(values)),
+                'same_commit_share': float(np.mean(values == 0)),
+                'mean_days': float(values.mean()),
+                'median_days': float(p50),
+                'p75_days': float(p75),
+                'p90_days': float(p90)
+            }
+
+        # série vazia ou constante: correlação indefinida, sem pico
+        defined = bool(np.any(corr))
+        return {
+            'period': self.freq,
+            'periods': int(len(self.periods)),
+            'first_period': str(self.periods[0]) if len(self.periods) else None,
+            'file_changes': dict(zip(CATEGORIES, map(int, self.file_counts.sum(axis=0)))),
+            'commits': dict(zip(CATEGORIES, map(int, self.commit_counts.sum(axis=0)))),
+            'cross_correlation': {
+                'lags': lags.tolist(),
+                'metamodel_model': np.round(corr, 4).tolist(),
+                'structure_model': np.round(structure_corr, 4).tolist(),
+                'peak_lag': int(lags[np.argmax(corr)]) if defined else None,
+                'peak_correlation': float(corr.max()) if defined else None
+            },
+            'response_time': distribution(response),
+            'structure_response_time': distribution(structure_response)
+        }
+
+    def to_frame(self, by='commits'):
+        """Tabela pandas período × categoria (para exportação colunar)"""
+        import pandas as pd
+        counts = self.commit_counts if by == 'commits' else self.file_counts
+        frame = pd.DataFrame(counts.astype(np.int32), columns=list(CATEGORIES))
+        frame.insert(0, 'period', pd.to_datetime(self.periods))
+        return frame
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description='Séries de co-evolução metamodelo × modelo de um repositório MPS',
+        epilog='Exemplo: python coevolution.py repositories/mbeddr.core --period W --max-lag 12'
+    )
+    parser.add_argument('repo_path', help='Repositório git a analisar')
+    parser.add_argument('--period', choices=sorted(PERIOD_DAYS), default='W',
+                        help='Tamanho do período: D (dia) ou W (semana); padrão: W')
+    parser.add_argument('--max-lag', type=int, default=8, help='Defasagem máxima em períodos (padrão: 8)')
+    args = parser.parse_args()
+
+    commits = list(iter_commits(args.repo_path))
+    series = CoevolutionSeries.from_commits(commits, args.period)
+    summary = series.summary(args.max_lag)
+
+    print(f"{summary['periods']} períodos ({args.period}) desde {summary['first_period']}")
+    print("Commits por categoria:")
+    for category, count in summary['commits'].items():
+        print(f"  {category:16} {count:7d}")
+    cc = summary['cross_correlation']
+    print("Correlação metamodelo(t) × modelo(t + lag):")
+    for lag, value in zip(cc['lags'], cc['metamodel_model']):
+        print(f"  lag {lag:+3d}: {value:+.3f}")
+    response = summary['response_time']
+    if response:
+        print(f"Resposta dos modelos: mediana {response['median_days']:.1f} dias, "
+              f"p90 {response['p90_days']:.1f} dias, "
+              f"{response['same_commit_share']:.0%} no mesmo commit")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Índice invertido de uso de conceitos
+Autor: Ana Carolina Poltronieri
+Propósito: Responder rapidamente quais modelos instanciam um conceito (ou
+usam uma linguagem) em todos os repositórios, sem varrer o XML de novo
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import xml.etree.ElementTree as ET
+from collections import Counter
+from pathlib import Path
+
+from mps_parser import LanguageUse, ModelInfo, Node, RegistryConcept, RegistryLanguage, \
+    iter_model, iter_model_files
+from parallel import map_in_chunks
+
+DEFAULT_INDEX_PATH = 'data/concept_index.sqlite'
+
+# id de linguagem no registry: uuid de 36 caracteres (8-4-4-4-12 hexadecimais)
+UUID_PATTERN = re.compile(r'[0-9a-fA-F]{8}(-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12}')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS repositories (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS models (
+    id INTEGER PRIMARY KEY,
+    repo INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    ref TEXT,
+    size INTEGER,
+    mtime INTEGER,
+    UNIQUE (repo, path)
+);
+CREATE TABLE IF NOT EXISTS languages (
+    id INTEGER PRIMARY KEY,
+    uuid TEXT UNIQUE NOT NULL,
+    name TEXT
+);
+CREATE INDEX IF NOT EXISTS languages_by_name ON languages (name);
+CREATE TABLE IF NOT EXISTS concepts (
+    id INTEGER PRIMARY KEY,
+    language INTEGER NOT NULL,
+    concept_id TEXT NOT NULL,
+    name TEXT,
+    UNIQUE (language, concept_id)
+);
+CREATE INDEX IF NOT EXISTS concepts_by_name ON concepts (name);
+CREATE TABLE IF NOT EXISTS concept_usage (
+    concept INTEGER NOT NULL,
+    model INTEGER NOT NULL,
+    node_count INTEGER NOT NULL,
+    PRIMARY KEY (concept, model)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS concept_usage_by_model ON concept_usage (model);
+CREATE TABLE IF NOT EXISTS language_usage (
+    language INTEGER NOT NULL,
+    model INTEGER NOT NULL,
+    node_count INTEGER NOT NULL,
+    PRIMARY KEY (language, model)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS language_usage_by_model ON language_usage (model);
+"""
+
+
+def scan_model(path):
+    """Extrai de um modelo o registry e a contagem de nós por conceito"""
+    ref = None
+    languages = {}
+    concepts = {}
+    counts = Counter()
+    try:
+        for record in iter_model(path):
+            kind = type(record)
+            if kind is Node:
+                counts[record.concept] += 1
+            elif kind is RegistryConcept:
+                concepts[record.index] = (record.language_id, record.id, record.name)
+            elif kind is RegistryLanguage:
+                languages[record.id] = record.name
+            elif kind is LanguageUse:
+                languages.setdefault(record.id, record.name)
+            elif kind is ModelInfo:
+                ref = record.ref
+    except (ET.ParseError, OSError) as e:
+        print(f"Erro ao ler modelo {path}: {e}")
+
+    usage = [
+        (concepts[index], count) for index, count in counts.items() if index in concepts
+    ]
+    return path, ref, languages, usage
+
+
+class ConceptIndex:
+    """Índice conceito → modelos e linguagem → modelos, persistido em SQLite"""
+
+    def __init__(self, db_path=DEFAULT_INDEX_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.executescript(SCHEMA)
+        self._language_ids = dict(self.conn.execute("SELECT uuid, id FROM languages"))
+        self._concept_ids = {
+            (language, concept_id): cid
+            for cid, language, concept_id in self.conn.execute(
+                "SELECT id, language, concept_id FROM concepts"
+            )
+        }
+
+    def close(self):
+        self.conn.close()
+
+    def _repo_id(self, repo_path):
+        key = str(Path(repo_path).resolve())
+        self.conn.execute("INSERT OR IGNORE INTO repositories (path) VALUES (?)", (key,))
+        return self.conn.execute("SELECT id FROM repositories WHERE path = ?", (key,)).fetchone()[0]
+
+    def _language_id(self, uuid, name):
+        lid = self._language_ids.get(uuid)
+        if lid is None:
+            lid = self.conn.execute(
+                "INSERT INTO languages (uuid, name) VALUES (?, ?)", (uuid, name)
+            ).lastrowid
+            self._language_ids[uuid] = lid
+        return lid
+
+    def _concept_id(self, language, concept_id, name):
+        key = (language, concept_id)
+        cid = self._concept_ids.get(key)
+        if cid is None:
+            cid = self.conn.execute(
+                "INSERT INTO concepts (language, concept_id, name) VALUES (?, ?, ?)",
+                (language, concept_id, name)
+            ).lastrowid
+            self._concept_ids[key] = cid
+        return cid
+
+    def _drop_model(self, model_id):
+        self.conn.execute("DELETE FROM concept_usage WHERE model = ?", (model_id,))
+        self.conn.execute("DELETE FROM language_usage WHERE model = ?", (model_id,))
+        self.conn.execute("DELETE FROM models WHERE id = ?", (model_id,))
+
+    def update(self, repo_path, workers=1):
+        """Atualiza o índice de um repositório, relendo só os arquivos alterados"""
+        repo_path = Path(repo_path)
+        with self.conn:
+            repo_id = self._repo_id(repo_path)
+
+        known = {
+            path: (model_id, size, mtime)
+            for model_id, path, size, mtime in self.conn.execute(
+                "SELECT id, path, size, mtime FROM models WHERE repo = ?", (repo_id,)
+            )
+        }
+
+        changed = []
+        stats = {}
+        seen = set()
+        for full_path in iter_model_files(repo_path):
+            rel_path = os.path.relpath(full_path, repo_path)
+            seen.add(rel_path)
+            st = os.stat(full_path)
+            previous = known.get(rel_path)
+            if previous and previous[1] == st.st_size and previous[2] == st.st_mtime_ns:
+                continue
+            stats[full_path] = (rel_path, st.st_size, st.st_mtime_ns)
+            changed.append(full_path)
+
+        removed = [entry[0] for path, entry in known.items() if path not in seen]
+
+        with self.conn:
+            for model_id in removed:
+                self._drop_model(model_id)
+
+            for path, ref, languages, usage in map_in_chunks(scan_model, changed, workers, 64):
+                rel_path, size, mtime = stats[path]
+                previous = known.get(rel_path)
+                if previous:
+                    self._drop_model(previous[0])
+                model_id = self.conn.execute(
+                    "INSERT INTO models (repo, path, ref, size, mtime) VALUES (?, ?, ?, ?, ?)",
+                    (repo_id, rel_path, ref, size, mtime)
+                ).lastrowid
+
+                language_nodes = Counter({self._language_id(uuid, name): 0
+                                          for uuid, name in languages.items()})
+                concept_rows = []
+                for (language_uuid, concept_id, name), count in usage:
+                    language = self._language_id(language_uuid, languages.get(language_uuid))
+                    concept_rows.append((self._concept_id(language, concept_id, name), model_id, count))
+                    language_nodes[language] += count
+
+                self.conn.executemany("INSERT INTO concept_usage VALUES (?, ?, ?)", concept_rows)
+                self.conn.executemany(
+                    "INSERT INTO language_usage VALUES (?, ?, ?)",
+                    ((language, model_id, count) for language, count in language_nodes.items())
+                )
+
+        return {'updated': len(changed), 'removed': len(removed), 'unchanged': len(seen) - len(changed)}
+
+    def models_for_concept(self, concept):
+        """Modelos que instanciam o conceito (nome completo ou id numérico)"""
+        column = 'c.concept_id' if concept.isdigit() else 'c.name'
+        return self.conn.execute(
+            "SELECT r.path, m.path, m.ref, u.node_count FROM concepts c "
+            "JOIN concept_usage u ON u.concept = c.id "
+            "JOIN models m ON m.id = u.model "
+            "JOIN repositories r ON r.id = m.repo "
+            f"WHERE {column} = ? ORDER BY u.node_count DESC", (concept,)
+        ).fetchall()
+
+    def models_for_language(self, language):
+        """Modelos que usam a linguagem (uuid ou nome), com o número de nós dela"""
+        # nomes de linguagem nem sempre têm ponto: decide pelo formato do uuid
+        column = 'l.uuid' if UUID_PATTERN.fullmatch(language) else 'l.name'
+        return self.conn.execute(
+            "SELECT r.path, m.path, m.ref, u.node_count FROM languages l "
+            "JOIN language_usage u ON u.language = l.id "
+            "JOIN models m ON m.id = u.model "
+            "JOIN repositories r ON r.id = m.repo "
+            f"WHERE {column} = ? ORDER BY u.node_count DESC", (language,)
+        ).fetchall()
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description='Índice de uso de conceitos MPS entre repositórios',
+        epilog='Exemplo: python concept_index.py --update repositories/* '
+               '--concept com.mbeddr.doc.structure.ScaleDownNotUp100'
+    )
+    parser.add_argument('--db', default=DEFAULT_INDEX_PATH,
+                        help=f'Banco SQLite do índice (padrão: {DEFAULT_INDEX_PATH})')
+    parser.add_argument('--update', nargs='*', default=[], metavar='REPO',
+                        help='Repositórios a (re)indexar')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Processos usados para ler os modelos alterados')
+    parser.add_argument('--concept', help='Lista os modelos que instanciam o conceito')
+    parser.add_argument('--language', help='Lista os modelos que usam a linguagem')
+    args = parser.parse_args()
+
+    index = ConceptIndex(args.db)
+
+    for repo_path in args.update:
+        stats = index.update(repo_path, args.workers)
+        print(f"{repo_path}: {stats['updated']} atualizados, {stats['removed']} removidos, "
+              f"{stats['unchanged']} sem alteração")
+
+    if args.concept:
+        for repo, path, ref, count in index.models_for_concept(args.concept):
+            print(f"{count:7d}  {Path(repo).name}/{path}")
+
+    if args.language:
+        for repo, path, ref, count in index.models_for_language(args.language):
+            print(f"{count:7d}  {Path(repo).name}/{path}")
+
+    index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Grafo de dependências entre modelos MPS
+Autor: Ana Carolina Poltronieri
+Propósito: Ler `<imports>` e `<languages>` de todos os modelos e responder,
+em milissegundos, quais modelos são afetados (transitivamente) quando o
+structure.mps de uma linguagem muda
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import numpy as np
+
+from cochange import gather_rows
+from mps_parser import LanguageUse, ModelImport, ModelInfo, RegistryLanguage, iter_model, iter_model_files
+from parallel import map_in_chunks
+
+DEFAULT_GRAPH_PATH = 'data/dependency_graph.sqlite'
+GRAPH_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    repo TEXT NOT NULL,
+    path TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    ref TEXT,
+    imports TEXT NOT NULL,
+    languages TEXT NOT NULL,
+    names TEXT NOT NULL,
+    PRIMARY KEY (repo, path)
+);
+"""
+
+
+def model_id(ref):
+    """Identificador estável de um modelo: `r:uuid(nome)` → `r:uuid`
+
+    Referências qualificadas pelo módulo (`módulo/java:java.lang(JDK/)`)
+    perdem o prefixo do módulo.
+    """
+    if not ref:
+        return None
+    ref = ref.split('(', 1)[0]
+    return ref.rsplit('/', 1)[-1]
+
+
+def model_name(ref):
+    """Nome legível do modelo a partir da referência"""
+    if ref and '(' in ref:
+        return ref.split('(', 1)[1].rstrip(')')
+    return ref
+
+
+def scan_dependencies(path):
+    """Lê só o cabeçalho do modelo: referência, imports e linguagens usadas"""
+    ref = None
+    imports = []
+    languages = []
+    language_names = {}
+    try:
+        for record in iter_model(path, include_nodes=False):
+            kind = type(record)
+            if kind is ModelImport:
+                imports.append(model_id(record.ref))
+            elif kind is LanguageUse:
+                languages.append(record.id)
+                language_names[record.name] = record.id
+            elif kind is RegistryLanguage:
+                language_names[record.name] = record.id
+            elif kind is ModelInfo:
+                ref = record.ref
+    except (ET.ParseError, OSError) as e:
+        print(f"Erro ao ler modelo {path}: {e}")
+    return path, ref, imports, languages, language_names
+
+
+class DependencyGraph:
+    """Modelos e linguagens como vértices inteiros; arestas "depende de" em CSR reverso
+
+    Arestas: modelo → modelo importado, modelo → linguagem usada e
+    linguagem → seu modelo structure. A busca reversa a partir de um
+    structure.mps alcança as linguagens que o estendem (via imports do
+    structure delas) e todos os modelos que usam qualquer uma delas.
+    Uso de linguagens via devkit não é resolvido (os .devkit não são lidos).
+    """
+
+    def __init__(self, cache_file=DEFAULT_GRAPH_PATH):
+        self.cache_file = Path(cache_file)
+        # (repositório, caminho relativo) -> (tamanho, mtime_ns, ref, imports, linguagens, nomes)
+        self.records = {}
+        self._load()
+        self._graph = None
+
+    def _connect(self):
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.cache_file), timeout=60)
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _load(self):
+        if not self.cache_file.exists():
+            return
+        try:
+            conn = self._connect()
+        except sqlite3.DatabaseError:
+            # arquivo que não é um banco SQLite: começa vazio
+            return
+        try:
+            rows = conn.execute(
+                "SELECT repo, path, size, mtime, ref, imports, languages, names FROM records "
+                "WHERE version = ?", (GRAPH_VERSION,)
+            )
+            for repo, path, size, mtime, ref, imports, languages, names in rows:
+                self.records[(repo, path)] = (size, mtime, ref, json.loads(imports),
+                                              json.loads(languages), json.loads(names))
+        finally:
+            conn.close()
+
+    def save(self):
+        """Regrava os registros (só dados: abrir o cache não executa código)"""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM records")
+                conn.executemany(
+                    "INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        (repo, path, GRAPH_VERSION, size, mtime, ref, json.dumps(imports),
+                         json.dumps(languages), json.dumps(names, ensure_ascii=False))
+                        for (repo, path), (size, mtime, ref, imports, languages, names)
+                        in self.records.items()
+                    )
+                )
+        finally:
+            conn.close()
+
+    def update(self, repo_path, workers=1):
+        """Relê apenas os modelos novos ou alterados do repositório"""
+        repo_key = str(Path(repo_path).resolve())
+        known = {rel: entry for (repo, rel), entry in self.records.items() if repo == repo_key}
+
+        changed = []
+        stats = {}
+        seen = set()
+        for full_path in iter_model_files(repo_path):
+            rel_path = os.path.relpath(full_path, repo_path)
+            seen.add(rel_path)
+            st = os.stat(full_path)
+            previous = known.get(rel_path)
+            if previous and previous[0] == st.st_size and previous[1] == st.st_mtime_ns:
+                continue
+            stats[full_path] = (rel_path, st.st_size, st.st_mtime_ns)
+            changed.append(full_path)
+
+        removed = [rel for rel in known if rel not in seen]
+        for rel_path in removed:
+            del self.records[(repo_key, rel_path)]
+
+        for path, ref, imports, languages, names in map_in_chunks(scan_dependencies, changed, workers, 64):
+            rel_path, size, mtime = stats[path]
+            self.records[(repo_key, rel_path)] = (size, mtime, ref, imports, languages, names)
+
+        if changed or removed:
+            self._graph = None
+        return {'updated': len(changed), 'removed': len(removed), 'unchanged': len(seen) - len(changed)}
+
+    def _build(self):
+        """Numera os vértices e monta a adjacência reversa (dependência → dependentes)"""
+        ids = {}
+        labels = []
+        files = {}
+
+        def vertex(key):
+            index = ids.get(key)
+            if index is None:
+                index = ids[key] = len(labels)
+                labels.append(key)
+            return index
+
+        language_ids = {}
+        for size, mtime, ref, imports, languages, names in self.records.values():
+            language_ids.update(names)
+
+        sources, targets = [], []
+        for (repo, rel_path), (size, mtime, ref, imports, languages, names) in self.records.items():
+            if not ref:
+                continue
+            model = vertex(model_id(ref))
+            files.setdefault(model, []).append((repo, rel_path, ref))
+            for imported in imports:
+                if imported:
+                    sources.append(model)
+                    targets.append(vertex(imported))
+            for language in languages:
+                sources.append(model)
+                targets.append(vertex(f"language:{language}"))
+            name = model_name(ref)
+            if name and name.endswith('.structure'):
+                language = language_ids.get(name[:-len('.structure')])
+                if language:
+                    sources.append(vertex(f"language:{language}"))
+                    targets.append(model)
+
+        sources = np.asarray(sources, dtype=np.int32)
+        targets = np.asarray(targets, dtype=np.int32)
+        order = np.argsort(targets, kind='stable')
+        indptr = np.zeros(len(labels) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=len(labels)), out=indptr[1:])
+        self._graph = {
+            'ids': ids,
+            'labels': labels,
+            'files': files,
+            'languages': language_ids,
+            'indptr': indptr,
+            'dependents': sources[order]
+        }
+        return self._graph
+
+    @property
+    def graph(self):
+        return self._graph or self._build()
+
+    def resolve(self, target):
+        """Vértice de um alvo: caminho de arquivo, referência de modelo, nome ou uuid de linguagem"""
+        graph = self.graph
+        ids = graph['ids']
+        if target in graph['languages']:
+            return ids.get(f"language:{graph['languages'][target]}")
+        if f"language:{target}" in ids:
+            return ids[f"language:{target}"]
+        if model_id(target) in ids:
+            return ids[model_id(target)]
+        for vertex, entries in graph['files'].items():
+            for repo, rel_path, ref in entries:
+                if os.path.join(repo, rel_path).endswith(target):
+                    return vertex
+        return None
+
+    def affected(self, target):
+        """Modelos que dependem (transitivamente) do alvo: lista de (repositório, caminho, ref)"""
+        graph = self.graph
+        start = self.resolve(target)
+        if start is None:
+            raise KeyError(f"Alvo não encontrado no grafo: {target}")
+        indptr, dependents = graph['indptr'], graph['dependents']
+
+        visited = np.zeros(len(graph['labels']), dtype=bool)
+        visited[start] = True
+        frontier = np.array([start])
+        while len(frontier):
+            neighbours = np.unique(gather_rows(indptr, dependents, frontier))
+            frontier = neighbours[~visited[neighbours]]
+            visited[frontier] = True
+        visited[start] = False
+
+        return sorted(
+            entry for vertex in np.flatnonzero(visited)
+            for entry in graph['files'].get(int(vertex), ())
+        )
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description='Grafo de imports/linguagens entre modelos MPS e análise de impacto',
+        epilog='Exemplo: python dependency_graph.py --update repositories/* '
+               '--affected com.mbeddr.doc/languageModels/structure.mps'
+    )
+    parser.add_argument('--cache', default=DEFAULT_GRAPH_PATH,
+                        help=f'Banco SQLite dos modelos lidos (padrão: {DEFAULT_GRAPH_PATH})')
+    parser.add_argument('--update', nargs='*', default=[], metavar='REPO',
+                        help='Repositórios a (re)ler')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Processos usados para ler os modelos alterados')
+    parser.add_argument('--affected', metavar='ALVO',
+                        help='Arquivo structure.mps, referência de modelo ou linguagem alterada')
+    args = parser.parse_args()
+
+    graph = DependencyGraph(args.cache)
+    for repo_path in args.update:
+        stats = graph.update(repo_path, args.workers)
+        print(f"{repo_path}: {stats['updated']} atualizados, {stats['removed']} removidos, "
+              f"{stats['unchanged']} sem alteração")
+    if args.update:
+        graph.save()
+
+    if args.affected:
+        affected = graph.affected(args.affected)
+        print(f"{len(affected)} modelos afetados por {args.affected}:")
+        for repo, rel_path, ref in affected:
+            print(f"  {Path(repo).name}/{rel_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Série histórica da população de arquivos MPS
+Autor: Ana Carolina Poltronieri
+Propósito: Contar modelos, metamodelos e cada tipo de aspecto em todos os
+commits do histórico first-parent, aplicando os deltas (A/D/R) de cada
+commit a partir de uma árvore inicial, sem checkout de nenhuma revisão
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from blob_cache import DEFAULT_BLOB_CACHE_PATH, BlobSummaryCache
+from git_backend import open_backend
+from git_history import iter_commits
+from not_using_this import HEADER_SIZE, MbeddrModelDiscovery
+
+# tipos possíveis de classify_file_type (nome do arquivo e cabeçalho)
+CONTENT_TYPES = ('language_definition', 'model_instance', 'solution', 'devkit', 'unknown')
+
+# incrementar quando _classify_by_content mudar: os tipos guardados por sha
+# no cache de blobs deixam de valer
+CONTENT_TYPE_VERSION = 1
+
+
+class PopulationReplayer:
+    """Mantém o conjunto de arquivos MPS da revisão atual e suas contagens
+
+    Os caminhos são relativos a `repo_path`, também quando ele é um
+    subdiretório de um repositório maior.
+
+    A classificação é a do MbeddrModelDiscovery: `_classify_by_name` e, para
+    os demais arquivos, `_classify_by_content` sobre o cabeçalho do blob lido
+    do git; `is_metamodel` decide entre metamodelo e modelo. O tipo pelo
+    conteúdo é guardado por sha do blob, na memória e em `blob_cache`
+    (blob_cache.BlobSummaryCache) quando dado: cada blob é lido uma vez.
+    """
+
+    def __init__(self, repo_path, backend=None, blob_cache=None):
+        self.repo_path = repo_path
+        self.backend = backend or open_backend(repo_path)
+        self.blob_cache = blob_cache
+        # sha do blob -> tipo pelo conteúdo; os novos vão para o cache em save()
+        self.content_types = {}
+        self._new_types = {}
+        self.discovery = MbeddrModelDiscovery(repo_path)
+        self.columns = ['total_mps_files', 'metamodels', 'models'] + [
+            f"type_{name}" for name in list(self.discovery.model_patterns) + list(CONTENT_TYPES)
+        ]
+        self._column = {name: i for i, name in enumerate(self.columns)}
+        self.counts = np.zeros(len(self.columns), dtype=np.int64)
+        # caminho -> índices das colunas em que o arquivo conta
+        self.files = {}
+
+    def _classify(self, rev, path):
+        """Colunas em que um arquivo conta, ou None se não for arquivo MPS"""
+        name = path.rsplit('/', 1)[-1]
+        file_ext = os.path.splitext(name)[1].lower()
+        if file_ext not in self.discovery.mps_extensions:
+            return None
+        file_type = self.discovery._classify_by_name(name.lower())
+        if file_type is None:
+            file_type = self._content_type(rev, path)
+        group = 'metamodels' if self.discovery.is_metamodel('/' + path, file_type) else 'models'
+        return (self._column['total_mps_files'], self._column[group], self._column[f"type_{file_type}"])
+
+    def _content_type(self, rev, path):
+        """Tipo pelo cabeçalho do blob, lido só se o sha ainda não foi classificado"""
+        info = self.backend.object_info(f"{rev}:{self.backend.repo_prefix()}{path}")
+        sha = info[0] if info and info[1] == 'blob' else None
+        if sha in self.content_types:
+            return self.content_types[sha]
+        file_type = None
+        if sha and self.blob_cache is not None:
+            file_type = self.blob_cache.get(sha, 'content_type', CONTENT_TYPE_VERSION)
+        if file_type is None:
+            obj = self.backend.read_object(sha) if sha else None
+            data = obj[2] if obj else b''
+            file_type = self.discovery._classify_by_content(
+                data[:HEADER_SIZE * 4].decode('utf-8', errors='ignore')[:HEADER_SIZE]
+            )
+            if sha:
+                self._new_types[sha] = file_type
+        if sha:
+            self.content_types[sha] = file_type
+        return file_type
+
+    def save(self):
+        """Guarda no cache de blobs os tipos classificados nesta execução"""
+        if self.blob_cache is not None and self._new_types:
+            self.blob_cache.store_many(self._new_types.items(), 'content_type', CONTENT_TYPE_VERSION)
+        self._new_types = {}
+
+    def add(self, rev, path):
+        columns = self._classify(rev, path)
+        if columns is None:
+            return
+        self.remove(path)
+        self.files[path] = columns
+        self.counts[list(columns)] += 1
+
+    def remove(self, path):
+        columns = self.files.pop(path, None)
+        if columns is not None:
+            self.counts[list(columns)] -= 1
+
+    def load_tree(self, rev):
+        """Estado inicial: todos os arquivos da árvore da revisão (ls-tree)"""
+        for path, sha, mode in self.backend.walk_tree(rev):
+            self.add(rev, path)
+
+    def apply(self, commit):
+        """Aplica as mudanças de um commit (relativas ao primeiro pai)"""
+        for change in commit.files:
+            kind = change.status[0]
+            if kind == 'D':
+                self.remove(change.path)
+            elif kind == 'R':
+                self.remove(change.old_path)
+                self.add(commit.hash, change.path)
+            elif kind in ('A', 'C') or change.path not in self.files:
+                self.add(commit.hash, change.path)
+            elif kind == 'T':
+                self.remove(change.path)
+                self.add(commit.hash, change.path)
+
+
+def population_series(repo_path, rev='HEAD', since=None, backend=None, blob_cache=None):
+    """Contagens após cada commit first-parent até `rev`
+
+    Sem `since`, a reprodução começa na árvore vazia antes do primeiro commit;
+    com `since`, começa na árvore de `since` e aplica `since..rev`.
+    Retorna (colunas, hashes, datas, matriz commits × colunas).
+    """
+    replayer = PopulationReplayer(repo_path, backend, blob_cache)
+    rev_range = rev
+    if since:
+        replayer.load_tree(since)
+        rev_range = f"{since}..{rev}"
+
+    hashes, dates, rows = [], [], []
+    # --relative: só as mudanças abaixo de repo_path, com caminhos relativos a ele
+    for commit in iter_commits(repo_path, rev_range, paths=['.'], first_parent=True,
+                               extra_args=['--reverse', '--relative']):
+        replayer.apply(commit)
+        hashes.append(commit.hash)
+        dates.append(commit.date)
+        rows.append(replayer.counts.copy())
+    replayer.save()
+
+    matrix = np.vstack(rows) if rows else np.zeros((0, len(replayer.columns)), dtype=np.int64)
+    return replayer.columns, hashes, dates, matrix.astype(np.int32)
+
+
+def population_frame(columns, hashes, dates, matrix):
+    """Tabela pandas (uma linha por commit) para exportação colunar"""
+    import pandas as pd
+    frame = pd.DataFrame(matrix, columns=columns)
+    frame.insert(0, 'date', pd.to_datetime(pd.Series(dates, dtype='object'), utc=True,
+                                           format='%Y-%m-%d %H:%M:%S %z'))
+    frame.insert(0, 'hash', pd.Series(hashes, dtype='string'))
+    return frame
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description='Número de modelos/metamodelos/aspectos em cada commit do histórico',
+        epilog='Exemplo: python file_population.py repositories/mbeddr.core --every 500'
+    )
+    parser.add_argument('repo_path', help='Repositório git a analisar')
+    parser.add_argument('--rev', default='HEAD', help='Última revisão (padrão: HEAD)')
+    parser.add_argument('--since', help='Revisão inicial (a árvore dela é o ponto de partida)')
+    parser.add_argument('--every', type=int, default=250, help='Imprime uma linha a cada N commits')
+    parser.add_argument('--blob-cache', default=DEFAULT_BLOB_CACHE_PATH,
+                        help=f'Cache SQLite por sha do blob (padrão: {DEFAULT_BLOB_CACHE_PATH})')
+    parser.add_argument('--no-cache', action='store_true', help='Lê e classifica todos os blobs de novo')
+    args = parser.parse_args()
+
+    backend = open_backend(args.repo_path)
+    blob_cache = None if args.no_cache else BlobSummaryCache(args.blob_cache)
+    try:
+        columns, hashes, dates, matrix = population_series(args.repo_path, args.rev, args.since, backend,
+                                                           blob_cache)
+    finally:
+        backend.close()
+        if blob_cache is not None:
+            blob_cache.close()
+
+    shown = ['total_mps_files', 'metamodels', 'models', 'type_structure', 'type_editor']
+    indexes = [columns.index(name) for name in shown]
+    print(f"{'data':10} {'commit':10} " + ' '.join(f"{name:>15}" for name in shown))
+    for i in list(range(0, len(hashes), max(args.every, 1))) + ([len(hashes) - 1] if hashes else []):
+        print(f"{dates[i][:10]:10} {hashes[i][:10]:10} " + ' '.join(f"{matrix[i, j]:15d}" for j in indexes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Backends de acesso a objetos git
+Autor: Ana Carolina Poltronieri
+Propósito: Ler blobs e árvores de qualquer revisão sem checkout e sem
+criar um processo por objeto
+"""
+
+import subprocess
+import threading
+import time
+
+try:
+    import git
+except ImportError:
+    git = None
+
+from instrumentation import metrics
+
+
+class GitBackend:
+    """Interface comum de leitura de objetos de um repositório git"""
+
+    name = 'base'
+
+    def __init__(self, repo_path):
+        self.repo_path = repo_path
+        self._prefix = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def rev_parse(self, rev):
+        """Resolve uma revisão para o hash completo (None se não existir)"""
+        raise NotImplementedError
+
+    def object_info(self, spec):
+        """Retorna (sha, tipo, tamanho) de um objeto, ou None se não existir"""
+        raise NotImplementedError
+
+    def read_object(self, spec):
+        """Retorna (sha, tipo, conteúdo) de um objeto, ou None se não existir"""
+        raise NotImplementedError
+
+    def read_blob(self, rev, path):
+        """Conteúdo de `path` na revisão `rev` (bytes), ou None
+
+        `path` é relativo a `repo_path`, como os caminhos de walk_tree.
+        """
+        obj = self.read_object(f"{rev}:{self.repo_prefix()}{path}")
+        if obj is None or obj[1] != 'blob':
+            return None
+        return obj[2]
+
+    def read_tree(self, spec):
+        """Entradas (modo, tipo, sha, nome) de uma árvore"""
+        obj = self.read_object(spec)
+        if obj is None:
+            return []
+        if obj[1] == 'commit':
+            tree_sha = obj[2].split(b'\n', 1)[0].split()[1].decode()
+            obj = self.read_object(tree_sha)
+        return parse_tree(obj[2])
+
+    def repo_prefix(self):
+        """Subdiretório de `repo_path` dentro do repositório git ('' na raiz)
+
+        Os repositórios vendorizados em `repositories/` são diretórios comuns
+        de um repositório maior: a árvore da revisão é a da raiz dele.
+        """
+        if self._prefix is None:
+            started = time.perf_counter()
+            metrics.spawn('git rev-parse')
+            result = subprocess.run(
+                ['git', 'rev-parse', '--show-prefix'],
+                cwd=self.repo_path, capture_output=True, text=True
+            )
+            metrics.call('git rev-parse', time.perf_counter() - started)
+            self._prefix = result.stdout.strip() if result.returncode == 0 else ''
+        return self._prefix
+
+    def _subtree(self, tree_sha, path):
+        """Sha da árvore de `path` abaixo de `tree_sha` (None se não existir)"""
+        for part in filter(None, path.split('/')):
+            if tree_sha is None:
+                break
+            tree_sha = next((sha for mode, kind, sha, name in self.read_tree(tree_sha)
+                             if name == part and kind == 'tree'), None)
+        return tree_sha
+
+    def walk_tree(self, rev='HEAD', prefix=None):
+        """Percorre recursivamente a árvore da revisão, gerando (caminho, sha, modo)
+
+        Só o subdiretório `prefix` é percorrido (padrão: o de `repo_path`) e
+        os caminhos saem relativos a ele.
+        """
+        prefix = (self.repo_prefix() if prefix is None else prefix).strip('/')
+        stack = [('', self._subtree(self.rev_parse(f"{rev}^{{tree}}"), prefix))]
+        while stack:
+            base, tree_sha = stack.pop()
+            if tree_sha is None:
+                continue
+            for mode, kind, sha, name in self.read_tree(tree_sha):
+                path = f"{base}{name}"
+                if kind == 'tree':
+                    stack.append((path + '/', sha))
+                elif kind == 'blob':
+                    yield path, sha, mode
+
+    def count_files(self, rev='HEAD', suffix='.mps'):
+        """Conta arquivos com a extensão dada na revisão, sem checkout"""
+        return sum(1 for path, _, _ in self.walk_tree(rev) if path.endswith(suffix))
+
+
+def parse_tree(data):
+    """Decodifica o formato binário de um objeto tree"""
+    entries = []
+    i = 0
+    while i < len(data):
+        space = data.index(b' ', i)
+        nul = data.index(b'\x00', space)
+        mode = data[i:space].decode()
+        name = data[space + 1:nul].decode('utf-8', errors='surrogateescape')
+        sha = data[nul + 1:nul + 21].hex()
+        if mode == '40000':
+            kind = 'tree'
+        elif mode == '160000':
+            kind = 'commit'
+        else:
+            kind = 'blob'
+        entries.append((mode, kind, sha, name))
+        i = nul + 21
+    return entries
+
+
+class CatFileBackend(GitBackend):
+    """Mantém processos `git cat-file --batch` e `--batch-check` abertos"""
+
+    name = 'catfile'
+
+    def __init__(self, repo_path):
+        super().__init__(repo_path)
+        self._batch = None
+        self._check = None
+        self._lock = threading.Lock()
+
+    def _spawn(self, mode):
+        metrics.spawn(f"git cat-file {mode}")
+        return subprocess.Popen(
+            ['git', 'cat-file', mode],
+            cwd=self.repo_path,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+
+    def _request(self, process, spec):
+        started = time.perf_counter()
+        try:
+            process.stdin.write(spec.encode('utf-8') + b'\n')
+            process.stdin.flush()
+        except BrokenPipeError:
+            return None
+        header = process.stdout.readline().decode().split()
+        metrics.call(f"git cat-file {process.args[-1]}", time.perf_counter() - started)
+        if len(header) != 3 or header[1] == 'missing':
+            return None
+        return header[0], header[1], int(header[2])
+
+    def object_info(self, spec):
+        with self._lock:
+            if self._check is None:
+                self._check = self._spawn('--batch-check')
+            return self._request(self._check, spec)
+
+    def read_object(self, spec):
+        with self._lock:
+            if self._batch is None:
+                self._batch = self._spawn('--batch')
+            info = self._request(self._batch, spec)
+            if info is None:
+                return None
+            sha, kind, size = info
+            data = self._batch.stdout.read(size)
+            self._batch.stdout.read(1)  # LF após o conteúdo
+            metrics.read(size)
+            return sha, kind, data
+
+    def rev_parse(self, rev):
+        info = self.object_info(rev)
+        return info[0] if info else None
+
+    def close(self):
+        for process in (self._batch, self._check):
+            if process is not None:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+                process.wait()
+                process.stdout.close()
+        self._batch = self._check = None
+
+
+class GitPythonBackend(GitBackend):
+    """Acesso em processo via GitPython (object database do próprio repositório)"""
+
+    name = 'gitpython'
+
+    def __init__(self, repo_path):
+        super().__init__(repo_path)
+        if git is None:
+            raise RuntimeError("GitPython não está instalado (pip install -r requirements.txt)")
+        try:
+            self.repo = git.Repo(repo_path, odbt=git.GitDB, search_parent_directories=True)
+        except (git.InvalidGitRepositoryError, git.NoSuchPathError):
+            self.repo = None
+
+    def close(self):
+        if self.repo is not None:
+            self.repo.close()
+
+    def _resolve(self, spec):
+        if self.repo is None:
+            return None
+        try:
+            return self.repo.rev_parse(spec)
+        except (git.BadName, git.BadObject, ValueError, KeyError):
+            return None
+
+    def rev_parse(self, rev):
+        obj = self._resolve(rev)
+        return obj.hexsha if obj is not None else None
+
+    def object_info(self, spec):
+        obj = self._resolve(spec)
+        if obj is None:
+            return None
+        info = self.repo.odb.info(obj.binsha)
+        return obj.hexsha, info.type.decode(), info.size
+
+    def read_object(self, spec):
+        obj = self._resolve(spec)
+        if obj is None:
+            return None
+        stream = self.repo.odb.stream(obj.binsha)
+        data = stream.read()
+        metrics.read(len(data))
+        return obj.hexsha, stream.type.decode(), data
+
+
+BACKENDS = {
+    CatFileBackend.name: CatFileBackend,
+    GitPythonBackend.name: GitPythonBackend
+}
+
+
+def open_backend(repo_path, kind='catfile'):
+    """Cria o backend de acesso ao repositório pelo nome"""
+    if kind not in BACKENDS:
+        raise ValueError(f"Backend desconhecido: {kind} (opções: {', '.join(BACKENDS)})")
+    return BACKENDS[kind](repo_path)
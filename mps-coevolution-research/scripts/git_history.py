@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Ingestão do histórico git em passagem única
+Autor: Ana Carolina Poltronieri
+Propósito: Ler o histórico de um repositório com um único `git log` e
+entregar registros de commit de forma preguiçosa (streaming)
+"""
+
+import subprocess
+import tempfile
+import time
+from collections import namedtuple
+
+from instrumentation import metrics
+
+RECORD_SEPARATOR = b'\x1e'
+FIELD_SEPARATOR = b'\x00'
+CHUNK_SIZE = 1 << 16
+
+# hash, pais, autor, e-mail, data (%ci), assunto
+LOG_FORMAT = '%x1e%H%x00%P%x00%an%x00%ae%x00%ci%x00%s%x00'
+HEADER_FIELDS = 6
+
+CommitRecord = namedtuple(
+    'CommitRecord',
+    ['hash', 'parents', 'author', 'email', 'date', 'message', 'files']
+)
+
+# cabeçalho leve (sem arquivos alterados): hash, data em segundos, %ci e autor
+CommitHeader = namedtuple('CommitHeader', ['hash', 'timestamp', 'date', 'author'])
+HEADER_FORMAT = '%H%x1f%ct%x1f%ci%x1f%an'
+
+# status: A, M, D, R, C, T...; old_path só é preenchido em renomeações/cópias
+FileChange = namedtuple('FileChange', ['status', 'path', 'old_path'])
+
+
+class GitError(RuntimeError):
+    """Falha de um comando git (repositório inválido, revisão inexistente...)"""
+
+
+def check_returncode(command, returncode, stderr):
+    """Levanta GitError se o git terminou com erro: histórico vazio não é falha silenciosa"""
+    if returncode != 0:
+        message = (stderr.decode('utf-8', errors='replace') if isinstance(stderr, bytes) else stderr or '').strip()
+        raise GitError(f"{' '.join(command[:4])} falhou ({returncode}): {message or 'sem mensagem'}")
+
+
+def _read_stderr(stderr_file):
+    """Conteúdo do arquivo temporário que recebeu o stderr do git"""
+    stderr_file.seek(0)
+    return stderr_file.read()
+
+
+def build_log_command(rev_range='HEAD', paths=None, first_parent=False, extra_args=None):
+    """Monta o comando `git log` legível por máquina (campos separados por NUL)"""
+    command = [
+        'git', '-c', 'core.quotepath=off', 'log', '-z', '-M',
+        '--name-status', f'--format={LOG_FORMAT}'
+    ]
+    if first_parent:
+        command += ['--first-parent', '-m']
+    if extra_args:
+        command += list(extra_args)
+    if rev_range:
+        command.append(rev_range)
+    command.append('--')
+    if paths:
+        command += list(paths)
+    return command
+
+
+def parse_record(raw):
+    """Converte um registro bruto do `git log -z` em CommitRecord"""
+    tokens = raw.decode('utf-8', errors='replace').split('\x00')
+    if len(tokens) < HEADER_FIELDS:
+        return None
+
+    commit_hash, parents, author, email, date, message = tokens[:HEADER_FIELDS]
+
+    files = []
+    # com -z o git separa o cabeçalho da lista de arquivos com "\0\n"
+    pending = [token.lstrip('\n') for token in tokens[HEADER_FIELDS:]]
+    pending = [token for token in pending if token]
+    i = 0
+    while i < len(pending):
+        status = pending[i]
+        kind = status[0]
+        if kind in ('R', 'C') and i + 2 < len(pending):
+            old_path, new_path = pending[i + 1], pending[i + 2]
+            files.append(FileChange(kind, new_path, old_path))
+            i += 3
+        elif i + 1 < len(pending):
+            files.append(FileChange(kind, pending[i + 1], None))
+            i += 2
+        else:
+            break
+
+    return CommitRecord(
+        hash=commit_hash,
+        parents=tuple(parents.split()) if parents else (),
+        author=author,
+        email=email,
+        date=date,
+        message=message,
+        files=tuple(files)
+    )
+
+
+def iter_records(stream):
+    """Divide um fluxo binário em registros de commit, sem carregá-lo inteiro"""
+    buffer = b''
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        metrics.read(len(chunk))
+        buffer += chunk
+        parts = buffer.split(RECORD_SEPARATOR)
+        buffer = parts.pop()
+        for part in parts:
+            if part:
+                record = parse_record(part)
+                if record:
+                    yield record
+
+    if buffer:
+        record = parse_record(buffer)
+        if record:
+            yield record
+
+
+def iter_commits(repo_path, rev_range='HEAD', paths=None, first_parent=False, extra_args=None):
+    """Executa um único `git log` e gera CommitRecords à medida que chegam"""
+    command = build_log_command(rev_range, paths, first_parent, extra_args)
+    started = time.perf_counter()
+    metrics.spawn('git log')
+    # stderr em arquivo, não em pipe: muitos avisos encheriam o pipe e o git
+    # pararia de escrever no stdout enquanto lemos só o stdout
+    stderr_file = tempfile.TemporaryFile()
+    process = subprocess.Popen(
+        command,
+        cwd=repo_path,
+        stdout=subprocess.PIPE,
+        stderr=stderr_file
+    )
+    try:
+        yield from iter_records(process.stdout)
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+        stderr = _read_stderr(stderr_file)
+        stderr_file.close()
+        metrics.call('git log', time.perf_counter() - started)
+    # só depois de ler tudo: um consumidor que para antes fecha o pipe e o git sai com erro
+    check_returncode(command, returncode, stderr)
+
+
+def list_commit_headers(repo_path, rev_range='HEAD'):
+    """Lista só os cabeçalhos dos commits (bem mais rápido que --name-status)"""
+    started = time.perf_counter()
+    metrics.spawn('git log')
+    command = ['git', 'log', '-z', f'--format={HEADER_FORMAT}', rev_range, '--']
+    result = subprocess.run(command, cwd=repo_path, capture_output=True)
+    metrics.call('git log', time.perf_counter() - started)
+    check_returncode(command, result.returncode, result.stderr)
+    metrics.read(len(result.stdout))
+    headers = []
+    for raw in result.stdout.split(b'\x00'):
+        fields = raw.decode('utf-8', errors='replace').split('\x1f')
+        if len(fields) == 4:
+            headers.append(CommitHeader(fields[0], int(fields[1]), fields[2], fields[3]))
+    return headers
+
+
+def commits_by_hash(repo_path, hashes):
+    """CommitRecords completos de commits escolhidos, com um único `git log --stdin`
+
+    Os registros saem na ordem de `hashes`.
+    """
+    command = build_log_command(None, extra_args=['--no-walk=unsorted', '--stdin'])
+    started = time.perf_counter()
+    metrics.spawn('git log')
+    stderr_file = tempfile.TemporaryFile()
+    process = subprocess.Popen(
+        command,
+        cwd=repo_path,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=stderr_file
+    )
+    try:
+        # o git lê toda a entrada antes de começar a escrever a saída
+        process.stdin.write(''.join(f"{h}\n" for h in hashes).encode())
+        process.stdin.close()
+        records = list(iter_records(process.stdout))
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+        stderr = _read_stderr(stderr_file)
+        stderr_file.close()
+        metrics.call('git log', time.perf_counter() - started)
+    check_returncode(command, returncode, stderr)
+    return records
+
+
+def touches(record, suffix):
+    """Verifica se o commit altera algum arquivo terminado em `suffix`"""
+    return any(change.path.endswith(suffix) for change in record.files)
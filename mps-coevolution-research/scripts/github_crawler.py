@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Descoberta assíncrona de repositórios com modelos mbeddr no GitHub
+Autor: Ana Carolina Poltronieri
+Propósito: Versão concorrente de `finding_mbeddr_models`/`is_potential_model_repo`
+(learning.py): pagina as buscas, respeita os limites de taxa da API,
+elimina repositórios repetidos entre as consultas e entrega cada candidato
+assim que a árvore dele confirma a presença de modelos
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlencode, urlsplit
+
+from http_cache import DEFAULT_HTTP_CACHE_PATH, DEFAULT_MAX_BYTES, DEFAULT_TTL, HTTPCache
+
+DEFAULT_BASE_URL = 'https://api.github.com'
+
+# as mesmas consultas de finding_mbeddr_models
+QUERIES = [
+    "mbeddr",
+    "mbeddr.core",
+    "com.mbeddr",
+    "language:mps mbeddr",
+    "jetbrains mps embedded",
+    "mbeddr language:mps",
+    "mbeddr extension:mpr",
+    "com.mbeddr.core in:file",
+]
+
+# diretórios que indicam modelos (instâncias), como em is_potential_model_repo
+MODEL_DIRECTORIES = ('/solutions/', '/examples/', '/tests/')
+
+# a busca do GitHub não devolve mais que 1000 resultados por consulta
+SEARCH_RESULT_LIMIT = 1000
+
+
+class CrawlerError(Exception):
+    """Falha definitiva de uma requisição (após as novas tentativas)"""
+
+
+def is_model_path(path):
+    """Caminho de um modelo .mps dentro de solutions/examples/tests"""
+    return path.endswith('.mps') and any(directory in path for directory in MODEL_DIRECTORIES)
+
+
+class ConnectionPool:
+    """Conexões HTTP persistentes (keep-alive) limitadas a `size` requisições simultâneas
+
+    As conexões são do http.client (bloqueantes) e rodam num pool de threads
+    próprio; o laço asyncio só coordena.
+    """
+
+    def __init__(self, base_url, size=8, timeout=30):
+        parts = urlsplit(base_url)
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._idle = []
+        self._semaphore = asyncio.Semaphore(size)
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='github')
+
+    def _connect(self):
+        factory = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return factory(self.host, self.port, timeout=self.timeout)
+
+    @staticmethod
+    def _send(connection, method, path, headers):
+        connection.request(method, path, headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        return response.status, {k.lower(): v for k, v in response.getheaders()}, body
+
+    async def request(self, method, path, headers):
+        """Executa a requisição numa conexão livre; devolve (status, cabeçalhos, corpo)"""
+        async with self._semaphore:
+            connection = self._idle.pop() if self._idle else self._connect()
+            loop = asyncio.get_running_loop()
+            try:
+                status, response_headers, body = await loop.run_in_executor(
+                    self._executor, self._send, connection, method, self.prefix + path, headers
+                )
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                raise
+            if response_headers.get('connection', '').lower() == 'close':
+                connection.close()
+            else:
+                self._idle.append(connection)
+            return status, response_headers, body
+
+    def close(self):
+        for connection in self._idle:
+            connection.close()
+        self._idle = []
+        self._executor.shutdown(wait=False)
+
+
+class GitHubCrawler:
+    """Busca repositórios, confirma modelos pela árvore e gera os candidatos em fluxo"""
+
+    def __init__(self, token=None, base_url=DEFAULT_BASE_URL, concurrency=8, per_page=100,
+                 max_pages=10, max_retries=5, backoff=1.0, cache=None):
+        self.base_url = base_url
+        self.cache = cache
+        self.concurrency = concurrency
+        self.per_page = per_page
+        self.max_pages = max_pages
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.headers = {
+            'Accept': 'application/vnd.github+json',
+            'User-Agent': 'mps-coevolution-research'
+        }
+        if token:
+            self.headers['Authorization'] = f"Bearer {token}"
+        self.pool = None
+        self.errors = []
+        self.stats = {'requests': 0, 'retries': 0, 'rate_limited': 0, 'duplicates': 0,
+                      'checked': 0, 'confirmed': 0, 'cache_hits': 0, 'not_modified': 0}
+        self._resume_at = 0.0
+
+    async def _wait_rate_limit(self):
+        """Todas as tarefas aguardam juntas quando a cota acabou"""
+        while True:
+            delay = self._resume_at - time.time()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def _note_rate_limit(self, headers):
+        """Com a cota primária zerada, pausa tudo até o reset (sem gastar uma requisição negada)"""
+        if headers.get('x-ratelimit-remaining') == '0' and 'x-ratelimit-reset' in headers:
+            self._resume_at = max(self._resume_at, float(headers['x-ratelimit-reset']) + 1)
+
+    def _rate_limit_delay(self, headers, body, attempt):
+        """Espera para uma resposta 403/429 de limite de taxa (None se não for limite)"""
+        if 'retry-after' in headers:
+            return float(headers['retry-after'])
+        if headers.get('x-ratelimit-remaining') == '0' and 'x-ratelimit-reset' in headers:
+            return max(float(headers['x-ratelimit-reset']) - time.time(), 0) + 1
+        if b'rate limit' in body.lower():
+            # limite secundário sem Retry-After: espera exponencial
+            return min(self.backoff * 60 * 2 ** attempt, 900)
+        return None
+
+    @staticmethod
+    def _decode(path, status, headers, body):
+        if status in (404, 409):
+            # repositório removido ou vazio
+            return headers, None
+        if status >= 400:
+            raise CrawlerError(f"HTTP {status} em {path}: {body[:200].decode(errors='replace')}")
+        try:
+            return headers, json.loads(body)
+        except ValueError as e:
+            raise CrawlerError(f"HTTP {status} em {path}: resposta não é JSON ({e})") from e
+
+    async def request(self, path, params=None):
+        """GET com cache e novas tentativas; devolve (cabeçalhos, JSON) ou (cabeçalhos, None) em 404/409
+
+        Com cache, entradas dentro do TTL não geram requisição; as vencidas
+        são revalidadas com If-None-Match/If-Modified-Since (304 reaproveita o corpo).
+        """
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        entry = self.cache.get(path) if self.cache else None
+        if entry is not None and (self.cache.offline or self.cache.is_fresh(entry)):
+            self.stats['cache_hits'] += 1
+            return self._decode(path, entry.status, entry.headers, entry.body)
+        if self.cache and self.cache.offline:
+            raise CrawlerError(f"{path}: modo offline e resposta ausente do cache")
+        request_headers = dict(self.headers, **entry.validators()) if entry else self.headers
+
+        error = 'limite de taxa'
+        for attempt in range(self.max_retries + 1):
+            await self._wait_rate_limit()
+            self.stats['requests'] += 1
+            try:
+                status, headers, body = await self.pool.request('GET', path, request_headers)
+            except (OSError, http.client.HTTPException) as e:
+                error = f"{type(e).__name__}: {e}"
+                self.stats['retries'] += 1
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+                continue
+
+            self._note_rate_limit(headers)
+            if status == 304 and entry is not None:
+                self.stats['not_modified'] += 1
+                refreshed = self.cache.revalidated(path, headers)
+                if refreshed is None:
+                    # entrada removida do cache durante a requisição: o corpo em mãos continua válido
+                    headers = dict(entry.headers, **headers)
+                    self.cache.store(path, entry.status, headers, entry.body)
+                    return self._decode(path, entry.status, headers, entry.body)
+                return self._decode(path, refreshed.status, refreshed.headers, refreshed.body)
+            if status in (403, 429):
+                delay = self._rate_limit_delay(headers, body, attempt)
+                if delay is not None:
+                    error = f"limite de taxa (HTTP {status})"
+                    self.stats['rate_limited'] += 1
+                    self._resume_at = max(self._resume_at, time.time() + delay)
+                    continue
+            if status >= 500:
+                error = f"HTTP {status}"
+                self.stats['retries'] += 1
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+                continue
+            decoded = self._decode(path, status, headers, body)
+            # só depois de decodificar: um corpo inválido não entra no cache
+            if self.cache and status in (200, 404, 409):
+                self.cache.store(path, status, headers, body)
+            return decoded
+
+        raise CrawlerError(f"{path}: desistiu após {self.max_retries + 1} tentativas ({error})")
+
+    async def search(self, query):
+        """Gera os repositórios de uma consulta, página a página"""
+        pages = min(self.max_pages, -(-SEARCH_RESULT_LIMIT // self.per_page))
+        for page in range(1, pages + 1):
+            headers, data = await self.request('/search/repositories', {
+                'q': query, 'per_page': self.per_page, 'page': page
+            })
+            items = (data or {}).get('items', [])
+            for item in items:
+                yield item
+            if len(items) < self.per_page or 'rel="next"' not in headers.get('link', ''):
+                return
+
+    async def check_repository(self, item):
+        """Lê a árvore do branch padrão e devolve o candidato (ou None sem modelos)"""
+        full_name = item['full_name']
+        branch = item.get('default_branch') or 'HEAD'
+        headers, data = await self.request(
+            f"/repos/{full_name}/git/trees/{quote(branch, safe='')}", {'recursive': 1}
+        )
+        self.stats['checked'] += 1
+        if not data:
+            return None
+        model_paths = [entry['path'] for entry in data.get('tree', []) if is_model_path(entry['path'])]
+        if not model_paths:
+            return None
+        return {
+            'full_name': full_name,
+            'html_url': item.get('html_url'),
+            'description': item.get('description'),
+            'stars': item.get('stargazers_count'),
+            'size_kb': item.get('size'),
+            'default_branch': branch,
+            'model_files': len(model_paths),
+            'sample_models': model_paths[:5],
+            'truncated_tree': bool(data.get('truncated'))
+        }
+
+    async def crawl(self, queries=QUERIES):
+        """Gera os candidatos confirmados à medida que as verificações terminam"""
+        self.pool = ConnectionPool(self.base_url, self.concurrency)
+        results = asyncio.Queue()
+        seen = set()
+        checks = []
+
+        async def check(item, query):
+            try:
+                candidate = await self.check_repository(item)
+            except CrawlerError as e:
+                self.errors.append(str(e))
+                return
+            if candidate:
+                candidate['query'] = query
+                self.stats['confirmed'] += 1
+                await results.put(candidate)
+
+        async def run_query(query):
+            try:
+                async for item in self.search(query):
+                    key = item['full_name'].lower()
+                    if key in seen:
+                        self.stats['duplicates'] += 1
+                        continue
+                    seen.add(key)
+                    checks.append(asyncio.create_task(check(item, query)))
+            except CrawlerError as e:
+                self.errors.append(f"consulta '{query}': {e}")
+
+        async def produce():
+            # qualquer falha ainda encerra a fila; o erro reaparece no `await producer`
+            try:
+                await asyncio.gather(*(run_query(query) for query in queries))
+                await asyncio.gather(*checks)
+            finally:
+                await results.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                candidate = await results.get()
+                if candidate is None:
+                    break
+                yield candidate
+            await producer
+        finally:
+            producer.cancel()
+            for task in checks:
+                task.cancel()
+            self.pool.close()
+
+
+async def run(crawler, queries, output=None):
+    """Imprime cada candidato e o grava (JSON Lines) assim que é confirmado"""
+    stream = open(output, 'w', encoding='utf-8') if output else None
+    try:
+        async for candidate in crawler.crawl(queries):
+            print(f"MODELO ENCONTRADO: {candidate['full_name']} ({candidate['model_files']} modelos)")
+            if stream:
+                stream.write(json.dumps(candidate, ensure_ascii=False) + '\n')
+                stream.flush()
+    finally:
+        if stream:
+            stream.close()
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description='Descobre repositórios com modelos mbeddr no GitHub',
+        epilog='Exemplo: GITHUB_TOKEN=... python github_crawler.py --output candidatos.jsonl'
+    )
+    parser.add_argument('--query', action='append', help='Consulta de busca (padrão: as 8 de learning.py)')
+    parser.add_argument('--output', help='Arquivo JSON Lines com os candidatos')
+    parser.add_argument('--concurrency', type=int, default=8, help='Requisições simultâneas (padrão: 8)')
+    parser.add_argument('--per-page', type=int, default=100, help='Resultados por página (padrão: 100)')
+    parser.add_argument('--max-pages', type=int, default=10, help='Páginas por consulta (padrão: 10)')
+    parser.add_argument('--base-url', default=DEFAULT_BASE_URL,
+                        help='URL da API (permite usar um servidor local de testes)')
+    parser.add_argument('--cache', default=DEFAULT_HTTP_CACHE_PATH,
+                        help=f'Cache SQLite das respostas (padrão: {DEFAULT_HTTP_CACHE_PATH})')
+    parser.add_argument('--no-cache', action='store_true', help='Não usa o cache de respostas')
+    parser.add_argument('--ttl', type=float, default=DEFAULT_TTL,
+                        help=f'Segundos em que uma resposta é usada sem revalidar (padrão: {DEFAULT_TTL})')
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_MAX_BYTES / 2 ** 20,
+                        help='Tamanho máximo do cache em MB (padrão: %(default).0f)')
+    parser.add_argument('--offline', action='store_true',
+                        help='Responde só com o cache, sem acessar a rede')
+    parser.add_argument('--token', default=os.environ.get('GITHUB_TOKEN'),
+                        help='Token da API (padrão: variável GITHUB_TOKEN)')
+    args = parser.parse_args()
+
+    cache = None
+    if not args.no_cache:
+        cache = HTTPCache(args.cache, args.ttl, int(args.cache_size * 2 ** 20), args.offline)
+    crawler = GitHubCrawler(args.token, args.base_url, args.concurrency, args.per_page, args.max_pages,
+                            cache=cache)
+    asyncio.run(run(crawler, args.query or QUERIES, args.output))
+    if cache:
+        cache.close()
+
+    stats = crawler.stats
+    print(f"\n{stats['confirmed']} candidatos em {stats['checked']} repositórios verificados "
+          f"({stats['duplicates']} repetidos, {stats['requests']} requisições, "
+          f"{stats['rate_limited']} esperas por limite de taxa, {stats['retries']} novas tentativas, "
+          f"{stats['cache_hits']} respostas do cache, {stats['not_modified']} não modificadas)")
+    for error in crawler.errors:
+        print(f"Erro: {error}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Cache persistente de respostas HTTP da API do GitHub
+Autor: Ana Carolina Poltronieri
+Propósito: Guardar corpos e validadores (ETag/Last-Modified) para que as
+descobertas repetidas usem requisições condicionais (304 não gasta cota),
+com validade (TTL), limite de tamanho por LRU e modo offline
+"""
+
+import json
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+
+DEFAULT_HTTP_CACHE_PATH = 'data/http_cache.sqlite'
+DEFAULT_TTL = 6 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# cabeçalhos de resposta que o cliente precisa ao reutilizar uma entrada
+KEPT_HEADERS = ('link', 'etag', 'last-modified')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_by_use ON responses (used_at);
+"""
+
+
+class CachedResponse:
+    """Entrada do cache: status, cabeçalhos guardados, corpo e idade"""
+
+    __slots__ = ('status', 'headers', 'body', 'stored_at')
+
+    def __init__(self, status, headers, body, stored_at):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.stored_at = stored_at
+
+    def age(self):
+        return time.time() - self.stored_at
+
+    def validators(self):
+        """Cabeçalhos para a requisição condicional"""
+        conditional = {}
+        if 'etag' in self.headers:
+            conditional['If-None-Match'] = self.headers['etag']
+        if 'last-modified' in self.headers:
+            conditional['If-Modified-Since'] = self.headers['last-modified']
+        return conditional
+
+
+class HTTPCache:
+    """Respostas por chave (caminho + consulta) em SQLite, corpos comprimidos com zlib"""
+
+    def __init__(self, db_path=DEFAULT_HTTP_CACHE_PATH, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES,
+                 offline=False):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=60)
+        self.conn.executescript(SCHEMA)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.evict()
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, key):
+        """Entrada guardada para a chave (fresca ou não), ou None"""
+        row = self.conn.execute(
+            "SELECT status, headers, body, stored_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        with self.conn:
+            self.conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (time.time(), key))
+        status, headers, body, stored_at = row
+        return CachedResponse(status, json.loads(headers), zlib.decompress(body), stored_at)
+
+    def is_fresh(self, entry):
+        return entry is not None and entry.age() < self.ttl
+
+    def store(self, key, status, headers, body):
+        """Guarda a resposta e aplica o limite de tamanho"""
+        kept = {name: headers[name] for name in KEPT_HEADERS if name in headers}
+        compressed = zlib.compress(body, 6)
+        now = time.time()
+        previous = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        self._size += len(compressed) - (previous[0] if previous else 0)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, status, json.dumps(kept), compressed, len(compressed), now, now)
+            )
+        self.evict()
+
+    def revalidated(self, key, headers):
+        """Resposta 304: a entrada volta a ser fresca (e adota validadores novos)
+
+        Devolve None se a entrada foi removida (LRU) enquanto a requisição
+        estava em andamento; quem chamou ainda tem o corpo e deve guardá-lo.
+        """
+        entry = self.get(key)
+        if entry is None:
+            return None
+        entry.headers.update({name: headers[name] for name in KEPT_HEADERS if name in headers})
+        entry.stored_at = time.time()
+        with self.conn:
+            self.conn.execute(
+                "UPDATE responses SET headers = ?, stored_at = ? WHERE key = ?",
+                (json.dumps(entry.headers), entry.stored_at, key)
+            )
+        return entry
+
+    def size(self):
+        """Bytes ocupados pelos corpos comprimidos"""
+        return self._size
+
+    def evict(self):
+        """Remove as entradas usadas há mais tempo até caber em `max_bytes`"""
+        excess = self._size - self.max_bytes
+        if excess <= 0:
+            return 0
+        removed = []
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY used_at"):
+            removed.append((key,))
+            self._size -= size
+            excess -= size
+            if excess <= 0:
+                break
+        with self.conn:
+            self.conn.executemany("DELETE FROM responses WHERE key = ?", removed)
+        return len(removed)
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Instrumentação das fases de análise
+Autor: Ana Carolina Poltronieri
+Propósito: Mostrar onde o tempo de uma execução é gasto (subprocessos git,
+E/S de arquivos ou classificação em Python), com métricas por fase,
+histogramas de latência e perfis opcionais (cProfile ou amostragem)
+
+As métricas são do processo atual: trabalho feito em pools de processos
+aparece apenas no tempo de parede da fase que os disparou.
+"""
+
+import bisect
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+# limites superiores (ms) dos baldes dos histogramas de latência
+LATENCY_BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+def _cpu_times():
+    """CPU do processo e dos filhos já encerrados (ex.: `git log`)"""
+    t = os.times()
+    return t.user + t.system, t.children_user + t.children_system
+
+
+class LatencyHistogram:
+    """Contagem de chamadas por balde de latência, mais total e máximo"""
+
+    __slots__ = ('counts', 'total', 'maximum')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+
+    @property
+    def calls(self):
+        return sum(self.counts)
+
+    def to_dict(self):
+        labels = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            'calls': self.calls,
+            'total_s': self.total,
+            'mean_ms': self.total * 1000 / self.calls if self.calls else 0.0,
+            'max_ms': self.maximum * 1000,
+            'buckets': {label: n for label, n in zip(labels, self.counts) if n}
+        }
+
+
+class Metrics:
+    """Acumulador de métricas (seguro entre threads)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.phases = defaultdict(lambda: {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'child_cpu_s': 0.0})
+            self.spawned = Counter()
+            self.latency = defaultdict(LatencyHistogram)
+            self.counters = Counter()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Mede tempo de parede e CPU de um trecho"""
+        wall = time.perf_counter()
+        cpu, child_cpu = _cpu_times()
+        try:
+            yield
+        finally:
+            end_cpu, end_child_cpu = _cpu_times()
+            with self._lock:
+                stats = self.phases[name]
+                stats['calls'] += 1
+                stats['wall_s'] += time.perf_counter() - wall
+                stats['cpu_s'] += end_cpu - cpu
+                stats['child_cpu_s'] += end_child_cpu - child_cpu
+
+    def timed(self, name):
+        """Decorador: registra cada chamada da função como a fase `name`"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.phase(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def spawn(self, kind):
+        """Conta um subprocesso criado"""
+        with self._lock:
+            self.spawned[kind] += 1
+
+    def call(self, kind, seconds):
+        """Registra a latência de uma chamada a subprocesso (execução ou requisição)"""
+        with self._lock:
+            self.latency[kind].add(seconds)
+
+    def read(self, nbytes, files=0):
+        """Registra bytes lidos e arquivos abertos"""
+        with self._lock:
+            self.counters['bytes_read'] += nbytes
+            self.counters['files_opened'] += files
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'phases': {name: dict(stats) for name, stats in self.phases.items()},
+                'subprocesses': {
+                    kind: dict(self.latency[kind].to_dict(), spawned=self.spawned[kind])
+                    for kind in sorted(set(self.spawned) | set(self.latency))
+                },
+                'counters': dict(self.counters)
+            }
+
+    def format_report(self):
+        """Seção de texto para o relatório"""
+        data = self.to_dict()
+        lines = ["DESEMPENHO:"]
+        for name, stats in data['phases'].items():
+            lines.append(
+                f"- {name}: {stats['wall_s']:.3f}s ({stats['calls']} chamadas, "
+                f"CPU {stats['cpu_s']:.3f}s + {stats['child_cpu_s']:.3f}s em subprocessos)"
+            )
+        for kind, stats in data['subprocesses'].items():
+            lines.append(
+                f"- {kind}: {stats['spawned']} processos, {stats['calls']} chamadas, "
+                f"média {stats['mean_ms']:.2f}ms, máx {stats['max_ms']:.1f}ms"
+            )
+        counters = data['counters']
+        lines.append(
+            f"- E/S: {counters.get('bytes_read', 0) / 1e6:.1f} MB lidos, "
+            f"{counters.get('files_opened', 0)} arquivos abertos"
+        )
+        return '\n'.join(lines)
+
+    def write(self, path):
+        """Grava as métricas em JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+metrics = Metrics()
+
+
+class StackSampler:
+    """Perfil por amostragem: registra periodicamente a pilha da thread alvo"""
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def top(self, limit=25):
+        """Funções com mais amostras (tempo próprio e acumulado)"""
+        own, cumulative = Counter(), Counter()
+        for stack, n in self.samples.items():
+            own[stack[-1]] += n
+            for function in set(stack):
+                cumulative[function] += n
+        total = sum(self.samples.values()) or 1
+        return [
+            (function, n / total, cumulative[function] / total)
+            for function, n in own.most_common(limit)
+        ]
+
+    def format(self, limit=25):
+        lines = [f"{'próprio':>8} {'acumulado':>10}  função"]
+        for function, own_share, cumulative_share in self.top(limit):
+            lines.append(f"{own_share:8.1%} {cumulative_share:10.1%}  {function}")
+        return '\n'.join(lines)
+
+
+@contextlib.contextmanager
+def profiling(mode=None, output=None, limit=25):
+    """Perfil opcional de um trecho: `cprofile`, `sampling` ou None (desligado)
+
+    Com `output`, o cProfile grava as estatísticas binárias (pstats) e a
+    amostragem grava o resumo em texto; sem `output`, o resumo é impresso.
+    """
+    if mode is None:
+        yield
+        return
+
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            if output:
+                profiler.dump_stats(output)
+            else:
+                buffer = io.StringIO()
+                pstats.Stats(profiler, stream=buffer).sort_stats('cumulative').print_stats(limit)
+                print(buffer.getvalue())
+    elif mode == 'sampling':
+        sampler = StackSampler()
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            if output:
+                with open(output, 'w', encoding='utf-8') as f:
+                    f.write(sampler.format(limit) + '\n')
+            else:
+                print(sampler.format(limit))
+    else:
+        raise ValueError(f"Modo de perfil desconhecido: {mode}")
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Diff estrutural de metamodelos (structure.mps) entre revisões
+Autor: Ana Carolina Poltronieri
+Propósito: Comparar as declarações de conceitos de duas versões de um
+structure.mps e classificar cada mudança como breaking ou não
+"""
+
+import os
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+from git_backend import open_backend
+from mps_parser import Node, NodeProperty, NodeReference, RegistryConcept, RegistryFeature, \
+    iter_model
+from parallel import ProgressReporter, map_in_chunks
+
+STRUCTURE_LANGUAGE = 'jetbrains.mps.lang.structure.structure.'
+
+CONCEPT_KINDS = {
+    'ConceptDeclaration': 'concept',
+    'InterfaceConceptDeclaration': 'interface'
+}
+
+# padrões do MPS quando a propriedade não aparece no arquivo
+DEFAULT_CARDINALITY = '0..1'
+DEFAULT_METACLASS = 'reference'
+
+# (mínimo, máximo) de cada cardinalidade; None = ilimitado
+CARDINALITIES = {
+    '0..1': (0, 1),
+    '1': (1, 1),
+    '0..n': (0, None),
+    '1..n': (1, None)
+}
+
+MAX_CACHED_REVISIONS = 4096
+
+# incrementar quando ConceptDecl ou parse_structure mudarem: as declarações
+# guardadas por sha no cache de blobs deixam de valer
+STRUCTURE_VERSION = 1
+
+
+def normalize_enum(value):
+    """Normaliza valores de enum do MPS ('fLJekj5/_0__n' -> '0..n')"""
+    member = value.rsplit('/', 1)[-1]
+    if member.startswith('_'):
+        member = member[1:].replace('__', '..')
+    return member
+
+
+class ConceptDecl:
+    """Declaração de um conceito (ou interface) em um structure.mps"""
+
+    __slots__ = ('node_id', 'kind', 'name', 'abstract', 'final', 'rootable',
+                 'extends', 'implements', 'properties', 'links')
+
+    def __init__(self, node_id, kind):
+        self.node_id = node_id
+        self.kind = kind
+        self.name = None
+        self.abstract = False
+        self.final = False
+        self.rootable = False
+        self.extends = None
+        self.implements = set()
+        # id do nó -> [nome, tipo]
+        self.properties = {}
+        # id do nó -> [papel, metaClass, cardinalidade, alvo]
+        self.links = {}
+
+
+def declarations_to_json(declarations):
+    """Declarações ({id: ConceptDecl}) como estrutura JSON, para o cache de blobs"""
+    return {
+        node_id: {
+            'kind': decl.kind,
+            'name': decl.name,
+            'abstract': decl.abstract,
+            'final': decl.final,
+            'rootable': decl.rootable,
+            'extends': decl.extends,
+            'implements': sorted(decl.implements),
+            'properties': decl.properties,
+            'links': decl.links
+        }
+        for node_id, decl in declarations.items()
+    }
+
+
+def declarations_from_json(data):
+    """Inverso de declarations_to_json"""
+    declarations = {}
+    for node_id, fields in data.items():
+        decl = ConceptDecl(node_id, fields['kind'])
+        decl.name = fields['name']
+        decl.abstract = fields['abstract']
+        decl.final = fields['final']
+        decl.rootable = fields['rootable']
+        decl.extends = fields['extends']
+        decl.implements = set(fields['implements'])
+        decl.properties = fields['properties']
+        decl.links = fields['links']
+        declarations[node_id] = decl
+    return declarations
+
+
+def parse_structure(source):
+    """Extrai as declarações de conceitos de um structure.mps
+
+    Retorna {id do nó raiz: ConceptDecl}. Os ids de nó do MPS são estáveis
+    entre revisões, o que permite distinguir renomeações de remoções.
+    """
+    concept_names = {}
+    feature_names = {}
+    declarations = {}
+    owners = {}
+    current = None
+
+    for record in iter_model(source):
+        kind = type(record)
+
+        if kind is RegistryConcept:
+            concept_names[record.index] = record.name
+        elif kind is RegistryFeature:
+            feature_names[record.index] = record.name
+
+        elif kind is Node:
+            concept = concept_names.get(record.concept, '')
+            short = concept[len(STRUCTURE_LANGUAGE):] if concept.startswith(STRUCTURE_LANGUAGE) else None
+            if record.depth == 0:
+                current = None
+                if short in CONCEPT_KINDS:
+                    current = ConceptDecl(record.id, CONCEPT_KINDS[short])
+                    declarations[record.id] = current
+                    owners[record.id] = ('concept', current)
+            elif current is not None and record.depth == 1:
+                if short == 'PropertyDeclaration':
+                    current.properties[record.id] = [None, None]
+                    owners[record.id] = ('property', current.properties[record.id])
+                elif short == 'LinkDeclaration':
+                    current.links[record.id] = [None, DEFAULT_METACLASS, DEFAULT_CARDINALITY, None]
+                    owners[record.id] = ('link', current.links[record.id])
+                elif short == 'InterfaceConceptReference':
+                    owners[record.id] = ('interface', current)
+
+        elif kind is NodeProperty:
+            owner = owners.get(record.node)
+            if owner is None:
+                continue
+            role = feature_names.get(record.role)
+            what, target = owner
+            if what == 'concept':
+                if role == 'name':
+                    target.name = record.value
+                elif role in ('abstract', 'final', 'rootable'):
+                    setattr(target, role, record.value == 'true')
+            elif what == 'property' and role == 'name':
+                target[0] = record.value
+            elif what == 'link':
+                if role == 'role':
+                    target[0] = record.value
+                elif role == 'metaClass':
+                    target[1] = normalize_enum(record.value)
+                elif role == 'sourceCardinality':
+                    target[2] = normalize_enum(record.value)
+
+        elif kind is NodeReference:
+            owner = owners.get(record.node)
+            if owner is None:
+                continue
+            role = feature_names.get(record.role)
+            what, target = owner
+            resolved = record.resolve or record.target
+            if what == 'concept' and role == 'extends':
+                target.extends = resolved
+            elif what == 'interface' and role == 'intfc':
+                target.implements.add(resolved)
+            elif what == 'property' and role == 'dataType':
+                target[1] = resolved
+            elif what == 'link' and role == 'target':
+                target[3] = resolved
+
+    return declarations
+
+
+def _is_restriction(old, new):
+    """Nova cardinalidade aceita menos instâncias do que a antiga?"""
+    old_min, old_max = CARDINALITIES.get(old, (0, None))
+    new_min, new_max = CARDINALITIES.get(new, (0, None))
+    if new_min > old_min:
+        return True
+    if new_max is not None and (old_max is None or new_max < old_max):
+        return True
+    return False
+
+
+def _change(element, change, concept, breaking, feature=None, old=None, new=None):
+    return {
+        'element': element,
+        'change': change,
+        'concept': concept,
+        'feature': feature,
+        'old': old,
+        'new': new,
+        'breaking': breaking
+    }
+
+
+def _link_element(metaclass):
+    return 'child' if metaclass == 'aggregation' else 'reference'
+
+
+def _diff_concept(old, new):
+    changes = []
+    name = new.name
+
+    if old.name != new.name:
+        # persistência por id: instâncias continuam válidas após renomear
+        changes.append(_change('concept', 'renamed', name, False, old=old.name, new=new.name))
+    if old.extends != new.extends:
+        changes.append(_change('concept', 'superconcept', name, True, old=old.extends, new=new.extends))
+    for removed in sorted(old.implements - new.implements):
+        changes.append(_change('concept', 'interface_removed', name, True, old=removed))
+    for added in sorted(new.implements - old.implements):
+        changes.append(_change('concept', 'interface_added', name, False, new=added))
+    for flag, breaking_when in (('abstract', True), ('final', True), ('rootable', False)):
+        before, after = getattr(old, flag), getattr(new, flag)
+        if before != after:
+            changes.append(_change('concept', flag, name, after == breaking_when, old=before, new=after))
+
+    for node_id, (prop_name, data_type) in old.properties.items():
+        if node_id not in new.properties:
+            changes.append(_change('property', 'removed', name, True, feature=prop_name))
+            continue
+        new_name, new_type = new.properties[node_id]
+        if new_name != prop_name:
+            changes.append(_change('property', 'renamed', name, False, feature=new_name,
+                                   old=prop_name, new=new_name))
+        if new_type != data_type:
+            changes.append(_change('property', 'type', name, True, feature=new_name,
+                                   old=data_type, new=new_type))
+    for node_id, (prop_name, _) in new.properties.items():
+        if node_id not in old.properties:
+            changes.append(_change('property', 'added', name, False, feature=prop_name))
+
+    for node_id, (role, metaclass, cardinality, target) in old.links.items():
+        element = _link_element(metaclass)
+        if node_id not in new.links:
+            changes.append(_change(element, 'removed', name, True, feature=role))
+            continue
+        new_role, new_metaclass, new_cardinality, new_target = new.links[node_id]
+        if new_metaclass != metaclass:
+            changes.append(_change(_link_element(new_metaclass), 'kind', name, True, feature=new_role,
+                                   old=element, new=_link_element(new_metaclass)))
+        if new_role != role:
+            changes.append(_change(element, 'renamed', name, False, feature=new_role,
+                                   old=role, new=new_role))
+        if new_cardinality != cardinality:
+            changes.append(_change(element, 'cardinality', name,
+                                   _is_restriction(cardinality, new_cardinality),
+                                   feature=new_role, old=cardinality, new=new_cardinality))
+        if new_target != target:
+            changes.append(_change(element, 'target', name, True, feature=new_role,
+                                   old=target, new=new_target))
+    for node_id, (role, metaclass, cardinality, _) in new.links.items():
+        if node_id not in old.links:
+            # um novo filho/referência obrigatório invalida instâncias existentes
+            required = CARDINALITIES.get(cardinality, (0, None))[0] > 0
+            changes.append(_change(_link_element(metaclass), 'added', name, required,
+                                   feature=role, new=cardinality))
+
+    return changes
+
+
+def diff_structures(old, new):
+    """Compara duas versões ({id: ConceptDecl}) e lista as mudanças"""
+    old = old or {}
+    new = new or {}
+    changes = []
+
+    for node_id, decl in old.items():
+        if node_id not in new:
+            changes.append(_change(decl.kind, 'removed', decl.name, True))
+        else:
+            changes.extend(_diff_concept(decl, new[node_id]))
+    for node_id, decl in new.items():
+        if node_id not in old:
+            changes.append(_change(decl.kind, 'added', decl.name, False))
+
+    return changes
+
+
+# um backend por (processo, thread, repositório): workers criados por fork ou
+# threads do pool não podem compartilhar os pipes do `git cat-file`
+_worker_backends = {}
+
+
+def _parse_blob(job):
+    """Lê e interpreta um blob (executado nos workers, com backend próprio)"""
+    repo_path, sha = job
+    key = (os.getpid(), threading.get_ident(), repo_path)
+    backend = _worker_backends.get(key)
+    if backend is None:
+        backend = _worker_backends[key] = open_backend(repo_path)
+    obj = backend.read_object(sha)
+    if obj is None:
+        return sha, None
+    try:
+        return sha, parse_structure(obj[2])
+    except ET.ParseError:
+        return sha, None
+
+
+class MetamodelDiffer:
+    """Calcula diffs de structure.mps ao longo do histórico
+
+    Cada blob é interpretado uma única vez: a versão nova de um commit é a
+    versão antiga do próximo, então os resultados ficam em um cache LRU
+    indexado pelo sha do blob. Com `blob_cache` (blob_cache.BlobSummaryCache)
+    as declarações também ficam guardadas entre execuções e repositórios.
+    """
+
+    def __init__(self, repo_path, backend, max_cached=MAX_CACHED_REVISIONS, blob_cache=None):
+        self.repo_path = str(repo_path)
+        self.backend = backend
+        self.max_cached = max_cached
+        self.blob_cache = blob_cache
+        self.parsed = OrderedDict()
+        _worker_backends[(os.getpid(), threading.get_ident(), self.repo_path)] = backend
+
+    def _blob_sha(self, spec):
+        info = self.backend.object_info(spec)
+        return info[0] if info and info[1] == 'blob' else None
+
+    def structure_pairs(self, commit):
+        """(caminho, sha antigo, sha novo) de cada structure.mps alterado no commit"""
+        parent = commit.parents[0] if commit.parents else None
+        pairs = []
+        for change in commit.files:
+            if not change.path.endswith('structure.mps'):
+                continue
+            old_path = change.old_path or change.path
+            old_sha = None
+            if change.status != 'A' and parent:
+                old_sha = self._blob_sha(f"{parent}:{old_path}")
+            new_sha = None if change.status == 'D' else self._blob_sha(f"{commit.hash}:{change.path}")
+            pairs.append((change.path, old_sha, new_sha))
+        return pairs
+
+    def _remember(self, sha, declarations):
+        self.parsed[sha] = declarations
+        self.parsed.move_to_end(sha)
+        while len(self.parsed) > self.max_cached:
+            self.parsed.popitem(last=False)
+
+    def get(self, sha):
+        """Declarações de um blob, interpretando-o se ainda não estiver no cache"""
+        if not sha:
+            return None
+        if sha not in self.parsed:
+            self._load([sha], 1, 1, 'process')
+        self.parsed.move_to_end(sha)
+        return self.parsed[sha]
+
+    def _load(self, shas, workers, chunk_size, executor):
+        missing = [sha for sha in dict.fromkeys(shas) if sha and sha not in self.parsed]
+        if self.blob_cache is not None and missing:
+            stored = self.blob_cache.get_many(missing, 'structure', STRUCTURE_VERSION)
+            for sha, data in stored.items():
+                self._remember(sha, declarations_from_json(data))
+            missing = [sha for sha in missing if sha not in stored]
+        jobs = [(self.repo_path, sha) for sha in missing]
+        parsed = map_in_chunks(_parse_blob, jobs, workers, chunk_size, executor)
+        for sha, declarations in parsed:
+            self._remember(sha, declarations)
+        if self.blob_cache is not None:
+            # blobs ilegíveis não são guardados: continuam sem diff possível
+            self.blob_cache.store_many(
+                ((sha, declarations_to_json(declarations)) for sha, declarations in parsed
+                 if declarations is not None),
+                'structure', STRUCTURE_VERSION
+            )
+
+    def diff_commits(self, commits, workers=1, chunk_size=64, progress=False, executor='process'):
+        """Gera (commit, caminho, mudanças) para cada structure.mps alterado
+
+        Uma versão ilegível gera mudanças None: não dá para afirmar nada
+        sobre o diff.
+        Os blobs de cada janela de `chunk_size * workers` commits são
+        interpretados em lotes de `chunk_size` no pool escolhido (`executor`).
+        """
+        window = max(chunk_size * max(workers or 1, 1), 1)
+        reporter = ProgressReporter(len(commits), 'commits diferenciados') if progress else None
+
+        # processa em janelas: o cache LRU limita a memória em históricos longos
+        for start in range(0, len(commits), window):
+            batch = commits[start:start + window]
+            pairs = [(commit, self.structure_pairs(commit)) for commit in batch]
+            self._load([sha for _, ps in pairs for _, old, new in ps for sha in (old, new)],
+                       workers, chunk_size, executor)
+            for commit, commit_pairs in pairs:
+                for path, old_sha, new_sha in commit_pairs:
+                    old, new = self.get(old_sha), self.get(new_sha)
+                    if (old_sha and old is None) or (new_sha and new is None):
+                        print(f"Aviso: structure.mps ilegível em {commit.hash[:10]} ({path})")
+                        yield commit, path, None
+                        continue
+                    yield commit, path, diff_structures(old, new)
+            if reporter:
+                reporter.update(len(batch))
@@ -7,15 +7,42 @@ Propósito: Coletar dados sobre evolução de DSLs em repositórios MPS
 
 import os
 import json
+import argparse
 import subprocess
 import re
+import time
+from collections import Counter
 from datetime import datetime, timedelta
 from pathlib import Path
 import pandas as pd
 
+from git_history import CommitHeader, GitError, commits_by_hash, iter_commits, list_commit_headers, touches
+from analysis_cache import AnalysisCache, DEFAULT_CACHE_PATH
+from blob_cache import DEFAULT_BLOB_CACHE_PATH, BlobSummaryCache
+from git_backend import BACKENDS, open_backend
+from metamodel_diff import MetamodelDiffer
+from coevolution import CoevolutionSeries
+from file_population import population_frame, population_series
+from ownership import DEFAULT_OWNERSHIP_PATH, OwnershipCache, ownership
+from sampling import STRATA, StratifiedSample, required_sample_size, stratum_keys
+from results_store import ResultsStore, commit_frames
+from parallel import ProgressReporter, default_workers, map_in_chunks, map_isolated
+from instrumentation import metrics, profiling
+
+DEFAULT_MAX_COMMITS = 20
+# classificar um commit custa microssegundos, menos que serializá-lo para um
+# worker: abaixo disso a análise por commit roda em série
+PARALLEL_MIN_COMMITS = 200000
+CHANGE_TYPES = ('structural', 'presentation', 'migration', 'addition', 'removal', 'modification')
+
 class MPSRepositoryAnalyzer:
-    def __init__(self, repo_path):
+    def __init__(self, repo_path, cache=None, backend='catfile', blob_cache=None):
         self.repo_path = Path(repo_path)
+        self.backend = open_backend(self.repo_path, backend)
+        self.cache = cache
+        # resultados por sha do blob (declarações de structure.mps, tipos de arquivo)
+        self.blob_cache = blob_cache
+        self.cache_key = cache.repo_key(repo_path) if cache else None
         self.results = {
             'basic_metrics': {},
             'metamodel_changes': [],
@@ -23,47 +50,116 @@ class MPSRepositoryAnalyzer:
             'timeline': [],
             'breaking_changes': []
         }
+        self.commits = None
+        self.coevolution = None
+        self.population = None
+        self.headers = None
     
-    def run_git_command(self, command):
-        """Executa comando git e retorna resultado"""
-        try:
-            result = subprocess.run(
-                command, 
-                cwd=self.repo_path, 
-                shell=True, 
-                capture_output=True, 
-                text=True
-            )
-            return result.stdout.strip()
-        except Exception as e:
-            print(f"Erro ao executar: {command}")
-            return ""
+    @metrics.timed('load_history')
+    def load_history(self):
+        """Lê o histórico completo com um único `git log` (reaproveitado pelas fases)"""
+        if self.commits is None:
+            if self.cache:
+                self.commits = self._load_history_incremental()
+            else:
+                print("Lendo histórico git")
+                self.commits = list(iter_commits(self.repo_path))
+        return self.commits
+    
+    def commit_headers(self):
+        """Hash, data e autor de todos os commits, sem ler os arquivos alterados"""
+        if self.headers is None:
+            if self.commits is not None:
+                self.headers = [
+                    CommitHeader(c.hash, int(datetime.strptime(c.date, '%Y-%m-%d %H:%M:%S %z').timestamp()),
+                                 c.date, c.author)
+                    for c in self.commits
+                ]
+            else:
+                self.headers = list_commit_headers(self.repo_path)
+        return self.headers
+    
+    def _load_history_incremental(self):
+        """Lê do git apenas `last_head..HEAD` e junta ao histórico em cache"""
+        head = self.backend.rev_parse('HEAD')
+        if not head:
+            return list(iter_commits(self.repo_path))
+        
+        last_head = self.cache.last_head(self.cache_key)
+        if last_head == head:
+            print("Histórico em cache (nenhum commit novo)")
+            return self.cache.load_commits(self.cache_key)
+        
+        if last_head and self._is_ancestor(last_head, head):
+            cached = self.cache.load_commits(self.cache_key)
+            new_commits = list(iter_commits(self.repo_path, f"{last_head}..{head}"))
+            print(f"Lendo histórico git: {len(new_commits)} commits novos desde {last_head[:10]}")
+        else:
+            if last_head:
+                print("Histórico reescrito desde a última análise: cache invalidado")
+            self.cache.invalidate(self.cache_key)
+            cached = []
+            print("Lendo histórico git")
+            new_commits = list(iter_commits(self.repo_path, head))
+        
+        self.cache.append_commits(self.cache_key, self.repo_path.name, new_commits, head)
+        return new_commits + cached
     
-    def analyze_basic_metrics(self):
+    def _is_ancestor(self, ancestor, descendant):
+        """Verifica se `ancestor` ainda faz parte do histórico de `descendant`"""
+        started = time.perf_counter()
+        result = subprocess.run(
+            ['git', 'merge-base', '--is-ancestor', ancestor, descendant],
+            cwd=self.repo_path,
+            capture_output=True
+        )
+        metrics.spawn('git merge-base')
+        metrics.call('git merge-base', time.perf_counter() - started)
+        return result.returncode == 0
+    
+    @metrics.timed('analyze_basic_metrics')
+    def analyze_basic_metrics(self, headers_only=False):
         """Coleta métricas básicas do repositório"""
         print("Coletando métricas básicas")
         
-        total_commits = self.run_git_command("git rev-list --count HEAD")
+        commits = self.commit_headers() if headers_only else self.load_history()
         
-        first_commit = self.run_git_command("git log --reverse --format='%ci' | head -1")
-        last_commit = self.run_git_command("git log --format='%ci' -1")
+        first_commit = commits[-1].date if commits else ''
+        last_commit = commits[0].date if commits else ''
         
-        contributors = self.run_git_command("git shortlog -sn --all")
-        contributor_count = len(contributors.split('\n')) if contributors else 0
+        contributor_count = len({commit.author for commit in commits})
         
-        mps_files = self.run_git_command("find . -name '*.mps' | wc -l")
+        mps_files = self.count_mps_files()
         
         self.results['basic_metrics'] = {
-            'total_commits': int(total_commits) if total_commits else 0,
+            'total_commits': len(commits),
             'first_commit_date': first_commit,
             'last_commit_date': last_commit,
             'contributor_count': contributor_count,
-            'mps_files_count': int(mps_files) if mps_files else 0,
+            'mps_files_count': mps_files,
             'repository_age_days': self._calculate_repo_age(first_commit, last_commit)
         }
         
         return self.results['basic_metrics']
     
+    def count_mps_files(self, rev='HEAD'):
+        """Conta arquivos .mps na revisão (árvore do git, sem checkout)"""
+        if self.backend.rev_parse(rev) is None:
+            # sem histórico git (cópia exportada): conta na árvore de trabalho
+            return sum(
+                1 for _, _, files in os.walk(self.repo_path)
+                for name in files if name.endswith('.mps')
+            )
+        return self.backend.count_files(rev, '.mps')
+    
+    def read_file(self, rev, path):
+        """Lê o conteúdo de um arquivo em qualquer revisão, sem checkout"""
+        return self.backend.read_blob(rev, path)
+    
+    def close(self):
+        """Encerra os processos do backend git"""
+        self.backend.close()
+    
     def _calculate_repo_age(self, first_date, last_date):
         """Calcula idade do repositório em dias"""
         try:
@@ -73,54 +169,237 @@ class MPSRepositoryAnalyzer:
         except:
             return 0
     
-    def analyze_metamodel_changes(self):
-        """Analisa mudanças específicas em metamodelos"""
+    @metrics.timed('analyze_metamodel_changes')
+    def analyze_metamodel_changes(self, max_commits=DEFAULT_MAX_COMMITS, workers=1,
+                                  chunk_size=256, executor='process', progress=False):
+        """Analisa mudanças específicas em metamodelos
+
+        `max_commits=None` analisa todos os commits estruturais; o trabalho por
+        commit só é distribuído em lotes entre `workers` processos ou threads em
+        históricos com mais de PARALLEL_MIN_COMMITS commits estruturais.
+        """
         print("Analisando mudanças em metamodelos...")
         
-        structure_commits = self.run_git_command(
-            "git log --oneline --name-only | grep -B1 'structure\\.mps' | grep '^[a-f0-9]'"
-        )
+        commits = self.load_history()
         
-        mps_commits = self.run_git_command(
-            "git log --oneline --name-only | grep -B1 '\\.mps$' | grep '^[a-f0-9]'"
-        )
+        structure_commit_list = [c for c in commits if touches(c, 'structure.mps')]
+        mps_commit_count = sum(1 for c in commits if touches(c, '.mps'))
+        
+        selected = structure_commit_list[:max_commits] if max_commits else structure_commit_list
+        
+        cached = {}
+        if self.cache:
+            cached = self.cache.load_results(self.cache_key, [c.hash for c in selected])
+        pending = [c for c in selected if c.hash not in cached]
         
-        structure_commit_list = structure_commits.split('\n') if structure_commits else []
+        reporter = ProgressReporter(len(pending), 'commits estruturais') if progress and pending else None
+        computed = map_in_chunks(self._analyze_commit, pending, workers,
+                                 chunk_size, executor, reporter, PARALLEL_MIN_COMMITS)
+        if self.cache and computed:
+            self.cache.store_results(self.cache_key, computed)
         
-        for commit_hash in structure_commit_list[:20]:  
-            if commit_hash:
-                commit_info = self._analyze_commit(commit_hash)
-                if commit_info:
-                    self.results['metamodel_changes'].append(commit_info)
+        cached.update((info['hash'], info) for info in computed)
+        for commit in selected:
+            commit_info = cached.get(commit.hash)
+            if commit_info:
+                self.results['metamodel_changes'].append(commit_info)
         
         self.results['metamodel_stats'] = {
             'structure_commits_count': len(structure_commit_list),
-            'total_mps_commits': len(mps_commits.split('\n')) if mps_commits else 0
+            'total_mps_commits': mps_commit_count
         }
         
         return self.results['metamodel_changes']
     
-    def _analyze_commit(self, commit_hash):
-        """Analisa um commit específico"""
-        commit_msg = self.run_git_command(f"git log --format='%s' -1 {commit_hash}")
-        commit_date = self.run_git_command(f"git log --format='%ci' -1 {commit_hash}")
-        commit_author = self.run_git_command(f"git log --format='%an' -1 {commit_hash}")
+    @metrics.timed('estimate_metamodel_changes')
+    def estimate_metamodel_changes(self, sample_size=None, margin=0.02, confidence=0.95,
+                                   strata='year', seed=None):
+        """Estima totais e taxas classificando só uma amostra estratificada no tempo
+
+        Sem `sample_size`, o tamanho vem da margem de erro desejada (`margin`)
+        para uma proporção com o nível de confiança dado.
+        """
+        print("Estimando mudanças em metamodelos por amostragem estratificada")
+        
+        headers = self.commit_headers()
+        if sample_size is None:
+            sample_size = required_sample_size(len(headers), margin, confidence)
+        sample = StratifiedSample(stratum_keys([h.timestamp for h in headers], strata), sample_size, seed)
+        
+        hashes = [headers[i].hash for i in sample.indices]
+        if self.commits is not None:
+            by_hash = {c.hash: c for c in self.commits}
+            records = [by_hash[h] for h in hashes]
+        else:
+            records = commits_by_hash(self.repo_path, hashes)
+        analyzed = [self._analyze_commit(record) for record in records]
+        
+        indicators = {
+            'structure_commits': [touches(record, 'structure.mps') for record in records],
+            'mps_commits': [touches(record, '.mps') for record in records],
+            # como na análise completa: palavra-chave breaking em commit estrutural
+            'breaking': [info['is_breaking'] and touches(record, 'structure.mps')
+                         for info, record in zip(analyzed, records)]
+        }
+        for change_type in CHANGE_TYPES:
+            indicators[change_type] = [info['change_type'] == change_type for info in analyzed]
+        
+        self.results['sample_estimates'] = {
+            'population': sample.population,
+            'sample_size': int(len(sample.indices)),
+            'strata': strata,
+            'strata_count': int(len(sample.sizes)),
+            'confidence': confidence,
+            'estimates': {name: sample.estimate(values, confidence) for name, values in indicators.items()}
+        }
+        estimates = self.results['sample_estimates']['estimates']
+        self.results['metamodel_stats'] = {
+            'structure_commits_count': round(estimates['structure_commits']['total']),
+            'total_mps_commits': round(estimates['mps_commits']['total']),
+            'estimated': True
+        }
+        
+        return self.results['sample_estimates']
+    
+    @metrics.timed('analyze_structure_diffs')
+    def analyze_structure_diffs(self, max_commits=DEFAULT_MAX_COMMITS, workers=1,
+                                chunk_size=64, executor='process', progress=False):
+        """Compara as versões de cada structure.mps alterado e registra as mudanças breaking
+
+        Os blobs são interpretados em lotes de `chunk_size` entre `workers`
+        processos ou threads (`executor`). Com cache, só os commits ainda não
+        comparados são diferenciados.
+        """
+        print("Comparando versões de structure.mps...")
+        
+        commits = self.load_history()
+        structure_commit_list = [c for c in commits if touches(c, 'structure.mps')]
+        selected = structure_commit_list[:max_commits] if max_commits else structure_commit_list
+        
+        diffs = {}
+        if self.cache:
+            diffs = self.cache.load_structure_diffs(self.cache_key, [c.hash for c in selected])
+        pending = [c for c in selected if c.hash not in diffs]
+        
+        computed = {}
+        if pending:
+            differ = MetamodelDiffer(self.repo_path, self.backend, blob_cache=self.blob_cache)
+            for commit, path, changes in differ.diff_commits(pending, workers, chunk_size,
+                                                             progress, executor):
+                computed.setdefault(commit.hash, []).append((path, changes))
+        if self.cache and computed:
+            self.cache.store_structure_diffs(self.cache_key, computed)
+        diffs.update(computed)
+        
+        changes_by_hash = {info['hash']: info for info in self.results['metamodel_changes']}
+        total_changes = 0
+        breaking_hashes = set()
+        
+        for commit in selected:
+            for path, changes in diffs.get(commit.hash, ()):
+                if changes is None:
+                    continue
+                breaking = [change for change in changes if change['breaking']]
+                total_changes += len(changes)
+                
+                info = changes_by_hash.get(commit.hash)
+                if info is not None:
+                    info['structural_changes'] = info.get('structural_changes', 0) + len(changes)
+                    info['breaking_structural_changes'] = (info.get('breaking_structural_changes', 0)
+                                                           + len(breaking))
+                
+                if breaking:
+                    breaking_hashes.add(commit.hash)
+                    self.results['breaking_changes'].append({
+                        'hash': commit.hash,
+                        'date': commit.date,
+                        'author': commit.author,
+                        'path': path,
+                        'changes': breaking
+                    })
+        
+        self.results['structure_diff_stats'] = {
+            'commits_compared': len(selected),
+            'structural_changes': total_changes,
+            'breaking_changes': sum(len(b['changes']) for b in self.results['breaking_changes']),
+            'breaking_commits': len(breaking_hashes)
+        }
+        
+        return self.results['breaking_changes']
+    
+    @metrics.timed('analyze_coevolution')
+    def analyze_coevolution(self, freq='W', max_lag=8):
+        """Séries de mudanças de metamodelo × modelo e o acoplamento entre elas"""
+        print("Calculando séries de co-evolução")
+        
+        self.coevolution = CoevolutionSeries.from_commits(self.load_history(), freq)
+        self.results['coevolution'] = self.coevolution.summary(max_lag)
+        
+        return self.results['coevolution']
+    
+    @metrics.timed('analyze_file_population')
+    def analyze_file_population(self):
+        """Modelos, metamodelos e aspectos em cada commit first-parent (sem checkout)"""
+        print("Reconstruindo a população de arquivos MPS por commit")
+        
+        self.population = population_series(self.repo_path, backend=self.backend, blob_cache=self.blob_cache)
+        columns, hashes, dates, matrix = self.population
         
-        files_changed = self.run_git_command(f"git show --name-only --format='' {commit_hash}")
+        # resumo anual: contagens no último commit de cada ano
+        yearly = {}
+        for i, date in enumerate(dates):
+            yearly[date[:4]] = {name: int(value) for name, value in zip(columns, matrix[i]) if value}
+        self.results['file_population'] = yearly
         
-        change_type = self._classify_change_type(commit_msg, files_changed)
+        return self.results['file_population']
+    
+    @metrics.timed('analyze_ownership')
+    def analyze_ownership(self, workers=None, cache_file=DEFAULT_OWNERSHIP_PATH):
+        """Linhas por autor (git blame, .mailmap) de cada aspecto de metamodelo no HEAD"""
+        print("Calculando a propriedade dos aspectos de metamodelo")
+        
+        cache = OwnershipCache(cache_file) if cache_file else None
+        try:
+            self.results['ownership'] = ownership(self.repo_path, workers=workers, cache=cache,
+                                                  backend=self.backend)
+        except GitError as e:
+            print(f"Erro no cálculo de propriedade: {e}")
+            self.results['ownership'] = {'error': str(e)}
+        finally:
+            if cache:
+                cache.close()
+        
+        return self.results['ownership']
+    
+    def _breaking_commit_count(self):
+        """Commits breaking: pelo diff estrutural, ou pela mensagem se o diff não rodou"""
+        diff_stats = self.results.get('structure_diff_stats')
+        if diff_stats:
+            return diff_stats['breaking_commits']
+        if 'sample_estimates' in self.results:
+            return round(self.results['sample_estimates']['estimates']['breaking']['total'])
+        return len([c for c in self.results['metamodel_changes'] if c['is_breaking']])
+    
+    @staticmethod
+    def _analyze_commit(commit):
+        """Analisa um commit específico a partir do seu registro no histórico"""
+        files_changed = [change.path for change in commit.files]
+        
+        change_type = MPSRepositoryAnalyzer._classify_change_type(commit.message, '\n'.join(files_changed))
         
         return {
-            'hash': commit_hash,
-            'message': commit_msg,
-            'date': commit_date,
-            'author': commit_author,
-            'files_changed': files_changed.split('\n') if files_changed else [],
+            'hash': commit.hash,
+            'message': commit.message,
+            'date': commit.date,
+            'author': commit.author,
+            'files_changed': files_changed,
+            'file_status': [change.status for change in commit.files],
             'change_type': change_type,
-            'is_breaking': self._is_breaking_change(commit_msg)
+            'is_breaking': MPSRepositoryAnalyzer._is_breaking_change(commit.message)
         }
     
-    def _classify_change_type(self, commit_msg, files_changed):
+    @staticmethod
+    def _classify_change_type(commit_msg, files_changed):
         """Classifica o tipo de mudança baseado na mensagem e arquivos"""
         msg_lower = commit_msg.lower()
         files_str = files_changed.lower()
@@ -138,7 +417,8 @@ class MPSRepositoryAnalyzer:
         else:
             return 'modification'
     
-    def _is_breaking_change(self, commit_msg):
+    @staticmethod
+    def _is_breaking_change(commit_msg):
         """Detecta se é uma mudança breaking"""
         breaking_keywords = [
             'break', 'breaking', 'remove', 'delete', 'drop',
@@ -146,19 +426,22 @@ class MPSRepositoryAnalyzer:
         ]
         return any(keyword in commit_msg.lower() for keyword in breaking_keywords)
     
-    def analyze_contributors(self):
+    @metrics.timed('analyze_contributors')
+    def analyze_contributors(self, headers_only=False):
         """Analisa padrões de contribuição"""
         print("Analisando contribuintes")
         
-        contributors_raw = self.run_git_command("git shortlog -sn --all")
+        commits = self.commit_headers() if headers_only else self.load_history()
         
-        yearly_activity = self.run_git_command(
-            "git log --format='%ci' | cut -d'-' -f1 | sort | uniq -c"
-        )
+        authors = Counter(commit.author for commit in commits)
+        years = Counter(commit.date[:4] for commit in commits)
+        
+        # mesmo formato de `git shortlog -sn` e `uniq -c`
+        top_contributors = sorted(authors.items(), key=lambda item: (-item[1], item[0]))[:10]
         
         self.results['contributors'] = {
-            'top_contributors': contributors_raw.split('\n')[:10] if contributors_raw else [],
-            'yearly_activity': yearly_activity.split('\n') if yearly_activity else []
+            'top_contributors': [f"{count:6d}\t{name}" for name, count in top_contributors],
+            'yearly_activity': [f"{count:7d} {year}" for year, count in sorted(years.items())]
         }
         
         return self.results['contributors']
@@ -178,7 +461,7 @@ class MPSRepositoryAnalyzer:
         structure_changes = self.results.get('metamodel_stats', {}).get('structure_commits_count', 0)
         score += min(structure_changes / 10, 20)  
         
-        breaking_changes = len([c for c in self.results['metamodel_changes'] if c['is_breaking']])
+        breaking_changes = self._breaking_commit_count()
         score += min(breaking_changes * 2, 20) 
         
         if metrics['mps_files_count'] > 50:
@@ -207,15 +490,72 @@ MÉTRICAS BÁSICAS:
 
 EVOLUÇÃO DE METAMODELO:
 - Commits estruturais: {self.results.get('metamodel_stats', {}).get('structure_commits_count', 0)}
-- Mudanças breaking: {len([c for c in self.results['metamodel_changes'] if c['is_breaking']])}
+- Mudanças breaking: {self._breaking_commit_count()}
 
+{self._sample_report()}{self._coevolution_report()}{self._ownership_report()}
 SCORE DE ADEQUAÇÃO: {score:.1f}/100
 
 STATUS: {'ADEQUADO' if score >= 70 else ' LIMITADO' if score >= 50 else ' INADEQUADO'}
+
+{metrics.format_report()}
 """
         
         return report
     
+    def _sample_report(self):
+        """Trecho do relatório com as estimativas por amostragem"""
+        sample = self.results.get('sample_estimates')
+        if not sample:
+            return ""
+        lines = [
+            f"ESTIMATIVAS POR AMOSTRAGEM ({sample['sample_size']} de {sample['population']} commits, "
+            f"{sample['strata_count']} estratos por {sample['strata']}, confiança {sample['confidence']:.0%}):"
+        ]
+        for name, estimate in sample['estimates'].items():
+            low, high = estimate['rate_ci']
+            total_low, total_high = estimate['total_ci']
+            lines.append(
+                f"- {name}: {estimate['rate']:.1%} [{low:.1%}, {high:.1%}] "
+                f"≈ {estimate['total']:.0f} commits [{total_low:.0f}, {total_high:.0f}]"
+            )
+        return '\n'.join(lines) + '\n\n'
+    
+    def _coevolution_report(self):
+        """Trecho do relatório com o acoplamento metamodelo × modelo"""
+        summary = self.results.get('coevolution')
+        if not summary:
+            return ""
+        cc = summary['cross_correlation']
+        lines = ["CO-EVOLUÇÃO:"]
+        if cc['peak_lag'] is None:
+            lines.append("- Correlação metamodelo × modelo indefinida (série vazia ou constante)")
+        else:
+            lines.append(
+                f"- Correlação máxima metamodelo × modelo: {cc['peak_correlation']:+.3f} "
+                f"(lag {cc['peak_lag']:+d} períodos {summary['period']})"
+            )
+        response = summary['response_time']
+        if response:
+            lines.append(
+                f"- Resposta dos modelos: mediana {response['median_days']:.1f} dias, "
+                f"p90 {response['p90_days']:.1f} dias ({response['same_commit_share']:.0%} no mesmo commit)"
+            )
+        return '\n'.join(lines) + '\n'
+    
+    def _ownership_report(self):
+        """Trecho do relatório com os principais donos de cada aspecto"""
+        result = self.results.get('ownership')
+        if not result:
+            return ""
+        lines = ["PROPRIEDADE DOS METAMODELOS:"]
+        if 'error' in result:
+            return '\n'.join(lines + [f"- Erro: {result['error']}"]) + '\n'
+        for aspect, summary in result['aspects'].items():
+            owners = ', '.join(f"{name} {share:.0%}" for name, _, share in summary['owners'][:3])
+            lines.append(f"- {aspect}: {summary['lines']} linhas, {summary['authors']} autores "
+                         f"({summary['authors_for_half']} cobrem metade): {owners}")
+        return '\n'.join(lines) + '\n'
+    
     def export_data(self, output_file='mps_analysis.json'):
         """Exporta dados para arquivo JSON"""
         self.results['suitability_score'] = self.calculate_suitability_score()
@@ -224,49 +564,389 @@ STATUS: {'ADEQUADO' if score >= 70 else ' LIMITADO' if score >= 50 else ' INADEQ
             json.dump(self.results, f, indent=2, ensure_ascii=False)
         
         print(f"Dados exportados para: {output_file}")
+    
+    def export_columnar(self, output_dir):
+        """Exporta tabelas tipadas (commits, file_changes, breaking_changes) em binário"""
+        self.results['suitability_score'] = self.calculate_suitability_score()
+        store = ResultsStore(output_dir)
+        
+        def classify(commit):
+            files = '\n'.join(change.path for change in commit.files)
+            return (self._classify_change_type(commit.message, files),
+                    self._is_breaking_change(commit.message))
+        
+        commits_df, file_changes_df = commit_frames(self.load_history(), classify)
+        store.save('commits', commits_df)
+        store.save('file_changes', file_changes_df)
+        
+        breaking_rows = [
+            dict(hash=entry['hash'], path=entry['path'], **change)
+            for entry in self.results['breaking_changes'] for change in entry['changes']
+        ]
+        breaking_df = pd.DataFrame(breaking_rows, columns=[
+            'hash', 'path', 'element', 'change', 'concept', 'feature', 'old', 'new', 'breaking'
+        ])
+        for column in ('path', 'element', 'change', 'concept'):
+            breaking_df[column] = breaking_df[column].astype('category')
+        for column in ('old', 'new'):
+            breaking_df[column] = breaking_df[column].map(lambda v: None if v is None else str(v)).astype('string')
+        store.save('breaking_changes', breaking_df)
+        
+        if self.population is not None:
+            store.save('file_population', population_frame(*self.population))
+        
+        if self.coevolution is not None:
+            store.save('coevolution_commits', self.coevolution.to_frame('commits'))
+            store.save('coevolution_files', self.coevolution.to_frame('files'))
+        
+        store.save_metadata({
+            key: value for key, value in self.results.items()
+            if key not in ('metamodel_changes', 'breaking_changes', 'timeline')
+        })
+        
+        print(f"Dados exportados para: {output_dir}")
 
-def main():
-    """Função principal - exemplo de uso"""
+def log_path(repo_path):
+    """Arquivo de log do processo que analisa o repositório"""
+    return f"analysis_{Path(repo_path).name}.log"
+
+def parse_args(argv=None):
+    """Lê as opções de linha de comando"""
+    parser = argparse.ArgumentParser(
+        description='Analisa a co-evolução de metamodelos em repositórios MPS'
+    )
     
-    repositories = [
-        "repositories/mbeddr.core",
-        "repositories/iets3.opensource", 
-        "repositories/selfadaptive-IoT-DSL"
-    ]
+    parser.add_argument(
+        'repositories',
+        nargs='*',
+        help='Repositórios a analisar (padrão: mbeddr.core, iets3.opensource e selfadaptive-IoT-DSL)'
+    )
     
-    results_summary = []
+    parser.add_argument(
+        '--manifest',
+        default=None,
+        help='Arquivo com um caminho de repositório por linha'
+    )
     
-    for repo_path in repositories:
-        if not os.path.exists(repo_path):
-            print(f"Repositório não encontrado: {repo_path}")
-            continue
-            
-        print(f"\nAnalisando: {repo_path}")
-        print("=" * 50)
-        
-        analyzer = MPSRepositoryAnalyzer(repo_path)
-        
-        analyzer.analyze_basic_metrics()
-        analyzer.analyze_metamodel_changes()
-        analyzer.analyze_contributors()
+    parser.add_argument(
+        '--parallel',
+        type=int,
+        default=1,
+        help='Repositórios analisados ao mesmo tempo, cada um em um processo (padrão: 1)'
+    )
+    
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        default=None,
+        help='Tempo máximo (s) por repositório; o processo é encerrado ao excedê-lo'
+    )
+    
+    parser.add_argument(
+        '--all-commits',
+        action='store_true',
+        help='Analisa todos os commits estruturais (padrão: apenas os 20 mais recentes)'
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=default_workers(),
+        help='Número de processos/threads para as fases caras (diffs de structure.mps, blame); '
+             'a classificação por commit só usa o pool em históricos muito grandes '
+             '(padrão: núcleos disponíveis)'
+    )
+    
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=256,
+        help='Itens por lote enviado a cada worker: blobs de structure.mps na fase de diff '
+             '(e commits na classificação de históricos muito grandes) (padrão: 256)'
+    )
+    
+    parser.add_argument(
+        '--executor',
+        choices=['process', 'thread'],
+        default='process',
+        help='Tipo de pool da fase de diff de structure.mps (e da classificação de '
+             'históricos muito grandes) (padrão: process)'
+    )
+    
+    parser.add_argument(
+        '--cache',
+        default=DEFAULT_CACHE_PATH,
+        help=f'Banco SQLite do cache incremental (padrão: {DEFAULT_CACHE_PATH})'
+    )
+    
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Ignora os caches (histórico e blobs) e reanalisa todo o histórico'
+    )
+    
+    parser.add_argument(
+        '--backend',
+        choices=sorted(BACKENDS),
+        default='catfile',
+        help='Backend de leitura de objetos git (padrão: catfile)'
+    )
+    
+    parser.add_argument(
+        '--no-structure-diff',
+        action='store_true',
+        help='Não compara as versões de structure.mps (breaking pela mensagem do commit)'
+    )
+    
+    parser.add_argument(
+        '--period',
+        choices=['D', 'W'],
+        default='W',
+        help='Período das séries de co-evolução: D (dia) ou W (semana); padrão: W'
+    )
+    
+    parser.add_argument(
+        '--max-lag',
+        type=int,
+        default=8,
+        help='Defasagem máxima (em períodos) da correlação metamodelo × modelo (padrão: 8)'
+    )
+    
+    parser.add_argument(
+        '--ownership',
+        action='store_true',
+        help='Linhas por autor (git blame) de cada aspecto de metamodelo, com cache por blob'
+    )
+    
+    parser.add_argument(
+        '--file-population',
+        action='store_true',
+        help='Conta modelos/metamodelos/aspectos em cada commit do histórico first-parent'
+    )
+    
+    parser.add_argument(
+        '--sample',
+        type=int,
+        default=None,
+        metavar='N',
+        help='Classifica só uma amostra estratificada de N commits e estima totais e taxas'
+    )
+    
+    parser.add_argument(
+        '--sample-margin',
+        type=float,
+        default=None,
+        metavar='E',
+        help='Amostragem com tamanho calculado para a margem de erro E (ex.: 0.02)'
+    )
+    
+    parser.add_argument(
+        '--sample-confidence',
+        type=float,
+        default=0.95,
+        help='Nível de confiança dos intervalos da amostragem (padrão: 0.95)'
+    )
+    
+    parser.add_argument(
+        '--sample-strata',
+        choices=STRATA,
+        default='year',
+        help='Período usado como estrato da amostragem (padrão: year)'
+    )
+    
+    parser.add_argument(
+        '--sample-seed',
+        type=int,
+        default=None,
+        help='Semente do sorteio da amostra, para reproduzir a análise'
+    )
+    
+    parser.add_argument(
+        '--format',
+        choices=['json', 'columnar'],
+        default='json',
+        help='Formato de saída: JSON único ou tabelas colunares em diretório (padrão: json)'
+    )
+    
+    parser.add_argument(
+        '--progress',
+        action='store_true',
+        help='Mostra o progresso da análise por commit'
+    )
+    
+    parser.add_argument(
+        '--metrics',
+        action='store_true',
+        help='Grava as métricas de desempenho em analysis_<repo>.metrics.json'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        choices=['cprofile', 'sampling'],
+        default=None,
+        help='Perfil detalhado da análise de cada repositório (analysis_<repo>.prof)'
+    )
+    
+    return parser.parse_args(argv)
+
+DEFAULT_REPOSITORIES = [
+    "repositories/mbeddr.core",
+    "repositories/iets3.opensource", 
+    "repositories/selfadaptive-IoT-DSL"
+]
+
+def read_manifest(manifest_file):
+    """Lê um manifesto com um repositório por linha (`#` inicia comentário)
+
+    Caminhos relativos são resolvidos a partir do diretório do manifesto.
+    """
+    base = Path(manifest_file).parent
+    repositories = []
+    with open(manifest_file, encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                repositories.append(str(base / line) if not os.path.isabs(line) else line)
+    return repositories
+
+def analyze_repository(repo_path, args, cache=None):
+    """Executa todas as fases para um repositório e exporta os resultados"""
+    own_cache = cache is None and not args.no_cache
+    if own_cache:
+        cache = AnalysisCache(args.cache)
+    blob_cache = None if args.no_cache else BlobSummaryCache(DEFAULT_BLOB_CACHE_PATH)
+    
+    metrics.reset()
+    analyzer = MPSRepositoryAnalyzer(repo_path, cache=cache, backend=args.backend, blob_cache=blob_cache)
+    
+    try:
+        profile_file = f"analysis_{Path(repo_path).name}.prof" if args.profile else None
+        with profiling(args.profile, profile_file):
+            if args.sample or args.sample_margin:
+                analyzer.analyze_basic_metrics(headers_only=True)
+                analyzer.estimate_metamodel_changes(
+                    sample_size=args.sample,
+                    margin=args.sample_margin or 0.02,
+                    confidence=args.sample_confidence,
+                    strata=args.sample_strata,
+                    seed=args.sample_seed
+                )
+                analyzer.analyze_contributors(headers_only=True)
+            else:
+                analyzer.analyze_basic_metrics()
+                analyzer.analyze_metamodel_changes(
+                    max_commits=None if args.all_commits else DEFAULT_MAX_COMMITS,
+                    workers=args.workers,
+                    chunk_size=args.chunk_size,
+                    executor=args.executor,
+                    progress=args.progress
+                )
+                if not args.no_structure_diff:
+                    analyzer.analyze_structure_diffs(
+                        max_commits=None if args.all_commits else DEFAULT_MAX_COMMITS,
+                        workers=args.workers,
+                        chunk_size=args.chunk_size,
+                        executor=args.executor,
+                        progress=args.progress
+                    )
+                analyzer.analyze_contributors()
+                analyzer.analyze_coevolution(args.period, args.max_lag)
+                if args.file_population:
+                    analyzer.analyze_file_population()
+                if args.ownership:
+                    analyzer.analyze_ownership(
+                        workers=args.workers,
+                        cache_file=None if args.no_cache else DEFAULT_OWNERSHIP_PATH
+                    )
         
         report = analyzer.generate_report()
-        print(report)
         
-        output_file = f"analysis_{Path(repo_path).name}.json"
-        analyzer.export_data(output_file)
-        
-        results_summary.append({
-            'repository': Path(repo_path).name,
-            'score': analyzer.calculate_suitability_score(),
-            'output_file': output_file
-        })
+        if args.format == 'columnar':
+            output_file = f"analysis_{Path(repo_path).name}"
+            analyzer.export_columnar(output_file)
+        else:
+            output_file = f"analysis_{Path(repo_path).name}.json"
+            analyzer.export_data(output_file)
+    finally:
+        analyzer.close()
+        if own_cache:
+            cache.close()
+        if blob_cache is not None:
+            blob_cache.close()
+    
+    if args.metrics:
+        metrics.write(f"analysis_{Path(repo_path).name}.metrics.json")
+    
+    return {
+        'repository': Path(repo_path).name,
+        'score': analyzer.calculate_suitability_score(),
+        'output_file': output_file,
+        'report': report
+    }
+
+def main(argv=None):
+    """Função principal - exemplo de uso"""
+    args = parse_args(argv)
+    
+    repositories = list(args.repositories)
+    if args.manifest:
+        repositories += read_manifest(args.manifest)
+    if not repositories:
+        repositories = DEFAULT_REPOSITORIES
+    
+    existing = []
+    for repo_path in repositories:
+        if os.path.exists(repo_path):
+            existing.append(repo_path)
+        else:
+            print(f"Repositório não encontrado: {repo_path}")
+    
+    results_summary = []
+    failures = []
+    
+    if args.parallel <= 1 and not args.timeout:
+        cache = None if args.no_cache else AnalysisCache(args.cache)
+        for repo_path in existing:
+            print(f"\nAnalisando: {repo_path}")
+            print("=" * 50)
+            try:
+                result = analyze_repository(repo_path, args, cache)
+            except Exception as e:
+                print(f"Falha ao analisar {repo_path}: {e}")
+                failures.append((Path(repo_path).name, 'error', str(e)))
+                continue
+            print(result['report'])
+            results_summary.append(result)
+            print("\n" + "=" * 60)
+        if cache:
+            cache.close()
+    else:
+        # um processo por repositório; os workers por commit são divididos entre eles
+        args.workers = max(1, args.workers // max(1, min(args.parallel, len(existing))))
+        print(f"\nAnalisando {len(existing)} repositórios ({args.parallel} em paralelo, "
+              f"{args.workers} workers cada)")
+        for repo_path, status, value, elapsed in map_isolated(
+                analyze_repository, existing, (args,), args.parallel, args.timeout, log_path):
+            name = Path(repo_path).name
+            if status == 'ok':
+                results_summary.append(value)
+                print(f"[{len(results_summary) + len(failures)}/{len(existing)}] "
+                      f"{name:30} Score: {value['score']:5.1f} ({elapsed:.1f}s)")
+            else:
+                failures.append((name, status, value))
+                print(f"[{len(results_summary) + len(failures)}/{len(existing)}] "
+                      f"{name:30} {status.upper()} ({elapsed:.1f}s, log: {log_path(repo_path)})")
         print("\n" + "=" * 60)
+    
     print("RESUMO FINAL")
     print("=" * 60)
     
     for result in sorted(results_summary, key=lambda x: x['score'], reverse=True):
         print(f"{result['repository']:30} Score: {result['score']:5.1f} ({result['output_file']})")
+    
+    for name, status, error in failures:
+        # worker morto sem saída: o texto do erro pode estar vazio
+        print(f"{name:30} {status.upper()}: {(error.strip().splitlines() or ['?'])[-1]}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Parser incremental de modelos MPS (persistência v9)
+Autor: Ana Carolina Poltronieri
+Propósito: Ler `<languages>`, `<imports>`, `<registry>` e a árvore de nós de
+arquivos .mps sob demanda, com memória constante independente do tamanho
+"""
+
+import io
+import os
+import xml.etree.ElementTree as ET
+from collections import Counter, namedtuple
+
+SUPPORTED_PERSISTENCE = 9
+
+ModelInfo = namedtuple('ModelInfo', ['ref', 'persistence', 'content'])
+LanguageUse = namedtuple('LanguageUse', ['id', 'name', 'version'])
+DevkitUse = namedtuple('DevkitUse', ['ref'])
+ModelImport = namedtuple('ModelImport', ['index', 'ref', 'implicit'])
+RegistryLanguage = namedtuple('RegistryLanguage', ['id', 'name'])
+RegistryConcept = namedtuple('RegistryConcept', ['language_id', 'id', 'name', 'flags', 'index'])
+# kind: 'property', 'child' ou 'reference'
+RegistryFeature = namedtuple('RegistryFeature', ['concept_index', 'kind', 'id', 'name', 'index'])
+# concept e role são os apelidos curtos (`index`) declarados no registry
+Node = namedtuple('Node', ['id', 'concept', 'role', 'parent', 'depth'])
+NodeProperty = namedtuple('NodeProperty', ['node', 'role', 'value'])
+NodeReference = namedtuple('NodeReference', ['node', 'role', 'target', 'resolve'])
+
+REGISTRY_FEATURES = {'property', 'child', 'reference'}
+
+
+def _open_source(source):
+    """Aceita caminho, bytes (ex.: blob lido do git) ou objeto de arquivo"""
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source), True
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb'), True
+    return source, False
+
+
+def iter_model(source, include_nodes=True):
+    """Gera os registros de um modelo .mps, um a um
+
+    Os elementos já processados são descartados à medida que o parser avança,
+    então a memória depende apenas da profundidade da árvore, não do arquivo.
+    Modelos com persistência diferente de v9 geram apenas o ModelInfo.
+    """
+    stream, owned = _open_source(source)
+    try:
+        yield from _iter_events(stream, include_nodes)
+    finally:
+        if owned:
+            stream.close()
+
+
+def _iter_events(stream, include_nodes):
+    root = None
+    section = None
+    registry_language = None
+    registry_concept = None
+    nodes = []
+    ref = content = None
+
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        tag = elem.tag
+
+        if event == 'start':
+            if root is None:
+                root = elem
+                ref = elem.get('ref') or elem.get('modelUID')
+                content = elem.get('content')
+                continue
+
+            if tag == 'persistence':
+                version = int(elem.get('version', 0))
+                yield ModelInfo(ref, version, content)
+                if version != SUPPORTED_PERSISTENCE:
+                    return
+
+            elif tag == 'node':
+                if not include_nodes:
+                    return
+                parent = nodes[-1] if nodes else None
+                node_id = elem.get('id')
+                yield Node(node_id, elem.get('concept'), elem.get('role'), parent, len(nodes))
+                nodes.append(node_id)
+
+            elif nodes:
+                if tag == 'property':
+                    yield NodeProperty(nodes[-1], elem.get('role'), elem.get('value'))
+                elif tag == 'ref':
+                    target = elem.get('to') or elem.get('node')
+                    yield NodeReference(nodes[-1], elem.get('role'), target, elem.get('resolve'))
+
+            elif tag in ('languages', 'imports', 'registry'):
+                section = tag
+
+            elif section == 'languages':
+                if tag == 'use':
+                    yield LanguageUse(elem.get('id'), elem.get('name'), elem.get('version'))
+                elif tag == 'devkit':
+                    yield DevkitUse(elem.get('ref'))
+
+            elif section == 'imports' and tag == 'import':
+                yield ModelImport(elem.get('index'), elem.get('ref'), elem.get('implicit') == 'true')
+
+            elif section == 'registry':
+                if tag == 'language':
+                    registry_language = elem.get('id')
+                    yield RegistryLanguage(registry_language, elem.get('name'))
+                elif tag == 'concept':
+                    registry_concept = elem.get('index')
+                    yield RegistryConcept(
+                        registry_language, elem.get('id'), elem.get('name'),
+                        elem.get('flags'), registry_concept
+                    )
+                elif tag in REGISTRY_FEATURES:
+                    yield RegistryFeature(
+                        registry_concept, tag, elem.get('id'), elem.get('name'), elem.get('index')
+                    )
+
+        else:
+            if tag == 'node':
+                nodes.pop()
+                elem.clear()
+                if not nodes:
+                    root.clear()
+            elif tag in ('languages', 'imports', 'registry'):
+                section = None
+                root.clear()
+            elif not nodes and elem is not root:
+                elem.clear()
+
+
+def summarize_model(source):
+    """Resume um modelo em um dicionário (idiomas, imports, registry e contagens)"""
+    summary = {
+        'ref': None,
+        'persistence': None,
+        'languages': {},
+        'devkits': [],
+        'imports': {},
+        'concepts': {},
+        'concept_counts': Counter(),
+        'node_count': 0,
+        'root_count': 0,
+        'max_depth': 0,
+        'reference_count': 0
+    }
+    concepts = summary['concepts']
+
+    for record in iter_model(source):
+        kind = type(record)
+        if kind is Node:
+            summary['node_count'] += 1
+            summary['concept_counts'][record.concept] += 1
+            if record.parent is None:
+                summary['root_count'] += 1
+            if record.depth > summary['max_depth']:
+                summary['max_depth'] = record.depth
+        elif kind is NodeReference:
+            summary['reference_count'] += 1
+        elif kind is RegistryConcept:
+            concepts[record.index] = (record.language_id, record.id, record.name)
+        elif kind is LanguageUse:
+            summary['languages'][record.id] = record.name
+        elif kind is ModelImport:
+            summary['imports'][record.index] = record.ref
+        elif kind is DevkitUse:
+            summary['devkits'].append(record.ref)
+        elif kind is ModelInfo:
+            summary['ref'] = record.ref
+            summary['persistence'] = record.persistence
+
+    # troca os apelidos curtos pelos nomes completos dos conceitos
+    summary['concept_counts'] = {
+        concepts[index][2] if index in concepts else index: count
+        for index, count in summary['concept_counts'].items()
+    }
+    return summary
+
+
+def iter_model_files(repo_path):
+    """Caminhos de todos os arquivos .mps de uma árvore de diretórios"""
+    for dirpath, dirnames, filenames in os.walk(repo_path):
+        dirnames[:] = [d for d in dirnames if d != '.git']
+        for name in filenames:
+            if name.endswith('.mps'):
+                yield os.path.join(dirpath, name)
+
+
+def iter_repository(repo_path, include_nodes=True):
+    """Gera (caminho, registro) para todos os modelos de um repositório"""
+    for path in iter_model_files(repo_path):
+        try:
+            for record in iter_model(path, include_nodes):
+                yield path, record
+        except ET.ParseError as e:
+            print(f"Erro ao ler modelo {path}: {e}")
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Tabela compacta de nós de modelos MPS
+Autor: Ana Carolina Poltronieri
+Propósito: Guardar a árvore de nós de milhares de modelos (persistência v9)
+em colunas numpy (pai, conceito, papel, profundidade, referências) com
+conceitos e papéis internados, para calcular tamanho, profundidade, fan-out
+e histogramas por conceito sem manter objetos Python por nó
+"""
+
+import argparse
+import xml.etree.ElementTree as ET
+from array import array
+
+import numpy as np
+
+from mps_parser import Node, NodeReference, RegistryConcept, RegistryFeature, iter_model, \
+    iter_model_files
+from parallel import map_in_chunks
+
+
+class NodeRecord:
+    """Um nó visto de fora da tabela (criado só quando pedido)"""
+
+    __slots__ = ('index', 'model', 'concept', 'role', 'parent', 'depth', 'references')
+
+    def __init__(self, index, model, concept, role, parent, depth, references):
+        self.index = index
+        self.model = model
+        self.concept = concept
+        self.role = role
+        self.parent = parent
+        self.depth = depth
+        self.references = references
+
+    def __repr__(self):
+        return f"NodeRecord({self.index}, {self.concept!r}, role={self.role!r}, parent={self.parent})"
+
+
+class Interner:
+    """Nomes ↔ índices inteiros densos"""
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        index = self.ids.get(name)
+        if index is None:
+            index = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def lookup(self, names):
+        """Vetor de remapeamento: índice local → índice global"""
+        return np.fromiter((self.intern(name) for name in names), dtype=np.int32, count=len(names))
+
+
+def read_model_nodes(path):
+    """Lê a árvore de um modelo em colunas locais (executado nos processos)
+
+    Retorna (caminho, nomes de conceitos, nomes de papéis, colunas) com
+    conceito e papel numerados localmente e pai relativo ao próprio modelo
+    (-1 para raízes). Os apelidos curtos do registry viram nomes completos.
+    """
+    concept_names = {}
+    role_names = {}
+    local_concepts = Interner()
+    local_roles = Interner()
+    parent, concept, role, depth, references = (array('i') for _ in range(5))
+    stack = []
+    ids = []
+
+    try:
+        for record in iter_model(path):
+            kind = type(record)
+            if kind is Node:
+                del stack[record.depth:]
+                index = len(parent)
+                parent.append(stack[-1] if stack else -1)
+                concept.append(local_concepts.intern(concept_names.get(record.concept, record.concept)))
+                role.append(local_roles.intern(role_names.get(record.role, record.role)) if record.role else -1)
+                depth.append(record.depth)
+                references.append(0)
+                stack.append(index)
+                ids.append(record.id)
+            elif kind is NodeReference:
+                # a referência é do nó aberto mais interno com esse id
+                for index in reversed(stack):
+                    if ids[index] == record.node:
+                        references[index] += 1
+                        break
+            elif kind is RegistryConcept:
+                concept_names[record.index] = record.name
+            elif kind is RegistryFeature:
+                role_names[record.index] = record.name
+    except (ET.ParseError, OSError) as e:
+        print(f"Erro ao ler modelo {path}: {e}")
+
+    columns = {
+        name: np.frombuffer(column, dtype=np.int32) if len(column) else np.zeros(0, dtype=np.int32)
+        for name, column in (('parent', parent), ('concept', concept), ('role', role),
+                             ('depth', depth), ('references', references))
+    }
+    return path, local_concepts.names, local_roles.names, columns
+
+
+class NodeTable:
+    """Nós de vários modelos em colunas contíguas
+
+    O modelo `m` ocupa as linhas `offsets[m]:offsets[m + 1]`; `parent` é o
+    índice global do pai (-1 nas raízes); `concept` e `role` indexam
+    `concepts.names` e `roles.names` (-1 sem papel).
+    """
+
+    COLUMNS = ('parent', 'concept', 'role', 'depth', 'references')
+
+    def __init__(self):
+        self.concepts = Interner()
+        self.roles = Interner()
+        self.models = []
+        self._parts = {name: [] for name in self.COLUMNS}
+        self._sizes = [0]
+        self._columns = None
+
+    @classmethod
+    def from_files(cls, paths, workers=None, chunk_size=16):
+        """Lê os modelos em paralelo e junta as colunas"""
+        table = cls()
+        for path, concepts, roles, columns in map_in_chunks(read_model_nodes, list(paths), workers, chunk_size):
+            table.add_model(path, concepts, roles, columns)
+        return table
+
+    @classmethod
+    def from_repository(cls, repo_path, workers=None):
+        return cls.from_files(iter_model_files(repo_path), workers)
+
+    def add_model(self, path, concepts, roles, columns):
+        """Acrescenta as colunas locais de um modelo, reinternando conceitos e papéis"""
+        start = self._sizes[-1]
+        concept_map = self.concepts.lookup(concepts)
+        role_map = np.append(self.roles.lookup(roles), np.int32(-1))
+        parent = columns['parent']
+        self.models.append(path)
+        self._parts['parent'].append(np.where(parent >= 0, parent + start, -1).astype(np.int32))
+        self._parts['concept'].append(concept_map[columns['concept']])
+        # papel -1 indexa o último elemento do mapa, que é -1
+        self._parts['role'].append(role_map[columns['role']])
+        self._parts['depth'].append(columns['depth'].astype(np.int16))
+        self._parts['references'].append(columns['references'])
+        self._sizes.append(start + len(parent))
+        self._columns = None
+
+    def _column(self, name):
+        if self._columns is None:
+            self._columns = {
+                column: np.concatenate(parts) if parts else np.zeros(0, dtype=np.int32)
+                for column, parts in self._parts.items()
+            }
+            # depois de juntar, as partes viram uma só (menos memória e cópias)
+            self._parts = {column: [values] for column, values in self._columns.items()}
+        return self._columns[name]
+
+    @property
+    def parent(self):
+        return self._column('parent')
+
+    @property
+    def concept(self):
+        return self._column('concept')
+
+    @property
+    def role(self):
+        return self._column('role')
+
+    @property
+    def depth(self):
+        return self._column('depth')
+
+    @property
+    def references(self):
+        return self._column('references')
+
+    @property
+    def offsets(self):
+        return np.asarray(self._sizes, dtype=np.int64)
+
+    @property
+    def model_index(self):
+        """Modelo de cada nó"""
+        return np.repeat(np.arange(len(self.models), dtype=np.int32), np.diff(self.offsets))
+
+    def __len__(self):
+        return self._sizes[-1]
+
+    def nbytes(self):
+        return sum(self._column(name).nbytes for name in self.COLUMNS)
+
+    def node(self, index):
+        """Registro de um nó (para exibição e consultas pontuais)"""
+        model = int(np.searchsorted(self.offsets, index, side='right') - 1)
+        role = int(self.role[index])
+        return NodeRecord(
+            index, self.models[model], self.concepts.names[self.concept[index]],
+            self.roles.names[role] if role >= 0 else None,
+            int(self.parent[index]), int(self.depth[index]), int(self.references[index])
+        )
+
+    def fan_out(self):
+        """Número de filhos de cada nó"""
+        parent = self.parent
+        return np.bincount(parent[parent >= 0], minlength=len(self)).astype(np.int32)
+
+    def concept_histogram(self, nodes=None):
+        """Contagem de nós por conceito (todos ou só as linhas em `nodes`)"""
+        concept = self.concept if nodes is None else self.concept[nodes]
+        return np.bincount(concept, minlength=len(self.concepts))
+
+    def model_concept_counts(self):
+        """Pares (modelo, conceito, contagem) com contagem > 0, sem matriz densa"""
+        keys = self.model_index.astype(np.int64) * len(self.concepts) + self.concept
+        unique, counts = np.unique(keys, return_counts=True)
+        return unique // len(self.concepts), unique % len(self.concepts), counts
+
+    def model_metrics(self):
+        """Métricas por modelo: nós, raízes, profundidade, fan-out e referências"""
+        offsets = self.offsets
+        starts = offsets[:-1]
+        sizes = np.diff(offsets)
+        present = sizes > 0
+        model = self.model_index
+        fan_out = self.fan_out()
+
+        def per_model(values, ufunc):
+            result = np.zeros(len(self.models), dtype=np.int64)
+            result[present] = ufunc.reduceat(values, starts[present])
+            return result
+
+        roots = np.bincount(model, weights=self.parent < 0, minlength=len(self.models)).astype(np.int64)
+        inner = np.bincount(model, weights=fan_out > 0, minlength=len(self.models))
+        return {
+            'node_count': sizes,
+            'root_count': roots,
+            'max_depth': per_model(self.depth.astype(np.int64), np.maximum),
+            'max_fan_out': per_model(fan_out.astype(np.int64), np.maximum),
+            # cada nó que não é raiz é filho de algum nó interno
+            'mean_fan_out': np.divide(sizes - roots, inner, out=np.zeros(len(self.models)), where=inner > 0),
+            'reference_count': per_model(self.references.astype(np.int64), np.add)
+        }
+
+    def summary(self, top=10):
+        """Totais da tabela e conceitos mais frequentes"""
+        histogram = self.concept_histogram()
+        order = np.argsort(-histogram, kind='stable')[:top]
+        fan_out = self.fan_out()
+        inner = fan_out[fan_out > 0]
+        return {
+            'models': len(self.models),
+            'node_count': len(self),
+            'concept_count': len(self.concepts),
+            'max_depth': int(self.depth.max()) if len(self) else 0,
+            'mean_fan_out': float(inner.mean()) if len(inner) else 0.0,
+            'max_fan_out': int(fan_out.max()) if len(self) else 0,
+            'reference_count': int(self.references.sum()),
+            'top_concepts': {self.concepts.names[i]: int(histogram[i]) for i in order if histogram[i]}
+        }
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description='Tabela de nós de modelos MPS e histogramas por conceito',
+        epilog='Exemplo: python node_table.py repositories/mbeddr.core --top 20'
+    )
+    parser.add_argument('repo_path', help='Repositório (ou diretório) com arquivos .mps')
+    parser.add_argument('--workers', type=int, default=None, help='Processos usados na leitura')
+    parser.add_argument('--top', type=int, default=15, help='Conceitos mais frequentes a mostrar')
+    args = parser.parse_args()
+
+    table = NodeTable.from_repository(args.repo_path, args.workers)
+    summary = table.summary(args.top)
+    print(f"{summary['models']} modelos, {summary['node_count']} nós, {summary['concept_count']} conceitos "
+          f"({table.nbytes() / 1024 / 1024:.1f} MB em colunas)")
+    print(f"Profundidade máxima: {summary['max_depth']}; fan-out médio {summary['mean_fan_out']:.2f}, "
+          f"máximo {summary['max_fan_out']}; referências: {summary['reference_count']}")
+    for name, count in summary['top_concepts'].items():
+        print(f"{count:10d}  {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -14,8 +14,36 @@ import json
 from pathlib import Path
 from collections import defaultdict, Counter
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import numpy as np
+
+from instrumentation import metrics, profiling
+from node_table import NodeTable
+
+HEADER_SIZE = 1000
+
+# formato do arquivo de --scan-cache (JSON)
+SCAN_CACHE_VERSION = 1
+
+# diretórios de controle de versão e de saída de build: nunca contêm modelos
+PRUNED_DIRS = {
+    '.git', '.gradle', '.idea', 'node_modules', '__pycache__',
+    'source_gen', 'source_gen.caches', 'classes_gen', 'test_gen', 'test_gen.caches'
+}
+
+
+def read_header(file_path):
+    """Lê o início de um arquivo (usado para classificar pelo conteúdo)"""
+    try:
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            header = f.read(HEADER_SIZE)
+        metrics.read(len(header), files=1)
+        return header
+    except OSError:
+        return ""
+
 class MbeddrModelDiscovery:
     """Classe principal para descobrir modelos do mbeddr"""
     
@@ -24,6 +52,10 @@ class MbeddrModelDiscovery:
         self.models_found = []
         self.metamodels_found = []
         self.statistics = defaultdict(int)
+        # histogramas por conceito (analyze_concepts)
+        self.concept_statistics = {}
+        # caminho -> (tamanho, mtime_ns, tipo): evita reabrir arquivos inalterados
+        self.scan_cache = {}
         
         self.mps_extensions = {
             '.mps': 'MPS Model',
@@ -42,8 +74,14 @@ class MbeddrModelDiscovery:
             'constraints': r'constraints\.mps$'
         }
     
-    def scan_repository(self):
-        """Escaneia o repositório em busca de arquivos MPS"""
+    @metrics.timed('scan_repository')
+    def scan_repository(self, fast=False, workers=None, cache_file=None):
+        """Escaneia o repositório em busca de arquivos MPS
+
+        Com `fast=True` usa os.scandir, poda diretórios sem modelos, lê os
+        cabeçalhos em paralelo e reaproveita classificações de arquivos que
+        não mudaram (cache opcional em disco via `cache_file`).
+        """
         print(f"🔍 Escaneando repositório: {self.repo_path}")
         print("=" * 60)
         
@@ -51,56 +89,140 @@ class MbeddrModelDiscovery:
             print(f"Erro: Repositório não encontrado em {self.repo_path}")
             return
         
-        for file_path in self.repo_path.rglob('*'):
-            if file_path.is_file():
-                self.analyze_file(file_path)
+        self.models_found = []
+        self.metamodels_found = []
+        self.statistics = defaultdict(int)
+        
+        if fast:
+            self._scan_fast(workers, cache_file)
+        else:
+            for file_path in self.repo_path.rglob('*'):
+                if file_path.is_file():
+                    self.analyze_file(file_path)
         
         print(f"Escaneamento concluído!")
         print(f"Encontrados: {len(self.models_found)} modelos e {len(self.metamodels_found)} metamodelos")
     
+    def _scan_fast(self, workers, cache_file):
+        """Varredura rápida: um stat por arquivo e cabeçalhos lidos em paralelo"""
+        if cache_file and not self.scan_cache:
+            self.scan_cache = self._load_scan_cache(cache_file)
+        
+        with metrics.phase('scan_walk'):
+            candidates = list(self._iter_candidates())
+        file_types = [None] * len(candidates)
+        to_read = []
+        
+        with metrics.phase('classify_file_type'):
+            for i, (path, name, file_ext, st) in enumerate(candidates):
+                cached = self.scan_cache.get(path)
+                if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+                    file_types[i] = cached[2]
+                    continue
+                file_types[i] = self._classify_by_name(name.lower())
+                if file_types[i] is None:
+                    to_read.append(i)
+            
+            if to_read:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    headers = pool.map(read_header, (candidates[i][0] for i in to_read))
+                    for i, header in zip(to_read, headers):
+                        file_types[i] = self._classify_by_content(header)
+        
+        cache = {}
+        for (path, name, file_ext, st), file_type in zip(candidates, file_types):
+            cache[path] = (st.st_size, st.st_mtime_ns, file_type)
+            self._record_file(Path(path), file_ext, file_type, st)
+        self.scan_cache = cache
+        
+        if cache_file:
+            self._save_scan_cache(cache_file)
+    
+    def _iter_candidates(self):
+        """Percorre a árvore com os.scandir, gerando (caminho, nome, extensão, stat)"""
+        stack = [str(self.repo_path)]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = sorted(os.scandir(directory), key=lambda e: e.name)
+            except OSError:
+                continue
+            subdirs = []
+            for entry in entries:
+                if entry.is_dir():
+                    if entry.name not in PRUNED_DIRS:
+                        subdirs.append(entry.path)
+                    continue
+                file_ext = os.path.splitext(entry.name)[1].lower()
+                if file_ext in self.mps_extensions and entry.is_file():
+                    yield entry.path, entry.name, file_ext, entry.stat()
+            stack.extend(reversed(subdirs))
+    
+    def _load_scan_cache(self, cache_file):
+        # JSON, não pickle: carregar um cache compartilhado não executa código
+        try:
+            with open(cache_file, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get('version') != SCAN_CACHE_VERSION:
+            return {}
+        return {path: tuple(entry) for path, entry in data.get('files', {}).items()}
+    
+    def _save_scan_cache(self, cache_file):
+        Path(cache_file).parent.mkdir(parents=True, exist_ok=True)
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': SCAN_CACHE_VERSION, 'files': self.scan_cache}, f, ensure_ascii=False)
+    
     def analyze_file(self, file_path):
         """Analisa um arquivo individual"""
         file_ext = file_path.suffix.lower()
         
         if file_ext in self.mps_extensions:
-            self.statistics['total_mps_files'] += 1
-            
             file_type = self.classify_file_type(file_path)
+            self._record_file(file_path, file_ext, file_type, file_path.stat())
+    
+    def _record_file(self, file_path, file_ext, file_type, st):
+        """Registra um arquivo MPS já classificado"""
+        self.statistics['total_mps_files'] += 1
+        
+        if file_type:
+            model_info = {
+                'path': str(file_path),
+                'name': file_path.name,
+                'type': file_type,
+                'extension': file_ext,
+                'size': st.st_size,
+                'modified': datetime.fromtimestamp(st.st_mtime)
+            }
+            
+            if self.is_metamodel(file_path, file_type):
+                self.metamodels_found.append(model_info)
+                self.statistics['metamodels'] += 1
+            else:
+                self.models_found.append(model_info)
+                self.statistics['models'] += 1
             
-            if file_type:
-                model_info = {
-                    'path': str(file_path),
-                    'name': file_path.name,
-                    'type': file_type,
-                    'extension': file_ext,
-                    'size': file_path.stat().st_size,
-                    'modified': datetime.fromtimestamp(file_path.stat().st_mtime)
-                }
-                
-                if self.is_metamodel(file_path, file_type):
-                    self.metamodels_found.append(model_info)
-                    self.statistics['metamodels'] += 1
-                else:
-                    self.models_found.append(model_info)
-                    self.statistics['models'] += 1
-                
-                self.statistics[f'type_{file_type}'] += 1
+            self.statistics[f'type_{file_type}'] += 1
     
+    @metrics.timed('classify_file_type')
     def classify_file_type(self, file_path):
         """Classifica o tipo do arquivo MPS"""
-        file_name = file_path.name.lower()
-        file_content = ""
-        
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                file_content = f.read(1000) 
-        except:
-            pass
+        file_type = self._classify_by_name(file_path.name.lower())
+        if file_type:
+            return file_type
         
+        return self._classify_by_content(read_header(file_path))
+    
+    def _classify_by_name(self, file_name):
+        """Classificação pelo nome do arquivo (aspectos do metamodelo)"""
         for pattern_name, pattern in self.model_patterns.items():
             if re.search(pattern, file_name):
                 return pattern_name
-        
+        return None
+    
+    def _classify_by_content(self, file_content):
+        """Classificação pelo cabeçalho do arquivo"""
         if 'language=' in file_content or '<language' in file_content:
             return 'language_definition'
         elif 'model=' in file_content or '<model' in file_content:
@@ -130,6 +252,55 @@ class MbeddrModelDiscovery:
         
         return any(indicator in path_str for indicator in metamodel_indicators)
     
+    @metrics.timed('analyze_concepts')
+    def analyze_concepts(self, workers=None, top=10):
+        """Métricas de nós e histogramas por conceito dos arquivos .mps encontrados
+
+        Lê a árvore de cada modelo para uma NodeTable; cada modelo ganha
+        node_count, root_count, max_depth, max/mean_fan_out e
+        reference_count, e os histogramas são calculados de uma vez para
+        todos, metamodelos, modelos e cada tipo de arquivo.
+        """
+        files = [f for f in self.metamodels_found + self.models_found if f['extension'] == '.mps']
+        print(f"Lendo a árvore de nós de {len(files)} modelos")
+        table = NodeTable.from_files([f['path'] for f in files], workers)
+        
+        for name, values in table.model_metrics().items():
+            for info, value in zip(files, values.tolist()):
+                info[name] = value
+        
+        # cada modelo entra em 'all', no seu grupo e no seu tipo
+        metamodel_count = sum(1 for f in self.metamodels_found if f['extension'] == '.mps')
+        type_names = sorted({f"type_{f['type']}" for f in files})
+        groups = ['all', 'metamodels', 'models'] + type_names
+        type_group = {name: 3 + i for i, name in enumerate(type_names)}
+        memberships = np.array([
+            (1 if i < metamodel_count else 2, type_group[f"type_{f['type']}"])
+            for i, f in enumerate(files)
+        ], dtype=np.int64).reshape(-1, 2)
+        
+        concept_count = len(table.concepts)
+        model_index = table.model_index
+        concept = table.concept.astype(np.int64)
+        counts = np.zeros((len(groups), concept_count), dtype=np.int64)
+        counts[0] = np.bincount(concept, minlength=concept_count)
+        for column in range(2):
+            group = memberships[:, column][model_index]
+            counts += np.bincount(
+                group * concept_count + concept, minlength=len(groups) * concept_count
+            ).reshape(len(groups), concept_count)
+        
+        histograms = {}
+        for g, group in enumerate(groups):
+            order = np.argsort(-counts[g], kind='stable')
+            histograms[group] = {
+                table.concepts.names[i]: int(counts[g, i]) for i in order if counts[g, i]
+            }
+        
+        self.concept_statistics = table.summary(top)
+        self.concept_statistics['histograms'] = histograms
+        return self.concept_statistics
+    
     def generate_statistics(self):
         """Gera estatísticas dos modelos encontrados"""
         print("\n ESTATÍSTICAS DETALHADAS")
@@ -145,6 +316,16 @@ class MbeddrModelDiscovery:
             clean_name = type_name.replace('type_', '').replace('_', ' ').title()
             print(f"  {clean_name}: {count}")
         
+        if self.concept_statistics:
+            summary = self.concept_statistics
+            print(f"\nNós: {summary['node_count']} em {summary['models']} modelos, "
+                  f"{summary['concept_count']} conceitos distintos")
+            print(f"Profundidade máxima: {summary['max_depth']}, fan-out médio: {summary['mean_fan_out']:.2f}, "
+                  f"referências: {summary['reference_count']}")
+            print("\nConceitos mais instanciados:")
+            for name, count in summary['top_concepts'].items():
+                print(f"  {name}: {count}")
+        
         if self.models_found or self.metamodels_found:
             all_files = self.models_found + self.metamodels_found
             recent_files = sorted(all_files, key=lambda x: x['modified'], reverse=True)[:5]
@@ -153,8 +334,11 @@ class MbeddrModelDiscovery:
             for file_info in recent_files:
                 print(f"  {file_info['name']} - {file_info['modified'].strftime('%Y-%m-%d %H:%M')}")
     
-    def export_results(self, output_file='mbeddr_models_analysis.json'):
-        """Exporta os resultados para um arquivo JSON"""
+    def export_results(self, output_file='mbeddr_models_analysis.json', output_format='json'):
+        """Exporta os resultados para um arquivo JSON (ou tabelas colunares)"""
+        if output_format == 'columnar':
+            return self.export_columnar(output_file)
+        
         results = {
             'metadata': {
                 'repository_path': str(self.repo_path),
@@ -162,6 +346,7 @@ class MbeddrModelDiscovery:
                 'total_files_scanned': self.statistics['total_mps_files']
             },
             'statistics': dict(self.statistics),
+            'concept_statistics': self.concept_statistics,
             'models': self.models_found,
             'metamodels': self.metamodels_found
         }
@@ -171,6 +356,27 @@ class MbeddrModelDiscovery:
         
         print(f"\nResultados exportados para: {output_file}")
     
+    def export_columnar(self, output_dir):
+        """Exporta modelos e metamodelos como tabelas tipadas em um diretório"""
+        from results_store import ResultsStore, concept_frame, file_frame
+        
+        store = ResultsStore(output_dir)
+        store.save('models', file_frame(self.models_found))
+        store.save('metamodels', file_frame(self.metamodels_found))
+        if self.concept_statistics:
+            store.save('concept_histograms', concept_frame(self.concept_statistics['histograms']))
+        store.save_metadata({
+            'repository_path': str(self.repo_path),
+            'scan_timestamp': datetime.now().isoformat(),
+            'total_files_scanned': self.statistics['total_mps_files'],
+            'statistics': dict(self.statistics),
+            'concept_statistics': {
+                k: v for k, v in self.concept_statistics.items() if k != 'histograms'
+            }
+        })
+        
+        print(f"\nResultados exportados para: {output_dir}")
+    
     def print_sample_findings(self, limit=5):
         """Imprime alguns exemplos dos achados"""
         print(f"\n EXEMPLOS DE MODELOS ENCONTRADOS (primeiros {limit}):")
@@ -211,6 +417,51 @@ def main():
         help='Arquivo de saída para os resultados (padrão: mbeddr_models_analysis.json)'
     )
     
+    parser.add_argument(
+        '--fast',
+        action='store_true',
+        help='Varredura rápida (os.scandir, poda de diretórios e leitura paralela)'
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Threads para leitura de cabeçalhos no modo rápido'
+    )
+    
+    parser.add_argument(
+        '--scan-cache',
+        default=None,
+        help='Arquivo JSON de cache (caminho, tamanho, mtime) -> tipo para novas varreduras'
+    )
+    
+    parser.add_argument(
+        '--format',
+        choices=['json', 'columnar'],
+        default='json',
+        help='Formato de saída: JSON ou tabelas colunares em diretório (padrão: json)'
+    )
+    
+    parser.add_argument(
+        '--metrics',
+        default=None,
+        help='Arquivo JSON para as métricas de desempenho da varredura'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        choices=['cprofile', 'sampling'],
+        default=None,
+        help='Perfil detalhado da varredura (impresso ao final)'
+    )
+    
+    parser.add_argument(
+        '--concepts',
+        action='store_true',
+        help='Lê a árvore de nós dos .mps: tamanho, profundidade, fan-out e histogramas por conceito'
+    )
+    
     parser.add_argument(
         '--sample',
         type=int,
@@ -226,10 +477,17 @@ def main():
     print("=" * 60)
     
     discovery = MbeddrModelDiscovery(args.repo_path)
-    discovery.scan_repository()
+    with profiling(args.profile):
+        discovery.scan_repository(fast=args.fast, workers=args.workers, cache_file=args.scan_cache)
+        if args.concepts:
+            discovery.analyze_concepts(workers=args.workers)
     discovery.generate_statistics()
     discovery.print_sample_findings(args.sample)
-    discovery.export_results(args.output)
+    discovery.export_results(args.output, args.format)
+    
+    if args.metrics:
+        print("\n" + metrics.format_report())
+        metrics.write(args.metrics)
     
     print("\n✨ Análise concluída com sucesso!")
 
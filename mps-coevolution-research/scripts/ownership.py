@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Propriedade dos aspectos de metamodelo por autor (git blame)
+Autor: Ana Carolina Poltronieri
+Propósito: Contar as linhas de cada autor em structure.mps, editor.mps,
+typesystem.mps e demais aspectos de todas as linguagens, com identidades
+unificadas pelo .mailmap, blame em paralelo e cache por (arquivo, sha do
+blob) para que novas execuções só refaçam o blame do que mudou
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from coevolution import ASPECTS
+from git_backend import open_backend
+from git_history import GitError
+from instrumentation import metrics
+from parallel import map_in_chunks
+
+DEFAULT_OWNERSHIP_PATH = 'data/ownership_cache.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blames (
+    repo TEXT NOT NULL,
+    path TEXT NOT NULL,
+    blob TEXT NOT NULL,
+    mailmap TEXT NOT NULL,
+    authors TEXT NOT NULL,
+    PRIMARY KEY (repo, path, blob, mailmap)
+);
+"""
+
+def aspect_of(name):
+    """Aspecto de um arquivo pelo nome (structure.mps ou com.mbeddr.doc.structure.mps), ou None"""
+    name = name.lower()
+    for aspect in ASPECTS:
+        if name == f"{aspect}.mps" or name.endswith(f".{aspect}.mps"):
+            return aspect
+    return None
+
+
+def language_of(path):
+    """Linguagem dona do aspecto: diretório acima de `models/` ou `languageModels/`"""
+    parts = path.split('/')
+    return parts[-3] if len(parts) >= 3 else parts[0]
+
+
+def aspect_files(backend, rev='HEAD'):
+    """(caminho, sha do blob, linguagem, aspecto) de cada arquivo de aspecto na revisão
+
+    Os caminhos são relativos ao repositório analisado (o `cwd` do blame),
+    também quando ele é um subdiretório de um repositório maior.
+    """
+    files = []
+    for path, sha, mode in backend.walk_tree(rev):
+        aspect = aspect_of(path.rsplit('/', 1)[-1])
+        if aspect:
+            files.append((path, sha, language_of(path), aspect))
+    return files
+
+
+def mailmap_digest(repo_path, backend, rev='HEAD'):
+    """Identifica o .mailmap em uso: o blame já devolve autores mapeados por ele"""
+    mailmap = Path(repo_path) / '.mailmap'
+    data = mailmap.read_bytes() if mailmap.exists() else backend.read_blob(rev, '.mailmap') or b''
+    return hashlib.sha1(data).hexdigest()
+
+
+def blame_file(job):
+    """Linhas por (nome, e-mail) de um arquivo na revisão (executado em threads)
+
+    `git blame --incremental` emite um cabeçalho por trecho (sha, linhas) e
+    os dados do autor só na primeira vez que cada commit aparece.
+    """
+    repo_path, rev, path = job
+    started = time.perf_counter()
+    metrics.spawn('git blame')
+    result = subprocess.run(
+        ['git', 'blame', '--incremental', rev, '--', path],
+        cwd=repo_path, capture_output=True, text=True, errors='replace'
+    )
+    metrics.call('git blame', time.perf_counter() - started)
+    if result.returncode != 0:
+        print(f"Erro no blame de {path}: {result.stderr.strip()}")
+        return path, None
+
+    authors = {}
+    lines = Counter()
+    current = None
+    for line in result.stdout.splitlines():
+        fields = line.split(' ')
+        if len(fields) == 4 and len(fields[0]) == 40:
+            current = fields[0]
+            lines[current] += int(fields[3])
+        elif line.startswith('author '):
+            name = line[len('author '):]
+            authors.setdefault(current, [name, ''])[0] = name
+        elif line.startswith('author-mail '):
+            authors.setdefault(current, ['', ''])[1] = line[len('author-mail '):].strip('<>')
+
+    by_author = Counter()
+    for sha, count in lines.items():
+        name, email = authors.get(sha, ('?', ''))
+        by_author[(name, email)] += count
+    return path, [[name, email, count] for (name, email), count in by_author.most_common()]
+
+
+class OwnershipCache:
+    """Resultados de blame por (repositório, arquivo, blob, .mailmap) em SQLite"""
+
+    def __init__(self, db_path=DEFAULT_OWNERSHIP_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path), timeout=60)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def load(self, repo, mailmap):
+        """(caminho, blob) → autores já calculados para o repositório"""
+        rows = self.conn.execute(
+            "SELECT path, blob, authors FROM blames WHERE repo = ? AND mailmap = ?", (repo, mailmap)
+        )
+        return {(path, blob): json.loads(authors) for path, blob, authors in rows}
+
+    def store(self, repo, mailmap, entries):
+        """Guarda os novos resultados e descarta versões antigas dos mesmos arquivos"""
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM blames WHERE repo = ? AND path = ?",
+                ((repo, path) for path, blob, authors in entries)
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO blames VALUES (?, ?, ?, ?, ?)",
+                ((repo, path, blob, mailmap, json.dumps(authors, ensure_ascii=False))
+                 for path, blob, authors in entries)
+            )
+
+
+def merge_identities(file_authors):
+    """Unifica autores pelo e-mail (sem diferenciar maiúsculas); o nome mais frequente fica"""
+    names = defaultdict(Counter)
+    for authors in file_authors:
+        for name, email, count in authors:
+            names[email.lower() or name][name] += count
+    return {key: counter.most_common(1)[0][0] for key, counter in names.items()}
+
+
+def _owners(counter, top):
+    total = sum(counter.values())
+    owners = counter.most_common()
+    # menor número de autores que cobre metade das linhas
+    covered, half = 0, 0
+    for _, count in owners:
+        if covered * 2 >= total:
+            break
+        covered += count
+        half += 1
+    return {
+        'lines': total,
+        'authors': len(owners),
+        'authors_for_half': half,
+        'owners': [[name, count, round(count / total, 4) if total else 0.0] for name, count in owners[:top]]
+    }
+
+
+def ownership(repo_path, rev='HEAD', workers=None, cache=None, backend=None, top=5):
+    """Mapa de propriedade por arquivo, aspecto, linguagem e autor
+
+    Só os arquivos sem resultado em cache para o sha atual passam pelo blame.
+    Levanta GitError se nenhum dos blames necessários funcionar.
+    """
+    repo_path = str(repo_path)
+    own_backend = backend is None
+    backend = backend or open_backend(repo_path)
+    try:
+        if backend.rev_parse(rev) is None:
+            raise GitError(f"Revisão {rev} não encontrada em {repo_path}")
+        files = aspect_files(backend, rev)
+        mailmap = mailmap_digest(repo_path, backend, rev)
+    finally:
+        if own_backend:
+            backend.close()
+
+    repo_key = str(Path(repo_path).resolve())
+    known = cache.load(repo_key, mailmap) if cache else {}
+    pending = [(repo_path, rev, path) for path, sha, _, _ in files if (path, sha) not in known]
+    blamed = dict(map_in_chunks(blame_file, pending, workers or os.cpu_count(), 1, executor='thread'))
+    failed = sum(1 for authors in blamed.values() if authors is None)
+    if pending and failed == len(pending):
+        raise GitError(f"git blame falhou em todos os {failed} arquivos de aspecto de {repo_path}")
+    if cache:
+        sha_of = {path: sha for path, sha, _, _ in files}
+        cache.store(repo_key, mailmap, [(path, sha_of[path], authors)
+                                        for path, authors in blamed.items() if authors is not None])
+
+    per_file = {}
+    for path, sha, language, aspect in files:
+        authors = known.get((path, sha)) if (path, sha) in known else blamed.get(path)
+        if authors is not None:
+            per_file[path] = (language, aspect, authors)
+
+    canonical = merge_identities(authors for _, _, authors in per_file.values())
+    by_aspect = defaultdict(Counter)
+    by_language = defaultdict(lambda: defaultdict(Counter))
+    by_author = defaultdict(Counter)
+    files_result = {}
+    for path, (language, aspect, authors) in per_file.items():
+        counter = Counter()
+        for name, email, count in authors:
+            counter[canonical[email.lower() or name]] += count
+        by_aspect[aspect].update(counter)
+        by_language[language][aspect].update(counter)
+        for author, count in counter.items():
+            by_author[author][aspect] += count
+        files_result[path] = dict(language=language, aspect=aspect, **_owners(counter, top))
+
+    return {
+        'revision': rev,
+        'files_blamed': len(pending) - failed,
+        'files_failed': failed,
+        'files_cached': len(files) - len(pending),
+        'aspects': {aspect: _owners(by_aspect[aspect], top) for aspect in ASPECTS if aspect in by_aspect},
+        'languages': {
+            language: {aspect: _owners(counter, top) for aspect, counter in aspects.items()}
+            for language, aspects in sorted(by_language.items())
+        },
+        'authors': {author: dict(counts) for author, counts in
+                    sorted(by_author.items(), key=lambda item: -sum(item[1].values()))},
+        'files': files_result
+    }
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description='Propriedade (linhas por autor, via git blame) dos aspectos de cada linguagem',
+        epilog='Exemplo: python ownership.py repositories/mbeddr.core --aspect structure'
+    )
+    parser.add_argument('repo_path', help='Repositório git')
+    parser.add_argument('--rev', default='HEAD', help='Revisão analisada (padrão: HEAD)')
+    parser.add_argument('--workers', type=int, default=None, help='Blames simultâneos')
+    parser.add_argument('--cache', default=DEFAULT_OWNERSHIP_PATH,
+                        help=f'Cache SQLite dos blames (padrão: {DEFAULT_OWNERSHIP_PATH})')
+    parser.add_argument('--no-cache', action='store_true', help='Refaz o blame de todos os arquivos')
+    parser.add_argument('--aspect', choices=ASPECTS, help='Mostra o dono de cada linguagem neste aspecto')
+    parser.add_argument('-o', '--output', help='Grava o mapa completo em JSON')
+    args = parser.parse_args()
+
+    cache = None if args.no_cache else OwnershipCache(args.cache)
+    started = time.perf_counter()
+    try:
+        result = ownership(args.repo_path, args.rev, args.workers, cache)
+    except GitError as e:
+        print(f"Erro: {e}")
+        sys.exit(1)
+    finally:
+        if cache:
+            cache.close()
+
+    failed = f", {result['files_failed']} com erro" if result['files_failed'] else ''
+    print(f"{result['files_blamed']} arquivos com blame, {result['files_cached']} do cache{failed} "
+          f"({time.perf_counter() - started:.1f}s)")
+    for aspect, summary in result['aspects'].items():
+        owners = ', '.join(f"{name} {share:.0%}" for name, _, share in summary['owners'][:3])
+        print(f"{aspect:12} {summary['lines']:8d} linhas, {summary['authors']:3d} autores, "
+              f"{summary['authors_for_half']} cobrem metade: {owners}")
+    if args.aspect:
+        print(f"\nDono de {args.aspect}.mps por linguagem:")
+        for language, aspects in result['languages'].items():
+            summary = aspects.get(args.aspect)
+            if summary and summary['owners']:
+                name, _, share = summary['owners'][0]
+                print(f"  {language:50} {name} ({share:.0%} de {summary['lines']} linhas)")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\nMapa exportado para: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
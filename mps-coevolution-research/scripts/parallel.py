@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Execução paralela em lotes
+Autor: Ana Carolina Poltronieri
+Propósito: Distribuir trabalho por commit entre processos ou threads,
+mantendo a ordem dos resultados e informando o progresso
+"""
+
+import multiprocessing
+import os
+import signal
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.connection import wait
+
+EXECUTORS = {
+    'process': ProcessPoolExecutor,
+    'thread': ThreadPoolExecutor
+}
+
+
+def default_workers():
+    """Número padrão de workers (núcleos disponíveis)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def chunked(items, chunk_size):
+    """Divide uma sequência em lotes de tamanho fixo"""
+    for start in range(0, len(items), chunk_size):
+        yield items[start:start + chunk_size]
+
+
+def _apply_chunk(func, chunk):
+    """Aplica `func` a todos os itens de um lote (executado no worker)"""
+    return [func(item) for item in chunk]
+
+
+class ProgressReporter:
+    """Imprime o progresso de uma tarefa longa em uma única linha"""
+
+    def __init__(self, total, label='itens', stream=None):
+        self.total = total
+        self.label = label
+        self.done = 0
+        self.stream = stream or sys.stderr
+
+    def update(self, count):
+        self.done += count
+        percent = 100.0 * self.done / max(self.total, 1)
+        self.stream.write(f"\r  {self.done}/{self.total} {self.label} ({percent:5.1f}%)")
+        if self.done >= self.total:
+            self.stream.write("\n")
+        self.stream.flush()
+
+
+def map_in_chunks(func, items, workers=None, chunk_size=256, executor='process', progress=None,
+                  min_items=0):
+    """Aplica `func` a cada item em paralelo, por lotes, preservando a ordem
+
+    `func` precisa ser serializável (função de módulo) quando executor='process'.
+    `progress` é um ProgressReporter opcional, atualizado a cada lote concluído.
+    Com menos de `min_items` itens tudo roda no processo atual: para trabalho
+    barato por item, criar o pool e serializar os itens custa mais que o ganho.
+    """
+    items = list(items)
+    workers = workers or default_workers()
+    chunk_size = max(1, chunk_size)
+
+    if workers <= 1 or len(items) <= max(chunk_size, min_items):
+        results = []
+        for chunk in chunked(items, chunk_size):
+            results.extend(_apply_chunk(func, chunk))
+            if progress:
+                progress.update(len(chunk))
+        return results
+
+    if executor not in EXECUTORS:
+        raise ValueError(f"Executor desconhecido: {executor}")
+
+    results = []
+    with EXECUTORS[executor](max_workers=workers) as pool:
+        futures = [pool.submit(_apply_chunk, func, chunk) for chunk in chunked(items, chunk_size)]
+        # percorre na ordem de submissão: resultados saem na ordem original
+        for future in futures:
+            chunk_results = future.result()
+            results.extend(chunk_results)
+            if progress:
+                progress.update(len(chunk_results))
+    return results
+
+
+def _isolated_call(conn, func, item, extra_args, log_path):
+    """Executa `func(item, *extra_args)` num processo próprio e envia o resultado"""
+    if hasattr(os, 'setpgrp'):
+        # grupo próprio: no timeout, o pai encerra também os netos (pools, git)
+        os.setpgrp()
+    if log_path:
+        log = open(log_path, 'w', encoding='utf-8', buffering=1)
+        sys.stdout = sys.stderr = log
+    try:
+        conn.send(('ok', func(item, *extra_args)))
+    except BaseException:
+        conn.send(('error', traceback.format_exc()))
+    finally:
+        conn.close()
+        sys.stdout.flush()
+
+
+def _kill(process):
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+    process.join()
+
+
+def map_isolated(func, items, extra_args=(), max_parallel=2, timeout=None, log_path=None):
+    """Executa `func` para cada item num processo isolado, gerando os resultados ao concluir
+
+    No máximo `max_parallel` processos rodam ao mesmo tempo; um item que
+    exceder `timeout` segundos é encerrado. Falhas não afetam os demais itens.
+    Gera (item, status, resultado ou erro, segundos), status em
+    'ok', 'error', 'timeout' ou 'crashed', na ordem de conclusão.
+    `log_path(item)` opcional redireciona a saída de cada processo para um arquivo.
+    """
+    context = multiprocessing.get_context()
+    pending = deque(items)
+    running = {}
+    try:
+        yield from _schedule(context, func, pending, running, extra_args, max_parallel, timeout, log_path)
+    finally:
+        # interrupção (Ctrl+C) ou gerador abandonado: não deixa processos órfãos
+        for conn, (item, process, started) in running.items():
+            _kill(process)
+            conn.close()
+
+
+def _schedule(context, func, pending, running, extra_args, max_parallel, timeout, log_path):
+    while pending or running:
+        while pending and len(running) < max(1, max_parallel):
+            item = pending.popleft()
+            parent_conn, child_conn = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_isolated_call,
+                args=(child_conn, func, item, extra_args, log_path(item) if log_path else None)
+            )
+            process.start()
+            child_conn.close()
+            running[parent_conn] = (item, process, time.monotonic())
+
+        wait_time = None
+        if timeout:
+            oldest = min(started for _, _, started in running.values())
+            wait_time = max(0.0, oldest + timeout - time.monotonic())
+
+        for conn in wait(list(running), wait_time):
+            item, process, started = running.pop(conn)
+            try:
+                status, value = conn.recv()
+            except EOFError:
+                process.join()
+                status, value = 'crashed', f"processo encerrado com código {process.exitcode}"
+            conn.close()
+            process.join()
+            yield item, status, value, time.monotonic() - started
+
+        if timeout:
+            now = time.monotonic()
+            for conn, (item, process, started) in list(running.items()):
+                if now - started >= timeout:
+                    del running[conn]
+                    _kill(process)
+                    conn.close()
+                    yield item, 'timeout', f"excedeu {timeout}s", now - started
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Cubos de agregação e gráficos de co-evolução
+Autor: Ana Carolina Poltronieri
+Propósito: Agregar os resultados do mps_analyzer em cubos compactos
+(repositório × período × tipo de mudança × aspecto) e renderizar o conjunto
+padrão de gráficos em paralelo (matplotlib Agg, sem interface), refazendo
+só os gráficos cujos dados de entrada mudaram
+"""
+
+import argparse
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+
+from coevolution import CATEGORIES, PathClassifier
+from mps_analyzer import CHANGE_TYPES
+from parallel import map_in_chunks
+
+MEASURES = ('commits', 'breaking')
+FREQS = {'M': 1, 'Q': 3, 'Y': 12}
+CUBE_VERSION = 3
+# incrementar quando o desenho de algum gráfico mudar (força nova renderização)
+CHARTS_VERSION = 1
+MANIFEST_FILE = 'charts.json'
+
+
+def _fingerprint(path):
+    """Tamanho e mtime da entrada (arquivo JSON ou diretório colunar)"""
+    path = Path(path)
+    files = [path] if path.is_file() else sorted(path.glob('*'))
+    return [[f.name, f.stat().st_size, f.stat().st_mtime_ns] for f in files]
+
+
+def repository_name(path):
+    """`analysis_<repo>.json` ou `analysis_<repo>/` → `<repo>`"""
+    name = Path(path).name
+    if name.endswith('.json'):
+        name = name[:-len('.json')]
+    return name[len('analysis_'):] if name.startswith('analysis_') else name
+
+
+def read_changes(path):
+    """Commits classificados e arquivos alterados de uma saída do mps_analyzer
+
+    Retorna (datas UTC datetime64[s], códigos de tipo, breaking, commit de
+    cada arquivo, caminho de cada arquivo). A saída colunar traz todo o
+    histórico; o JSON traz só os commits estruturais selecionados.
+    Breaking vem do diff estrutural, como no relatório e no score do
+    mps_analyzer; a palavra-chave da mensagem só vale se o diff não rodou.
+    """
+    import pandas as pd
+    path = Path(path)
+    type_code = {name: i for i, name in enumerate(CHANGE_TYPES)}
+
+    if path.is_dir():
+        from results_store import ResultsStore
+        store = ResultsStore(path)
+        commits = store.load('commits')
+        files = store.load('file_changes')
+        dates = commits['date'].dt.tz_convert('UTC').dt.tz_localize(None).to_numpy().astype('datetime64[s]')
+        types = np.array([type_code[t] for t in commits['change_type'].astype(str)], dtype=np.int64)
+        if store.load_metadata().get('structure_diff_stats'):
+            breaking_hashes = store.load('breaking_changes')['hash'].astype(str)
+            breaking = commits['hash'].astype(str).isin(set(breaking_hashes)).to_numpy(dtype=bool)
+        else:
+            breaking = commits['is_breaking'].to_numpy(dtype=bool)
+        return dates, types, breaking, files['commit'].to_numpy(np.int64), files['path'].astype(str).tolist()
+
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    changes = data.get('metamodel_changes', [])
+    diffed = bool(data.get('structure_diff_stats'))
+    dates = pd.to_datetime(pd.Series([c['date'] for c in changes], dtype='object'), utc=True,
+                           format='%Y-%m-%d %H:%M:%S %z')
+    dates = dates.dt.tz_localize(None).to_numpy().astype('datetime64[s]')
+    types = np.array([type_code[c['change_type']] for c in changes], dtype=np.int64)
+    breaking = np.array([c.get('breaking_structural_changes', 0) > 0 if diffed else c['is_breaking']
+                         for c in changes], dtype=bool)
+    file_commit = np.array([i for i, c in enumerate(changes) for _ in c['files_changed']], dtype=np.int64)
+    paths = [p for c in changes for p in c['files_changed']]
+    return dates, types, breaking, file_commit, paths
+
+
+class AggregateCube:
+    """Contagens [repositório, período, tipo de mudança, aspecto] de um ou mais repositórios
+
+    `commits` conta commits do tipo que tocam o aspecto; `breaking` conta
+    os que também são breaking. Os períodos são inteiros (meses, trimestres
+    ou anos desde 1970, conforme `freq`).
+    """
+
+    def __init__(self, repositories, periods, measures, freq='M'):
+        self.repositories = list(repositories)
+        self.periods = periods
+        self.measures = measures
+        self.freq = freq
+
+    @classmethod
+    def from_changes(cls, repository, dates, types, breaking, file_commit, paths, freq='M'):
+        classifier = PathClassifier()
+        unique_paths, path_index = np.unique(np.asarray(paths, dtype=object), return_inverse=True)
+        codes = np.array([classifier(p) for p in unique_paths], dtype=np.int64)[path_index] \
+            if len(paths) else np.zeros(0, dtype=np.int64)
+        keep = codes >= 0
+        # cada (commit, aspecto) conta uma vez, por mais arquivos que o commit altere
+        pairs = np.unique(file_commit[keep] * len(CATEGORIES) + codes[keep])
+        commit, aspect = pairs // len(CATEGORIES), pairs % len(CATEGORIES)
+
+        period = dates.astype('datetime64[M]').astype(np.int64) // FREQS[freq]
+        periods = np.arange(period.min(), period.max() + 1) if len(period) else np.zeros(0, dtype=np.int64)
+        shape = (len(periods), len(CHANGE_TYPES), len(CATEGORIES))
+        flat = ((period[commit] - (periods[0] if len(periods) else 0)) * len(CHANGE_TYPES)
+                + types[commit]) * len(CATEGORIES) + aspect
+        size = int(np.prod(shape))
+        measures = {
+            'commits': np.bincount(flat, minlength=size).reshape(shape),
+            'breaking': np.bincount(flat[breaking[commit]], minlength=size).reshape(shape)
+        }
+        return cls([repository], periods, {k: v[np.newaxis].astype(np.int32) for k, v in measures.items()}, freq)
+
+    @classmethod
+    def combine(cls, cubes):
+        """Junta cubos de repositórios diferentes em um eixo de períodos comum"""
+        freq = cubes[0].freq
+        nonempty = [c.periods for c in cubes if len(c.periods)]
+        periods = np.arange(min(p[0] for p in nonempty), max(p[-1] for p in nonempty) + 1) \
+            if nonempty else np.zeros(0, dtype=np.int64)
+        repositories = [name for c in cubes for name in c.repositories]
+        measures = {}
+        for name in MEASURES:
+            combined = np.zeros((len(repositories), len(periods), len(CHANGE_TYPES), len(CATEGORIES)),
+                                dtype=np.int32)
+            row = 0
+            for cube in cubes:
+                if len(cube.periods):
+                    offset = cube.periods[0] - periods[0]
+                    combined[row:row + len(cube.repositories), offset:offset + len(cube.periods)] = \
+                        cube.measures[name]
+                row += len(cube.repositories)
+            measures[name] = combined
+        return cls(repositories, periods, measures, freq)
+
+    def period_labels(self):
+        """Início de cada período como datetime64[M]"""
+        return (self.periods * FREQS[self.freq]).astype('datetime64[M]')
+
+    def save(self, path, source=None):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        meta = {'version': CUBE_VERSION, 'freq': self.freq, 'repositories': self.repositories,
+                'source': source}
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, periods=self.periods, meta=np.array(json.dumps(meta)), **self.measures)
+
+    @classmethod
+    def load(cls, path):
+        """Cubo salvo e a impressão digital da entrada de onde veio"""
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('version') != CUBE_VERSION:
+                raise ValueError(f"Versão de cubo incompatível: {path}")
+            cube = cls(meta['repositories'], data['periods'], {name: data[name] for name in MEASURES},
+                       meta['freq'])
+        return cube, meta.get('source')
+
+    def digest(self, *parts):
+        """Hash dos dados do cubo (mais parâmetros do gráfico) para detectar mudanças"""
+        h = hashlib.sha1(json.dumps([CHARTS_VERSION, self.repositories, self.freq, parts]).encode())
+        h.update(np.ascontiguousarray(self.periods).tobytes())
+        for name in MEASURES:
+            h.update(np.ascontiguousarray(self.measures[name]).tobytes())
+        return h.hexdigest()
+
+
+def build_cube(source, cube_dir, freq='M'):
+    """Cubo de uma saída do analisador, reaproveitado se a entrada não mudou"""
+    repository = repository_name(source)
+    cube_path = Path(cube_dir) / f"{repository}.npz"
+    fingerprint = [freq, _fingerprint(source)]
+    if cube_path.exists():
+        try:
+            cube, stored = AggregateCube.load(cube_path)
+            if stored == fingerprint:
+                return cube, False
+        except (OSError, ValueError, KeyError):
+            pass
+    cube = AggregateCube.from_changes(repository, *read_changes(source), freq=freq)
+    cube.save(cube_path, fingerprint)
+    return cube, True
+
+
+# gráficos: (nome, função de desenho); cada job leva só as fatias do cubo de que precisa
+
+def _timeline(ax, data):
+    labels = data['labels']
+    series = data['commits'].sum(axis=1)  # período × aspecto
+    ax.stackplot(labels, series.T, labels=CATEGORIES, alpha=0.85)
+    ax.set_title(f"{data['title']}: commits por aspecto")
+    ax.set_ylabel('commits')
+    ax.legend(loc='upper left', fontsize=7, ncol=2)
+
+
+def _change_types(ax, data):
+    import seaborn as sns
+    sns.heatmap(data['commits'].sum(axis=0), annot=True, fmt='d', cmap='Blues', ax=ax,
+                xticklabels=CATEGORIES, yticklabels=CHANGE_TYPES, cbar=False)
+    ax.set_title(f"{data['title']}: tipo de mudança × aspecto")
+
+
+def _breaking(ax, data):
+    labels = data['labels']
+    structure = CATEGORIES.index('structure')
+    # fatia do aspecto structure: somar aspectos contaria o mesmo commit várias vezes
+    ax.bar(labels, data['breaking'][:, :, structure].sum(axis=1), width=20 * FREQS[data['freq']],
+           color='tab:red', label='breaking')
+    ax.plot(labels, data['commits'][:, :, structure].sum(axis=1), color='tab:blue', label='todos')
+    ax.set_title(f"{data['title']}: commits em structure.mps (breaking × todos)")
+    ax.legend(fontsize=8)
+
+
+def _repositories(ax, data):
+    totals = data['commits'].sum(axis=(1, 2)).astype(float)  # repositório × aspecto
+    shares = totals / np.maximum(totals.sum(axis=1, keepdims=True), 1)
+    left = np.zeros(len(data['repositories']))
+    for i, category in enumerate(CATEGORIES):
+        ax.barh(data['repositories'], shares[:, i], left=left, label=category)
+        left += shares[:, i]
+    ax.set_title('Participação de cada aspecto nos commits')
+    ax.legend(fontsize=7, ncol=4, loc='lower center', bbox_to_anchor=(0.5, 1.05))
+
+
+CHARTS = {
+    'timeline': _timeline,
+    'change_types': _change_types,
+    'breaking': _breaking,
+    'repositories': _repositories
+}
+
+
+def render_chart(job):
+    """Desenha um gráfico em PNG (executado nos workers)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    kind, output, data = job
+    fig, ax = plt.subplots(figsize=(10, 5))
+    try:
+        CHARTS[kind](ax, data)
+        fig.tight_layout()
+        fig.savefig(output, dpi=110)
+    finally:
+        plt.close(fig)
+    return output
+
+
+def chart_jobs(cubes, output_dir):
+    """(nome, hash, job) de todos os gráficos do conjunto padrão"""
+    jobs = []
+    for cube in cubes:
+        if not len(cube.periods):
+            continue
+        name = cube.repositories[0]
+        data = {
+            'title': name,
+            'freq': cube.freq,
+            'labels': cube.period_labels().astype('datetime64[D]').astype(object),
+            'commits': cube.measures['commits'][0],
+            'breaking': cube.measures['breaking'][0]
+        }
+        for kind in ('timeline', 'change_types', 'breaking'):
+            output = str(Path(output_dir) / f"{name}_{kind}.png")
+            jobs.append((output, cube.digest(kind), (kind, output, data)))
+    if len(cubes) > 1:
+        combined = AggregateCube.combine(cubes)
+        output = str(Path(output_dir) / 'repositories_aspects.png')
+        data = {'repositories': combined.repositories, 'commits': combined.measures['commits']}
+        jobs.append((output, combined.digest('repositories'), ('repositories', output, data)))
+    return jobs
+
+
+def render_all(sources, output_dir='reports', freq='M', workers=None, force=False):
+    """Atualiza cubos e gráficos; retorna (cubos refeitos, gráficos renderizados, inalterados)"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    built = [build_cube(source, output_dir / 'cubes', freq) for source in sources]
+    cubes = [cube for cube, _ in built]
+
+    manifest_path = output_dir / MANIFEST_FILE
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    jobs = chart_jobs(cubes, output_dir)
+    pending = [(output, digest, job) for output, digest, job in jobs
+               if force or manifest.get(output) != digest or not Path(output).exists()]
+    # um gráfico por tarefa: cada um leva de dezenas a centenas de milissegundos
+    map_in_chunks(render_chart, [job for _, _, job in pending], workers, chunk_size=1)
+
+    manifest.update((output, digest) for output, digest, _ in pending)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return sum(1 for _, rebuilt in built if rebuilt), [output for output, _, _ in pending], \
+        len(jobs) - len(pending)
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description='Cubos de agregação e gráficos de co-evolução a partir das saídas do mps_analyzer',
+        epilog='Exemplo: python reporting.py analysis_mbeddr.core analysis_mps-extensions.json -o reports'
+    )
+    parser.add_argument('sources', nargs='+',
+                        help='Saídas do mps_analyzer (analysis_<repo>.json ou diretório colunar)')
+    parser.add_argument('-o', '--output', default='reports', help='Diretório dos cubos e gráficos (padrão: reports)')
+    parser.add_argument('--freq', choices=sorted(FREQS), default='M',
+                        help='Período dos cubos: mês, trimestre ou ano (padrão: M)')
+    parser.add_argument('--workers', type=int, default=None, help='Processos usados na renderização')
+    parser.add_argument('--force', action='store_true', help='Renderiza todos os gráficos de novo')
+    args = parser.parse_args()
+
+    rebuilt, rendered, unchanged = render_all(args.sources, args.output, args.freq, args.workers, args.force)
+    print(f"Cubos recalculados: {rebuilt} de {len(args.sources)}")
+    print(f"Gráficos renderizados: {len(rendered)} (inalterados: {unchanged})")
+    for output in rendered:
+        print(f"  {output}")
+
+
+if __name__ == '__main__':
+    main()
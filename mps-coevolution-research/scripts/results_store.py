@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Armazenamento colunar dos resultados
+Autor: Ana Carolina Poltronieri
+Propósito: Guardar commits, mudanças de arquivos, modelos e metamodelos como
+tabelas pandas tipadas (categorias e inteiros) num banco SQLite compacto,
+em vez de um único JSON indentado
+"""
+
+import json
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+TABLES_FILE = 'tables.sqlite'
+METADATA_FILE = 'metadata.json'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS columns (
+    table_name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    column_name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    PRIMARY KEY (table_name, position)
+);
+CREATE TABLE IF NOT EXISTS categories (
+    table_name TEXT NOT NULL,
+    column_name TEXT NOT NULL,
+    code INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (table_name, column_name, code)
+);
+"""
+
+
+def commit_frames(commits, classify=None):
+    """Converte CommitRecords em duas tabelas: commits e file_changes
+
+    `classify(commit)` opcional devolve (change_type, is_breaking) por commit.
+    As linhas de file_changes apontam para commits pelo inteiro `commit`.
+    """
+    hashes, authors, emails, dates, messages, n_files = [], [], [], [], [], []
+    change_types, breaking = [], []
+    fc_commit, fc_status, fc_path, fc_old = [], [], [], []
+
+    for i, commit in enumerate(commits):
+        hashes.append(commit.hash)
+        authors.append(commit.author)
+        emails.append(commit.email)
+        dates.append(commit.date)
+        messages.append(commit.message)
+        n_files.append(len(commit.files))
+        if classify:
+            change_type, is_breaking = classify(commit)
+            change_types.append(change_type)
+            breaking.append(is_breaking)
+        for change in commit.files:
+            fc_commit.append(i)
+            fc_status.append(change.status)
+            fc_path.append(change.path)
+            fc_old.append(change.old_path)
+
+    commits_df = pd.DataFrame({
+        'hash': pd.Series(hashes, dtype='string'),
+        'author': pd.Categorical(authors),
+        'email': pd.Categorical(emails),
+        'date': pd.to_datetime(pd.Series(dates, dtype='object'), utc=True, format='%Y-%m-%d %H:%M:%S %z'),
+        'message': pd.Series(messages, dtype='string'),
+        'n_files': pd.Series(n_files, dtype='int32')
+    })
+    if classify:
+        commits_df['change_type'] = pd.Categorical(change_types)
+        commits_df['is_breaking'] = pd.Series(breaking, dtype='bool')
+
+    file_changes_df = pd.DataFrame({
+        'commit': pd.Series(fc_commit, dtype='int32'),
+        'status': pd.Categorical(fc_status),
+        'path': pd.Categorical(fc_path),
+        'old_path': pd.Categorical(pd.Series(fc_old, dtype='string'))
+    })
+    return commits_df, file_changes_df
+
+
+def file_frame(files):
+    """Tabela de modelos/metamodelos a partir dos dicionários do MbeddrModelDiscovery"""
+    return pd.DataFrame({
+        'path': pd.Series([f['path'] for f in files], dtype='string'),
+        'name': pd.Categorical([f['name'] for f in files]),
+        'type': pd.Categorical([f['type'] for f in files]),
+        'extension': pd.Categorical([f['extension'] for f in files]),
+        'size': pd.Series([f['size'] for f in files], dtype='int64'),
+        'modified': pd.to_datetime(pd.Series([f['modified'] for f in files], dtype='object'))
+    })
+
+
+def concept_frame(histograms):
+    """Tabela longa (grupo, conceito, contagem) dos histogramas por conceito"""
+    rows = [(group, name, count) for group, counts in histograms.items() for name, count in counts.items()]
+    return pd.DataFrame({
+        'group': pd.Categorical([row[0] for row in rows]),
+        'concept': pd.Categorical([row[1] for row in rows]),
+        'count': pd.Series([row[2] for row in rows], dtype='int64')
+    })
+
+
+class ResultsStore:
+    """Diretório com as tabelas num banco SQLite e um metadata.json pequeno
+
+    Cada coluna guarda o dtype pandas em `columns`; categorias viram códigos
+    inteiros com os valores em `categories`, e datas viram inteiros na
+    unidade do dtype. O formato não depende da versão do pandas e carregar
+    um diretório compartilhado não executa código (ao contrário de pickle).
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def _connect(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.directory / TABLES_FILE), timeout=60)
+        conn.executescript(SCHEMA)
+        return conn
+
+    def save(self, name, frame):
+        conn = self._connect()
+        columns, categories, data = [], [], {}
+        for position, column in enumerate(frame.columns):
+            series = frame[column]
+            dtype = series.dtype
+            if isinstance(dtype, pd.CategoricalDtype):
+                categories += [(name, column, code, str(value)) for code, value in enumerate(dtype.categories)]
+                values = [None if code < 0 else int(code) for code in series.cat.codes]
+                kind = 'category'
+            elif pd.api.types.is_datetime64_any_dtype(dtype):
+                naive = series.dt.tz_convert('UTC').dt.tz_localize(None) if getattr(dtype, 'tz', None) else series
+                array = naive.to_numpy()
+                values = [None if missing else int(v) for v, missing in zip(array.view(np.int64), np.isnat(array))]
+                kind = str(dtype)
+            else:
+                values = series.astype(object).where(series.notna(), None).tolist()
+                kind = str(dtype)
+            columns.append((name, position, str(column), kind))
+            data[f"c{position}"] = values
+        with conn:
+            conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+            conn.execute("DELETE FROM columns WHERE table_name = ?", (name,))
+            conn.execute("DELETE FROM categories WHERE table_name = ?", (name,))
+            names = [f"c{position}" for position in range(len(frame.columns))]
+            conn.execute(f'CREATE TABLE "{name}" (row INTEGER PRIMARY KEY{"".join(f", {n}" for n in names)})')
+            if names:
+                marks = ', '.join('?' * len(names))
+                conn.executemany(f'INSERT INTO "{name}" ({", ".join(names)}) VALUES ({marks})',
+                                 zip(*(data[n] for n in names)))
+            conn.executemany("INSERT INTO columns VALUES (?, ?, ?, ?)", columns)
+            conn.executemany("INSERT INTO categories VALUES (?, ?, ?, ?)", categories)
+        conn.close()
+
+    def load(self, name):
+        conn = self._connect()
+        try:
+            columns = conn.execute(
+                "SELECT position, column_name, kind FROM columns WHERE table_name = ? ORDER BY position", (name,)
+            ).fetchall()
+            if not columns:
+                raise KeyError(f"Tabela não encontrada: {name}")
+            rows = conn.execute(
+                f'SELECT {", ".join(f"c{position}" for position, _, _ in columns)} FROM "{name}" ORDER BY row'
+            ).fetchall()
+            frame = {}
+            for i, (position, column, kind) in enumerate(columns):
+                values = [row[i] for row in rows]
+                if kind == 'category':
+                    labels = [value for _, value in conn.execute(
+                        "SELECT code, value FROM categories WHERE table_name = ? AND column_name = ? ORDER BY code",
+                        (name, column))]
+                    codes = np.array([-1 if v is None else v for v in values], dtype=np.int64)
+                    frame[column] = pd.Categorical.from_codes(codes, labels)
+                elif kind.startswith('datetime64'):
+                    dtype = pd.api.types.pandas_dtype(kind)
+                    unit = getattr(dtype, 'unit', None) or np.datetime_data(dtype)[0]
+                    series = pd.Series(np.array([np.iinfo(np.int64).min if v is None else v for v in values],
+                                                dtype=np.int64).view(f'datetime64[{unit}]'))
+                    frame[column] = series.dt.tz_localize('UTC').dt.tz_convert(dtype.tz) \
+                        if getattr(dtype, 'tz', None) else series
+                else:
+                    frame[column] = pd.Series(values, dtype=kind)
+            return pd.DataFrame(frame, columns=[column for _, column, _ in columns])
+        finally:
+            conn.close()
+
+    def tables(self):
+        if not (self.directory / TABLES_FILE).exists():
+            return []
+        conn = self._connect()
+        try:
+            return sorted(row[0] for row in conn.execute("SELECT DISTINCT table_name FROM columns"))
+        finally:
+            conn.close()
+
+    def save_metadata(self, metadata):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / METADATA_FILE, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, indent=2, default=str, ensure_ascii=False)
+
+    def load_metadata(self):
+        with open(self.directory / METADATA_FILE, encoding='utf-8') as f:
+            return json.load(f)
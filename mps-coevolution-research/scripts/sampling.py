@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Amostragem estratificada de commits
+Autor: Ana Carolina Poltronieri
+Propósito: Estimar totais e taxas (tipos de mudança, mudanças breaking) de
+repositórios grandes a partir de uma amostra aleatória estratificada no
+tempo, com intervalos de confiança
+"""
+
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+STRATA = ('year', 'quarter', 'month')
+
+
+def z_value(confidence):
+    """Quantil da normal para o nível de confiança bilateral"""
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def required_sample_size(population, margin, confidence=0.95):
+    """Tamanho de amostra para estimar uma proporção com a margem de erro dada
+
+    Usa o pior caso p = 0,5 e a correção para população finita.
+    """
+    if population <= 0:
+        return 0
+    n0 = z_value(confidence) ** 2 * 0.25 / margin ** 2
+    return min(population, math.ceil(n0 / (1 + (n0 - 1) / population)))
+
+
+def stratum_keys(timestamps, strata='year'):
+    """Estrato de cada commit pelo período da data (segundos desde a época)"""
+    if strata not in STRATA:
+        raise ValueError(f"Estrato desconhecido: {strata} (opções: {', '.join(STRATA)})")
+    months = np.asarray(timestamps, dtype='datetime64[s]').astype('datetime64[M]').astype(np.int64)
+    if strata == 'year':
+        return months // 12
+    if strata == 'quarter':
+        return months // 3
+    return months
+
+
+def allocate(sizes, sample_size):
+    """Alocação proporcional (maiores restos), com ao menos 2 por estrato quando possível"""
+    sizes = np.asarray(sizes, dtype=np.int64)
+    total = sizes.sum()
+    if total == 0:
+        return np.zeros_like(sizes)
+    sample_size = min(sample_size, total)
+    exact = sizes * sample_size / total
+    counts = np.floor(exact).astype(np.int64)
+    remainder = sample_size - counts.sum()
+    counts[np.argsort(-(exact - counts), kind='stable')[:remainder]] += 1
+    # variância por estrato precisa de 2 observações
+    counts = np.minimum(np.maximum(counts, np.minimum(sizes, 2)), sizes)
+    return counts
+
+
+def wilson_interval(rate, n, confidence=0.95):
+    """Intervalo de Wilson para uma proporção com `n` observações (efetivas)
+
+    Ao contrário do intervalo de Wald, não colapsa em [0, 0] ou [1, 1]
+    quando a proporção observada é 0 ou 1.
+    """
+    if n <= 0:
+        return 0.0, 1.0
+    z2 = z_value(confidence) ** 2
+    center = (rate + z2 / (2 * n)) / (1 + z2 / n)
+    half = math.sqrt(z2) / (1 + z2 / n) * math.sqrt(rate * (1 - rate) / n + z2 / (4 * n * n))
+    return float(max(center - half, 0.0)), float(min(center + half, 1.0))
+
+
+class StratifiedSample:
+    """Índices sorteados, estrato de cada um e tamanhos N_h / n_h por estrato"""
+
+    def __init__(self, keys, sample_size, seed=None):
+        rng = np.random.default_rng(seed)
+        self.labels, inverse, self.sizes = np.unique(keys, return_inverse=True, return_counts=True)
+        self.counts = allocate(self.sizes, sample_size)
+        chosen = []
+        for stratum, n in enumerate(self.counts):
+            members = np.flatnonzero(inverse == stratum)
+            chosen.append(rng.choice(members, size=n, replace=False))
+        self.indices = np.sort(np.concatenate(chosen)) if chosen else np.zeros(0, dtype=np.int64)
+        self.strata = inverse[self.indices]
+
+    @property
+    def population(self):
+        return int(self.sizes.sum())
+
+    def estimate(self, values, confidence=0.95):
+        """Estimativa estratificada da proporção (valores booleanos da amostra, na ordem de `indices`)
+
+        Taxa = Σ W_h p_h; variância = Σ W_h² (1 - n_h/N_h) p_h (1 - p_h) / (n_h - 1).
+        O intervalo é o de Wilson com o tamanho efetivo p (1 - p) / variância
+        (o tamanho da amostra quando p é 0 ou 1); com todos os estratos
+        inteiros na amostra (censo), o intervalo é o próprio valor.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        weights = self.sizes / self.population
+        n_h = np.bincount(self.strata, minlength=len(self.sizes)).astype(np.float64)
+        hits = np.bincount(self.strata, weights=values, minlength=len(self.sizes))
+        p_h = np.divide(hits, n_h, out=np.zeros_like(hits), where=n_h > 0)
+        fpc = 1 - n_h / self.sizes
+        variance = np.divide(
+            weights ** 2 * fpc * p_h * (1 - p_h), n_h - 1,
+            out=np.zeros_like(hits), where=n_h > 1
+        ).sum()
+
+        rate = float((weights * p_h).sum())
+        if np.all(fpc == 0):
+            low = high = rate
+        else:
+            n_eff = rate * (1 - rate) / variance if variance > 0 else n_h.sum()
+            low, high = wilson_interval(rate, n_eff, confidence)
+        return {
+            'rate': rate,
+            'rate_ci': [low, high],
+            'total': rate * self.population,
+            'total_ci': [low * self.population, high * self.population],
+            'standard_error': math.sqrt(variance)
+        }
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Índice de similaridade entre linguagens e modelos (MinHash + LSH)
+Autor: Ana Carolina Poltronieri
+Propósito: Encontrar linguagens e modelos de outros repositórios derivados
+das linguagens do mbeddr.core comparando conjuntos de conceitos e features,
+sem comparar todos os pares: assinaturas MinHash persistidas e um índice
+LSH por faixas que devolve só os candidatos parecidos
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import numpy as np
+
+from dependency_graph import model_name
+from metamodel_diff import parse_structure
+from mps_parser import (
+    ModelInfo, RegistryConcept, RegistryFeature, RegistryLanguage, iter_model, iter_model_files
+)
+from parallel import map_in_chunks
+
+DEFAULT_SIMILARITY_PATH = 'data/similarity_index.sqlite'
+INDEX_VERSION = 2
+
+# assinatura como BLOB de NUM_PERM uint32 (little-endian)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    repo TEXT NOT NULL,
+    path TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    num_perm INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT,
+    features INTEGER NOT NULL,
+    signature BLOB NOT NULL,
+    PRIMARY KEY (repo, path)
+);
+"""
+
+# limiar do LSH ≈ (1/BANDS)^(1/ROWS) = 0,29, perto da similaridade mínima padrão
+BANDS = 42
+ROWS = 3
+NUM_PERM = BANDS * ROWS
+# primo de Mersenne 2^31 - 1: (a * x + b) cabe em uint64 sem estourar
+PRIME = (1 << 31) - 1
+SEED = 1
+_rng = np.random.default_rng(SEED)
+PERM_A = _rng.integers(1, PRIME, size=NUM_PERM, dtype=np.uint64)
+PERM_B = _rng.integers(0, PRIME, size=NUM_PERM, dtype=np.uint64)
+
+KINDS = ('language', 'model')
+
+# modelos de aspecto de linguagem (nome terminado no aspecto, ou @generator):
+# usam poucos conceitos de linguagens utilitárias e pareceriam todos iguais
+LANGUAGE_ASPECTS = (
+    'structure', 'editor', 'behavior', 'constraints', 'typesystem', 'actions', 'intentions',
+    'refactorings', 'scripts', 'findUsages', 'plugin', 'dataFlow', 'textGen', 'migration', 'feedback',
+    'listeners', 'documentation'
+)
+
+# conceitos da própria MPS (editor, baseLanguage, smodel...) aparecem em todo
+# aspecto e escondem os conceitos de domínio
+BASE_LANGUAGE_PREFIX = 'jetbrains.mps.'
+
+# conjuntos muito pequenos (modelos vazios, linguagens de teste) coincidem por acaso
+MIN_FEATURES = 5
+
+
+def _short(name):
+    return name.rsplit('.', 1)[-1] if name else ''
+
+
+def language_features(path):
+    """Conceitos declarados no structure.mps e suas propriedades e ligações
+
+    Usa nomes curtos: uma linguagem copiada para outro pacote mantém os
+    mesmos conceitos e features.
+    """
+    tokens = set()
+    for decl in parse_structure(path).values():
+        if not decl.name:
+            continue
+        tokens.add(f"c:{decl.name}")
+        for name, _ in decl.properties.values():
+            tokens.add(f"p:{decl.name}.{name}")
+        for role, metaclass, cardinality, target in decl.links.values():
+            tokens.add(f"l:{decl.name}.{role}")
+    return tokens
+
+
+def model_features(path):
+    """Conceitos e features usados pelo modelo, lidos do `<registry>`
+
+    Conceitos das linguagens da MPS ficam de fora.
+    """
+    tokens = set()
+    base = set()
+    concepts = {}
+    ref = None
+    for record in iter_model(path, include_nodes=False):
+        kind = type(record)
+        if kind is RegistryLanguage:
+            if record.name.startswith(BASE_LANGUAGE_PREFIX):
+                base.add(record.id)
+        elif kind is RegistryConcept:
+            if record.language_id in base:
+                continue
+            concepts[record.index] = _short(record.name)
+            tokens.add(f"c:{concepts[record.index]}")
+        elif kind is RegistryFeature:
+            if record.concept_index in concepts:
+                tokens.add(f"f:{concepts[record.concept_index]}.{record.name}")
+        elif kind is ModelInfo:
+            ref = record.ref
+    return ref, tokens
+
+
+def token_hashes(tokens):
+    """Hash estável (entre execuções e processos) de cada token, reduzido ao primo"""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(t.encode('utf-8'), digest_size=8).digest(), 'little') % PRIME
+         for t in tokens),
+        dtype=np.uint64, count=len(tokens)
+    )
+
+
+def minhash(tokens):
+    """Assinatura MinHash (NUM_PERM mínimos de permutações universais)"""
+    if not tokens:
+        return np.full(NUM_PERM, PRIME, dtype=np.uint32)
+    hashes = token_hashes(tokens)
+    values = (hashes[:, np.newaxis] * PERM_A + PERM_B) % PRIME
+    return values.min(axis=0).astype(np.uint32)
+
+
+def is_aspect_model(name):
+    """Modelo de aspecto de uma linguagem pelo nome (com.x.editor, com.x.generator.template.main@generator)"""
+    if '@generator' in name:
+        return True
+    return name.split('@', 1)[0].rsplit('.', 1)[-1] in LANGUAGE_ASPECTS
+
+
+def scan_signature(path):
+    """Tipo, nome, tamanho do conjunto e assinatura de um arquivo .mps (nos workers)"""
+    try:
+        ref, tokens = model_features(path)
+        name = model_name(ref) or Path(path).stem
+        kind = 'model'
+        if path.endswith('structure.mps'):
+            kind = 'language'
+            name = name[:-len('.structure')] if name.endswith('.structure') else name
+            tokens = language_features(path)
+        elif is_aspect_model(name):
+            # fica no índice (não é relido a cada atualização), mas fora das consultas
+            kind = 'aspect'
+    except (ET.ParseError, OSError) as e:
+        print(f"Erro ao ler modelo {path}: {e}")
+        return path, None, None, 0, None
+    return path, kind, name, len(tokens), minhash(tokens)
+
+
+class SimilarityIndex:
+    """Assinaturas por arquivo (persistidas) e baldes LSH montados sob demanda
+
+    Cada assinatura é dividida em BANDS faixas; dois itens são candidatos se
+    coincidem em alguma faixa inteira, o que separa pares com Jaccard acima
+    de ~(1/BANDS)^(1/ROWS) dos demais. A similaridade informada é a
+    estimativa MinHash (fração de posições iguais).
+    """
+
+    def __init__(self, cache_file=DEFAULT_SIMILARITY_PATH, min_features=MIN_FEATURES):
+        self.cache_file = Path(cache_file)
+        self.min_features = min_features
+        # (repositório, caminho relativo) -> (tamanho, mtime_ns, tipo, nome, nº de tokens, assinatura)
+        self.records = {}
+        self._load()
+        self._index = None
+
+    def _connect(self):
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.cache_file), timeout=60)
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _load(self):
+        if not self.cache_file.exists():
+            return
+        try:
+            conn = self._connect()
+        except sqlite3.DatabaseError:
+            # arquivo que não é um banco SQLite: começa vazio
+            return
+        try:
+            rows = conn.execute(
+                "SELECT repo, path, size, mtime, kind, name, features, signature FROM signatures "
+                "WHERE version = ? AND num_perm = ?", (INDEX_VERSION, NUM_PERM)
+            )
+            for repo, path, size, mtime, kind, name, features, signature in rows:
+                self.records[(repo, path)] = (size, mtime, kind, name, features,
+                                              np.frombuffer(signature, dtype='<u4').astype(np.uint32))
+        finally:
+            conn.close()
+
+    def save(self):
+        """Regrava as assinaturas (só dados: abrir o índice não executa código)"""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM signatures")
+                conn.executemany(
+                    "INSERT INTO signatures VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        (repo, path, INDEX_VERSION, NUM_PERM, size, mtime, kind, name, features,
+                         signature.astype('<u4').tobytes())
+                        for (repo, path), (size, mtime, kind, name, features, signature)
+                        in self.records.items()
+                    )
+                )
+        finally:
+            conn.close()
+
+    def update(self, repo_path, workers=1):
+        """Calcula assinaturas só dos modelos novos ou alterados do repositório"""
+        repo_key = str(Path(repo_path).resolve())
+        known = {rel: entry for (repo, rel), entry in self.records.items() if repo == repo_key}
+
+        changed = []
+        stats = {}
+        seen = set()
+        for full_path in iter_model_files(repo_path):
+            rel_path = os.path.relpath(full_path, repo_path)
+            seen.add(rel_path)
+            st = os.stat(full_path)
+            previous = known.get(rel_path)
+            if previous and previous[0] == st.st_size and previous[1] == st.st_mtime_ns:
+                continue
+            stats[full_path] = (rel_path, st.st_size, st.st_mtime_ns)
+            changed.append(full_path)
+
+        removed = [rel for rel in known if rel not in seen]
+        for rel_path in removed:
+            del self.records[(repo_key, rel_path)]
+
+        for path, kind, name, size, signature in map_in_chunks(scan_signature, changed, workers, 64):
+            rel_path, file_size, mtime = stats[path]
+            if signature is None:
+                self.records.pop((repo_key, rel_path), None)
+                continue
+            self.records[(repo_key, rel_path)] = (file_size, mtime, kind, name, size, signature)
+
+        if changed or removed:
+            self._index = None
+        return {'updated': len(changed), 'removed': len(removed), 'unchanged': len(seen) - len(changed)}
+
+    def _build(self):
+        """Matriz de assinaturas e um dicionário de baldes por faixa"""
+        keys = [key for key, entry in self.records.items()
+                if entry[2] in KINDS and entry[4] >= max(self.min_features, 1)]
+        signatures = np.vstack([self.records[key][5] for key in keys]) if keys \
+            else np.zeros((0, NUM_PERM), dtype=np.uint32)
+        buckets = [{} for _ in range(BANDS)]
+        for band in range(BANDS):
+            chunk = np.ascontiguousarray(signatures[:, band * ROWS:(band + 1) * ROWS])
+            table = buckets[band]
+            for item, row in enumerate(chunk):
+                table.setdefault(row.tobytes(), []).append(item)
+        self._index = {'keys': keys, 'signatures': signatures, 'buckets': buckets}
+        return self._index
+
+    @property
+    def index(self):
+        return self._index or self._build()
+
+    def resolve(self, target):
+        """Itens de um alvo: caminho (ou final do caminho) ou nome de linguagem/modelo"""
+        index = self.index
+        found = [i for i, key in enumerate(index['keys']) if self.records[key][3] == target]
+        if not found:
+            found = [i for i, (repo, rel_path) in enumerate(index['keys'])
+                     if os.path.join(repo, rel_path).endswith(target)]
+        return found
+
+    def candidates(self, item):
+        """Itens que dividem ao menos uma faixa inteira com o item"""
+        index = self.index
+        signature = index['signatures'][item]
+        found = set()
+        for band in range(BANDS):
+            found.update(index['buckets'][band].get(signature[band * ROWS:(band + 1) * ROWS].tobytes(), ()))
+        found.discard(item)
+        return np.fromiter(found, dtype=np.int64, count=len(found))
+
+    def similar(self, target, top=10, kind=None, min_similarity=0.3, other_repositories=False):
+        """Itens mais parecidos com o alvo: lista de (similaridade, repositório, caminho, tipo, nome)"""
+        index = self.index
+        items = self.resolve(target)
+        if not items:
+            raise KeyError(f"Alvo não encontrado no índice: {target}")
+        item = items[0]
+        candidates = self.candidates(item)
+        if len(candidates) == 0:
+            return []
+        similarity = (index['signatures'][candidates] == index['signatures'][item]).mean(axis=1)
+        own_repo = index['keys'][item][0]
+        results = []
+        for position in np.argsort(-similarity, kind='stable'):
+            score = float(similarity[position])
+            if score < min_similarity:
+                break
+            repo, rel_path = index['keys'][candidates[position]]
+            entry = self.records[(repo, rel_path)]
+            if (kind and entry[2] != kind) or (other_repositories and repo == own_repo):
+                continue
+            results.append((score, repo, rel_path, entry[2], entry[3]))
+            if len(results) >= top:
+                break
+        return results
+
+    def derived(self, source_repo, kind='language', min_similarity=0.3):
+        """Para cada item de outros repositórios, o item mais parecido de `source_repo`"""
+        index = self.index
+        source_key = str(Path(source_repo).resolve())
+        matches = []
+        for item, (repo, rel_path) in enumerate(index['keys']):
+            entry = self.records[(repo, rel_path)]
+            if repo == source_key or entry[2] != kind:
+                continue
+            candidates = [c for c in self.candidates(item)
+                          if index['keys'][c][0] == source_key and self.records[index['keys'][c]][2] == kind]
+            if not candidates:
+                continue
+            similarity = (index['signatures'][candidates] == index['signatures'][item]).mean(axis=1)
+            best = int(np.argmax(similarity))
+            if similarity[best] >= min_similarity:
+                source = self.records[index['keys'][candidates[best]]]
+                matches.append((float(similarity[best]), repo, rel_path, entry[3], source[3]))
+        return sorted(matches, reverse=True)
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description='Linguagens e modelos parecidos entre repositórios (MinHash/LSH sobre o registry)',
+        epilog='Exemplo: python similarity.py --update repositories/* '
+               '--derived-from repositories/mbeddr.core'
+    )
+    parser.add_argument('--cache', default=DEFAULT_SIMILARITY_PATH,
+                        help=f'Banco SQLite das assinaturas (padrão: {DEFAULT_SIMILARITY_PATH})')
+    parser.add_argument('--update', nargs='*', default=[], metavar='REPO',
+                        help='Repositórios a (re)ler')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Processos usados para ler os modelos alterados')
+    parser.add_argument('--similar', metavar='ALVO', help='Nome ou caminho de uma linguagem/modelo')
+    parser.add_argument('--kind', choices=KINDS, default=None, help='Restringe os resultados a um tipo')
+    parser.add_argument('--top', type=int, default=10, help='Número de resultados (padrão: 10)')
+    parser.add_argument('--min-similarity', type=float, default=0.3,
+                        help='Similaridade mínima estimada (padrão: 0.3)')
+    parser.add_argument('--min-features', type=int, default=MIN_FEATURES,
+                        help=f'Ignora itens com menos conceitos/features (padrão: {MIN_FEATURES})')
+    parser.add_argument('--derived-from', metavar='REPO',
+                        help='Linguagens de outros repositórios parecidas com as deste')
+    args = parser.parse_args()
+
+    index = SimilarityIndex(args.cache, args.min_features)
+    for repo_path in args.update:
+        stats = index.update(repo_path, args.workers)
+        print(f"{repo_path}: {stats['updated']} atualizados, {stats['removed']} removidos, "
+              f"{stats['unchanged']} sem alteração")
+    if args.update:
+        index.save()
+
+    if args.similar:
+        try:
+            results = index.similar(args.similar, args.top, args.kind, args.min_similarity)
+        except KeyError as e:
+            print(e.args[0])
+        else:
+            print(f"Mais parecidos com {args.similar}:")
+            for score, repo, rel_path, kind, name in results:
+                print(f"  {score:.2f}  {kind:8} {name}  ({Path(repo).name}/{rel_path})")
+
+    if args.derived_from:
+        matches = index.derived(args.derived_from, args.kind or 'language', args.min_similarity)
+        print(f"{len(matches)} itens parecidos com {Path(args.derived_from).name}:")
+        for score, repo, rel_path, name, source in matches:
+            print(f"  {score:.2f}  {Path(repo).name}: {name}  ←  {source}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+Gerador de repositórios MPS sintéticos
+Autor: Ana Carolina Poltronieri
+Propósito: Criar repositórios git com histórico configurável (commits,
+linguagens, churn de structure/editor/migration e tamanho dos modelos) e
+XML de persistência v9 realista, para medir o desempenho das análises
+"""
+
+import argparse
+import random
+import subprocess
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from xml.sax.saxutils import quoteattr
+
+STRUCTURE_LANG = ('c72da2b9-7cce-4447-8389-f407dc1158b7', 'jetbrains.mps.lang.structure')
+CORE_LANG = ('ceab5195-25ea-4f22-9b92-103b95ca8c0c', 'jetbrains.mps.lang.core')
+
+# registry de um structure.mps real (ids e apelidos do MPS)
+STRUCTURE_REGISTRY = f"""  <registry>
+    <language id="{STRUCTURE_LANG[0]}" name="{STRUCTURE_LANG[1]}">
+      <concept id="1169125787135" name="jetbrains.mps.lang.structure.structure.AbstractConceptDeclaration" flags="ig" index="PkWjJ">
+        <property id="6714410169261853888" name="conceptId" index="EcuMT" />
+        <property id="4628067390765956802" name="abstract" index="R5$K7" />
+        <child id="1071489727083" name="linkDeclaration" index="1TKVEi" />
+        <child id="1071489727084" name="propertyDeclaration" index="1TKVEl" />
+      </concept>
+      <concept id="1071489090640" name="jetbrains.mps.lang.structure.structure.ConceptDeclaration" flags="ig" index="1TIwiD">
+        <property id="1096454100552" name="rootable" index="19KtqR" />
+        <reference id="1071489389519" name="extends" index="1TJDcQ" />
+      </concept>
+      <concept id="1071489288299" name="jetbrains.mps.lang.structure.structure.PropertyDeclaration" flags="ig" index="1TJgyi">
+        <property id="241647608299431129" name="propertyId" index="IQ2nx" />
+        <reference id="1082985295845" name="dataType" index="AX2Wp" />
+      </concept>
+      <concept id="1071489288298" name="jetbrains.mps.lang.structure.structure.LinkDeclaration" flags="ig" index="1TJgyj">
+        <property id="1071599776563" name="role" index="20kJfa" />
+        <property id="1071599893252" name="sourceCardinality" index="20lbJX" />
+        <property id="1071599937831" name="metaClass" index="20lmBu" />
+        <property id="241647608299431140" name="linkId" index="IQ2ns" />
+        <reference id="1071599976176" name="target" index="20lvS9" />
+      </concept>
+    </language>
+    <language id="{CORE_LANG[0]}" name="{CORE_LANG[1]}">
+      <concept id="1169194658468" name="jetbrains.mps.lang.core.structure.INamedConcept" flags="ngI" index="TrEIO">
+        <property id="1169194664001" name="name" index="TrG5h" />
+      </concept>
+    </language>
+  </registry>
+"""
+
+CARDINALITY_VALUES = {
+    '0..1': None,
+    '1': 'fLJekj4/_1',
+    '0..n': 'fLJekj5/_0__n',
+    '1..n': 'fLJekj6/_1__n'
+}
+
+ASPECTS = {
+    'editor': ('18bc6592-03a6-4e29-a83a-7ff23bde13ba', 'jetbrains.mps.lang.editor', 'ConceptEditorDeclaration'),
+    'behavior': ('af65afd8-f0dd-4942-87d9-63a55f2a9db1', 'jetbrains.mps.lang.behavior', 'ConceptBehavior'),
+    'typesystem': ('7a5dda62-9140-4668-ab76-d5ed1746f2b2', 'jetbrains.mps.lang.typesystem', 'InferenceRule'),
+    'constraints': ('3f4bc5f5-c6c1-4a28-8b10-c83066ffa4a1', 'jetbrains.mps.lang.constraints', 'ConceptConstraints'),
+    'migration': ('90746344-04fd-4286-97d5-b46ae6a81709', 'jetbrains.mps.lang.migration', 'MigrationScript')
+}
+
+MESSAGES = [
+    'add {name}', 'new concept {name}', 'create editor for {name}', 'fix typo in {name}',
+    'refactor {name}', 'remove unused {name}', 'delete obsolete {name}', 'migrate {name} to new API',
+    'update {name}', 'improve {name} generator', 'breaking: drop {name}', 'cleanup {name}'
+]
+
+AUTHORS = [
+    ('Ana Souza', 'ana@example.org'), ('Bruno Lima', 'bruno@example.org'),
+    ('Carla Dias', 'carla@example.org'), ('Diego Alves', 'diego@example.org'),
+    ('Elisa Rocha', 'elisa@example.org'), ('Felipe Costa', 'felipe@example.org')
+]
+
+
+def _alias(prefix, n):
+    """Apelido curto (`index`) no estilo do registry do MPS"""
+    return f"{prefix}{n:x}"
+
+
+class SyntheticRepoGenerator:
+    """Gera um repositório git sintético via `git fast-import`"""
+
+    def __init__(self, path, commits=500, languages=5, concepts=20, solutions=3,
+                 models_per_solution=10, model_nodes=200, structure_churn=0.2,
+                 editor_churn=0.15, migration_churn=0.05, aspect_churn=0.1,
+                 model_churn=0.6, seed=1, start_date='2012-01-01', days=4000):
+        self.path = Path(path)
+        self.commits = commits
+        self.languages_count = languages
+        self.concepts_count = concepts
+        self.solutions = solutions
+        self.models_per_solution = models_per_solution
+        self.model_nodes = model_nodes
+        self.churn = {
+            'structure': structure_churn,
+            'editor': editor_churn,
+            'migration': migration_churn,
+            'behavior': aspect_churn,
+            'typesystem': aspect_churn,
+            'constraints': aspect_churn,
+            'model': model_churn
+        }
+        self.rng = random.Random(seed)
+        self.start = int(datetime.fromisoformat(start_date).replace(tzinfo=timezone.utc).timestamp())
+        self.span = days * 86400
+        self.counter = 0
+        self.languages = []
+        self.models = {}
+
+    # ---- estado ----
+
+    def _next_id(self):
+        self.counter += 1
+        return f"{self.counter:x}"
+
+    def _uuid(self):
+        return str(uuid.UUID(int=self.rng.getrandbits(128)))
+
+    def _new_concept(self, language):
+        n = len(language['concepts']) + language['removed']
+        concept = {
+            'node_id': self._next_id(),
+            'concept_id': str(self.rng.getrandbits(62)),
+            'name': f"Concept{n}",
+            'alias': _alias('c', n),
+            'abstract': self.rng.random() < 0.1,
+            'properties': [],
+            'links': []
+        }
+        for _ in range(self.rng.randint(0, 3)):
+            self._new_property(concept)
+        for _ in range(self.rng.randint(0, 2)):
+            self._new_link(language, concept)
+        language['concepts'].append(concept)
+        return concept
+
+    def _new_property(self, concept):
+        n = len(concept['properties'])
+        concept['properties'].append({
+            'node_id': self._next_id(),
+            'name': f"prop{n}_{self.counter}",
+            'alias': _alias('p', self.counter),
+            'id': str(self.rng.getrandbits(62))
+        })
+
+    def _new_link(self, language, concept):
+        target = self.rng.choice(language['concepts']) if language['concepts'] else concept
+        concept['links'].append({
+            'node_id': self._next_id(),
+            'role': f"link{self.counter}",
+            'alias': _alias('l', self.counter),
+            'id': str(self.rng.getrandbits(62)),
+            'aggregation': self.rng.random() < 0.6,
+            'cardinality': self.rng.choice(list(CARDINALITY_VALUES)),
+            'target': target['name']
+        })
+
+    def _init_state(self):
+        for i in range(self.languages_count):
+            language = {
+                'name': f"org.synthetic.lang{i}",
+                'uuid': self._uuid(),
+                'model_uuid': self._uuid(),
+                'concepts': [],
+                'removed': 0,
+                'revisions': {aspect: 0 for aspect in ASPECTS}
+            }
+            self.languages.append(language)
+            for _ in range(self.concepts_count):
+                self._new_concept(language)
+
+        for s in range(self.solutions):
+            for m in range(self.models_per_solution):
+                self._new_model(s, m)
+
+    def _new_model(self, solution, index):
+        path = f"code/solutions/org.synthetic.sol{solution}/models/model{index}.mps"
+        self.models[path] = {
+            'uuid': self._uuid(),
+            'name': f"org.synthetic.sol{solution}.model{index}",
+            'language': self.rng.randrange(self.languages_count),
+            'nodes': max(1, int(self.rng.gauss(self.model_nodes, self.model_nodes / 4))),
+            'seed': self.rng.getrandbits(32),
+            'imports': []
+        }
+        others = [p for p in self.models if p != path]
+        if others:
+            self.models[path]['imports'] = self.rng.sample(others, min(len(others), self.rng.randint(0, 3)))
+        return path
+
+    # ---- XML ----
+
+    def _language_dir(self, language):
+        return f"code/languages/{language['name']}"
+
+    def render_structure(self, language):
+        lines = [
+            '<?xml version="1.0" encoding="UTF-8"?>',
+            f'<model ref="r:{language["model_uuid"]}({language["name"]}.structure)">',
+            '  <persistence version="9" />',
+            '  <languages>',
+            f'    <use id="{STRUCTURE_LANG[0]}" name="{STRUCTURE_LANG[1]}" version="9" />',
+            '  </languages>',
+            '  <imports>',
+            '    <import index="tpck" ref="r:00000000-0000-4000-0000-011c89590288(jetbrains.mps.lang.core.structure)" implicit="true" />',
+            '  </imports>',
+            STRUCTURE_REGISTRY.rstrip('\n')
+        ]
+        for concept in language['concepts']:
+            lines.append(f'  <node concept="1TIwiD" id="{concept["node_id"]}">')
+            lines.append(f'    <property role="TrG5h" value="{concept["name"]}" />')
+            lines.append(f'    <property role="EcuMT" value="{concept["concept_id"]}" />')
+            if concept['abstract']:
+                lines.append('    <property role="R5$K7" value="true" />')
+            lines.append('    <ref role="1TJDcQ" to="tpck:gw2VY9q" resolve="BaseConcept" />')
+            for prop in concept['properties']:
+                lines.append(f'    <node concept="1TJgyi" id="{prop["node_id"]}" role="1TKVEl">')
+                lines.append(f'      <property role="TrG5h" value="{prop["name"]}" />')
+                lines.append(f'      <property role="IQ2nx" value="{prop["id"]}" />')
+                lines.append('      <ref role="AX2Wp" to="tpck:fKAOsGN" resolve="string" />')
+                lines.append('    </node>')
+            for link in concept['links']:
+                lines.append(f'    <node concept="1TJgyj" id="{link["node_id"]}" role="1TKVEi">')
+                lines.append(f'      <property role="20kJfa" value="{link["role"]}" />')
+                if CARDINALITY_VALUES[link['cardinality']]:
+                    lines.append(f'      <property role="20lbJX" value="{CARDINALITY_VALUES[link["cardinality"]]}" />')
+                if link['aggregation']:
+                    lines.append('      <property role="20lmBu" value="fLJjDmT/aggregation" />')
+                lines.append(f'      <property role="IQ2ns" value="{link["id"]}" />')
+                lines.append(f'      <ref role="20lvS9" node="{link["target"]}" resolve="{link["target"]}" />')
+                lines.append('    </node>')
+            lines.append('  </node>')
+        lines.append('</model>')
+        return '\n'.join(lines) + '\n'
+
+    def render_aspect(self, language, aspect):
+        lang_id, lang_name, root_concept = ASPECTS[aspect]
+        revision = language['revisions'][aspect]
+        lines = [
+            '<?xml version="1.0" encoding="UTF-8"?>',
+            f'<model ref="r:{language["model_uuid"][:-4]}{aspect[:4]}({language["name"]}.{aspect})">',
+            '  <persistence version="9" />',
+            '  <languages>',
+            f'    <use id="{lang_id}" name="{lang_name}" version="1" />',
+            '  </languages>',
+            '  <imports>',
+            f'    <import index="strc" ref="r:{language["model_uuid"]}({language["name"]}.structure)" />',
+            '  </imports>',
+            '  <registry>',
+            f'    <language id="{lang_id}" name="{lang_name}">',
+            f'      <concept id="1" name="{lang_name}.structure.{root_concept}" flags="ig" index="a0">',
+            '        <property id="2" name="revision" index="r0" />',
+            '        <reference id="3" name="concept" index="k0" />',
+            '      </concept>',
+            '    </language>',
+            '  </registry>'
+        ]
+        steps = revision + 1 if aspect == 'migration' else len(language['concepts'])
+        for i in range(steps):
+            concept = language['concepts'][i % len(language['concepts'])]
+            lines.append(f'  <node concept="a0" id="{aspect[0]}{i:x}">')
+            lines.append(f'    <property role="r0" value="{revision}" />')
+            lines.append(f'    <ref role="k0" to="strc:{concept["node_id"]}" resolve="{concept["name"]}" />')
+            lines.append('  </node>')
+        lines.append('</model>')
+        return '\n'.join(lines) + '\n'
+
+    def render_model(self, path):
+        model = self.models[path]
+        language = self.languages[model['language']]
+        rng = random.Random(model['seed'])
+        concepts = language['concepts']
+        lines = [
+            '<?xml version="1.0" encoding="UTF-8"?>',
+            f'<model ref="r:{model["uuid"]}({model["name"]})">',
+            '  <persistence version="9" />',
+            '  <languages>',
+            f'    <use id="{language["uuid"]}" name="{language["name"]}" version="0" />',
+            '  </languages>',
+            '  <imports>'
+        ]
+        for i, imported in enumerate(model['imports']):
+            if imported in self.models:
+                other = self.models[imported]
+                lines.append(f'    <import index="i{i}" ref="r:{other["uuid"]}({other["name"]})" />')
+        lines += [
+            '  </imports>',
+            '  <registry>',
+            f'    <language id="{language["uuid"]}" name="{language["name"]}">'
+        ]
+        for concept in concepts:
+            lines.append(f'      <concept id="{concept["concept_id"]}" name="{language["name"]}.structure.{concept["name"]}" flags="ng" index="{concept["alias"]}">')
+            for prop in concept['properties']:
+                lines.append(f'        <property id="{prop["id"]}" name="{prop["name"]}" index="{prop["alias"]}" />')
+            for link in concept['links']:
+                kind = 'child' if link['aggregation'] else 'reference'
+                lines.append(f'        <{kind} id="{link["id"]}" name="{link["role"]}" index="{link["alias"]}" />')
+            lines.append('      </concept>')
+        lines += ['    </language>', '  </registry>']
+
+        # árvore com profundidade e fan-out aleatórios
+        open_nodes = 0
+        for node in range(model['nodes']):
+            while open_nodes and rng.random() < 0.35:
+                lines.append(f'{"  " * open_nodes}</node>')
+                open_nodes -= 1
+            concept = concepts[rng.randrange(len(concepts))]
+            indent = '  ' * (open_nodes + 1)
+            role = f' role="{rng.choice(concept["links"])["alias"]}"' if open_nodes and concept['links'] else ''
+            lines.append(f'{indent}<node concept="{concept["alias"]}" id="n{node:x}"{role}>')
+            for prop in concept['properties']:
+                lines.append(f'{indent}  <property role="{prop["alias"]}" value={quoteattr(f"v{rng.getrandbits(24)}")} />')
+            if open_nodes < 12 and rng.random() < 0.5:
+                open_nodes += 1
+            else:
+                lines.append(f'{indent}</node>')
+        while open_nodes:
+            lines.append(f'{"  " * open_nodes}</node>')
+            open_nodes -= 1
+        lines.append('</model>')
+        return '\n'.join(lines) + '\n'
+
+    # ---- mutações ----
+
+    def _mutate_structure(self, language):
+        concepts = language['concepts']
+        action = self.rng.random()
+        concept = self.rng.choice(concepts)
+        if action < 0.3:
+            concept = self._new_concept(language)
+            return f"add {concept['name']}"
+        if action < 0.5:
+            self._new_property(concept)
+        elif action < 0.6 and concept['properties']:
+            concept['properties'].pop(self.rng.randrange(len(concept['properties'])))
+            return f"remove property from {concept['name']}"
+        elif action < 0.7:
+            concept['name'] = concept['name'] + 'X'
+            return f"rename {concept['name']}"
+        elif action < 0.8 and concept['links']:
+            link = self.rng.choice(concept['links'])
+            link['cardinality'] = self.rng.choice(list(CARDINALITY_VALUES))
+        elif action < 0.9:
+            self._new_link(language, concept)
+        elif len(concepts) > 2:
+            concepts.remove(concept)
+            language['removed'] += 1
+            return f"delete {concept['name']}"
+        return None
+
+    def _commit_changes(self, first):
+        """Escolhe as mudanças de um commit: {caminho: conteúdo ou None (remoção)}"""
+        changes = {}
+        message = None
+
+        if first:
+            for language in self.languages:
+                base = self._language_dir(language)
+                changes[f"{base}/models/structure.mps"] = self.render_structure(language)
+                for aspect in ASPECTS:
+                    changes[f"{base}/models/{aspect}.mps"] = self.render_aspect(language, aspect)
+            for path in self.models:
+                changes[path] = self.render_model(path)
+            return changes, 'initial import'
+
+        for aspect in ('structure', 'editor', 'migration', 'behavior', 'typesystem', 'constraints'):
+            if self.rng.random() >= self.churn[aspect]:
+                continue
+            language = self.rng.choice(self.languages)
+            base = self._language_dir(language)
+            if aspect == 'structure':
+                message = self._mutate_structure(language) or message
+                changes[f"{base}/models/structure.mps"] = self.render_structure(language)
+            else:
+                language['revisions'][aspect] += 1
+                changes[f"{base}/models/{aspect}.mps"] = self.render_aspect(language, aspect)
+
+        if self.rng.random() < self.churn['model']:
+            for path in self.rng.sample(list(self.models), min(len(self.models), self.rng.randint(1, 4))):
+                action = self.rng.random()
+                if action < 0.02 and len(self.models) > 2:
+                    del self.models[path]
+                    changes[path] = None
+                elif action < 0.06:
+                    # renomeação: o conteúdo é o mesmo, só o caminho muda
+                    new_path = f"{path.rsplit('/', 1)[0]}/renamed{self._next_id()}.mps"
+                    self.models[new_path] = self.models.pop(path)
+                    changes[path] = None
+                    changes[new_path] = self.render_model(new_path)
+                else:
+                    model = self.models[path]
+                    model['seed'] = self.rng.getrandbits(32)
+                    model['nodes'] = max(1, model['nodes'] + self.rng.randint(-10, 20))
+                    changes[path] = self.render_model(path)
+            if self.rng.random() < 0.08:
+                s = self.rng.randrange(self.solutions)
+                new_path = self._new_model(s, self._next_id())
+                changes[new_path] = self.render_model(new_path)
+
+        if not changes:
+            path = self.rng.choice(list(self.models))
+            self.models[path]['seed'] = self.rng.getrandbits(32)
+            changes[path] = self.render_model(path)
+
+        if message is None:
+            name = Path(self.rng.choice(list(changes))).stem
+            message = self.rng.choice(MESSAGES).format(name=name)
+        return changes, message
+
+    # ---- geração ----
+
+    def generate(self, checkout=True):
+        """Cria o repositório e retorna estatísticas (commits, bytes escritos)"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        subprocess.run(['git', 'init', '-q', str(self.path)], check=True)
+        subprocess.run(['git', 'symbolic-ref', 'HEAD', 'refs/heads/master'], cwd=self.path, check=True)
+        self._init_state()
+
+        process = subprocess.Popen(
+            ['git', 'fast-import', '--quiet'],
+            cwd=self.path,
+            stdin=subprocess.PIPE
+        )
+        out = process.stdin
+        total_bytes = 0
+        step = self.span / max(self.commits, 1)
+
+        for i in range(self.commits):
+            changes, message = self._commit_changes(i == 0)
+            name, email = self.rng.choice(AUTHORS)
+            timestamp = int(self.start + i * step + self.rng.random() * step)
+            msg = message.encode('utf-8')
+
+            out.write(b'commit refs/heads/master\n')
+            out.write(f'mark :{i + 1}\n'.encode())
+            out.write(f'author {name} <{email}> {timestamp} +0000\n'.encode())
+            out.write(f'committer {name} <{email}> {timestamp} +0000\n'.encode())
+            out.write(f'data {len(msg)}\n'.encode() + msg + b'\n')
+            if i:
+                out.write(f'from :{i}\n'.encode())
+            for path, content in changes.items():
+                if content is None:
+                    out.write(f'D {path}\n'.encode())
+                else:
+                    data = content.encode('utf-8')
+                    total_bytes += len(data)
+                    out.write(f'M 100644 inline {path}\ndata {len(data)}\n'.encode() + data + b'\n')
+            out.write(b'\n')
+
+        out.close()
+        if process.wait() != 0:
+            raise RuntimeError("git fast-import falhou")
+
+        if checkout:
+            subprocess.run(['git', 'checkout', '-q', '-f', 'master'], cwd=self.path, check=True)
+
+        return {'commits': self.commits, 'bytes_written': total_bytes}
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(
+        description='Gera um repositório MPS sintético para benchmarks',
+        epilog='Exemplo: python synthetic_repo.py /tmp/synthetic --commits 5000 --languages 20'
+    )
+    parser.add_argument('path', help='Diretório do novo repositório')
+    parser.add_argument('--commits', type=int, default=500, help='Número de commits (padrão: 500)')
+    parser.add_argument('--languages', type=int, default=5, help='Número de linguagens (padrão: 5)')
+    parser.add_argument('--concepts', type=int, default=20, help='Conceitos por linguagem (padrão: 20)')
+    parser.add_argument('--solutions', type=int, default=3, help='Número de soluções (padrão: 3)')
+    parser.add_argument('--models-per-solution', type=int, default=10, help='Modelos por solução (padrão: 10)')
+    parser.add_argument('--model-nodes', type=int, default=200, help='Nós por modelo, em média (padrão: 200)')
+    parser.add_argument('--structure-churn', type=float, default=0.2, help='Prob. de alterar um structure.mps por commit')
+    parser.add_argument('--editor-churn', type=float, default=0.15, help='Prob. de alterar um editor.mps por commit')
+    parser.add_argument('--migration-churn', type=float, default=0.05, help='Prob. de alterar um migration.mps por commit')
+    parser.add_argument('--model-churn', type=float, default=0.6, help='Prob. de alterar modelos por commit')
+    parser.add_argument('--seed', type=int, default=1, help='Semente do gerador aleatório')
+    args = parser.parse_args()
+
+    generator = SyntheticRepoGenerator(
+        args.path, commits=args.commits, languages=args.languages, concepts=args.concepts,
+        solutions=args.solutions, models_per_solution=args.models_per_solution,
+        model_nodes=args.model_nodes, structure_churn=args.structure_churn,
+        editor_churn=args.editor_churn, migration_churn=args.migration_churn,
+        model_churn=args.model_churn, seed=args.seed
+    )
+    stats = generator.generate()
+    print(f"Repositório gerado em {args.path}: {stats['commits']} commits, "
+          f"{stats['bytes_written'] / 1e6:.1f} MB de modelos escritos")
+
+
+if __name__ == '__main__':
+    main()